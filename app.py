@@ -1,17 +1,15 @@
 import os
+import sys
+import signal
+import logging
 import argparse
+import threading
+import multiprocessing
 
-from apscheduler.schedulers.background import BackgroundScheduler
 from configparser import ConfigParser
 
-from data_share.KeyGeneration import KeyGeneration
-from nodes_available.NodesChecker import NodesChecker
-from utils.public_variants_handler.PublicVariantsHandler import PublicVariantsHandler
-from utils.nodes_key_pair_updator.NodesKeyPairUpdator import NodeKeyPairUpdator
-from utils.user_validation.UserValidation import UserValidation
-
-config = ConfigParser()
-config.read(os.path.join(os.getcwd(), 'config.ini'), encoding='utf-8')
+from utils.logging_pipeline.LoggingPipeline import LoggingPipeline
+from utils.production_server.PreforkServer import PreforkServer
 
 FOLDERS = ['logs', 'nodes', 'keys', 'logs/data_sharing', 'logs/website', 'public_keys', 'data', 'data/hg19', 'data/hg38']
 
@@ -25,12 +23,70 @@ def check_folder(folder_name):
         os.mkdir(folder_name)
 
 
-sched = BackgroundScheduler(daemon=True, timezone=config.get('NODE', 'TIMEZONE'))
-sched.add_job(NodesChecker.get_all_nodes_availability, 'interval', minutes=1)
-sched.add_job(PublicVariantsHandler.reset_limit, 'cron', day='*')
-sched.add_job(NodeKeyPairUpdator.update_keys, 'cron', hour='*')
-sched.add_job(UserValidation.check_key_expiration_date, 'cron', minute='*')
-sched.start()
+def prepare_node():
+    """
+    This function prepares folders, node keys and public requests limits needed by the node.
+    """
+    from data_share.KeyGeneration import KeyGeneration
+    from utils.public_variants_handler.PublicVariantsHandler import PublicVariantsHandler
+
+    [check_folder(folder) for folder in FOLDERS]
+    keys = KeyGeneration()
+    keys.load_or_generate()
+
+    PublicVariantsHandler.create_limits()
+
+
+def create_scheduler():
+    """
+    This function prepares scheduler with all periodic jobs of the node.
+    Temporary node keys are replaced as soon as the first key from the key pool is ready.
+    :return: (BackgroundScheduler) scheduler (not started)
+    """
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    from data_share.KeyGeneration import KeyGeneration
+    from nodes_available.NodesChecker import NodesChecker
+    from utils.public_variants_handler.PublicVariantsHandler import PublicVariantsHandler
+    from utils.nodes_key_pair_updator.NodesKeyPairUpdator import NodeKeyPairUpdator
+    from utils.nodes_key_pair_updator.KeyPropagator import KeyPropagator
+    from utils.user_validation.UserValidation import UserValidation
+
+    config = ConfigParser()
+    config.read(os.path.join(os.getcwd(), 'config.ini'), encoding='utf-8')
+
+    sched = BackgroundScheduler(daemon=True, timezone=config.get('NODE', 'TIMEZONE'))
+    sched.add_job(NodesChecker.get_all_nodes_availability, 'interval', minutes=1, max_instances=1, coalesce=True)
+    sched.add_job(PublicVariantsHandler.reset_limit, 'cron', day='*')
+    sched.add_job(NodeKeyPairUpdator.update_keys, 'cron', hour='*')
+    sched.add_job(KeyPropagator.retry, 'interval', minutes=5, max_instances=1, coalesce=True)
+    sched.add_job(UserValidation.check_key_expiration_date, 'cron', minute='*')
+    if KeyGeneration().has_temporary_keys():
+        sched.add_job(NodeKeyPairUpdator.update_keys)
+    return sched
+
+
+def run_scheduler():
+    """
+    This function runs scheduled jobs until SIGTERM (it is run in the scheduler process in production mode).
+    """
+    from data_share.KeyPool import KeyPool
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signal_number, frame: stopped.set())
+
+    KeyPool.start()
+    sched = create_scheduler()
+    sched.start()
+    while not stopped.wait(1):
+        pass
+    sched.shutdown()
+    KeyPool.shutdown()
+
+
+def load_server():
+    from data_share_website.data_share_website import server
+    return server
 
 
 if __name__ == '__main__':
@@ -38,19 +94,36 @@ if __name__ == '__main__':
 
     parser.add_argument('-p', '--port', type=int, default=80)
     parser.add_argument('-d', '--dev', action='store_true')
+    parser.add_argument('--production', action='store_true',
+                        help='Serve with a pool of worker processes (reload with SIGHUP, stop with SIGTERM).')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(),
+                        help='Number of worker processes in production mode (default: number of cores).')
 
     args = parser.parse_args()
 
-    [check_folder(folder) for folder in FOLDERS]
-    keys = KeyGeneration()
-    keys.load_or_generate()
-
-    PublicVariantsHandler.create_temp_file()
-
-    from data_share_website.data_share_website import server
-
-    if int(os.environ.get('FLASK_DEBUG', 0)) or args.dev:
-        # app.run(use_reloader=False)
-        server.run(debug=True, port=args.port, host='0.0.0.0', use_reloader=False)
+    if args.production:
+        logging.basicConfig(level=logging.INFO)
+        # the supervisor does not import application modules (they are imported again by workers after reload),
+        # so the node is prepared in a short-lived child process
+        preparation = multiprocessing.get_context('fork').Process(target=prepare_node)
+        preparation.start()
+        preparation.join()
+        if preparation.exitcode != 0:
+            sys.exit('Node preparation failed.')
+        # log files are written by a single process (workers would rotate them independently)
+        LoggingPipeline.share()
+        PreforkServer(load_server, run_scheduler, host='0.0.0.0', port=args.port, workers=args.workers,
+                      run_log_writer=LoggingPipeline.run_writer).run()
     else:
-        server.run(host='0.0.0.0', port=args.port)
+        from data_share.KeyPool import KeyPool
+
+        prepare_node()
+        KeyPool.start()
+        create_scheduler().start()
+        server = load_server()
+
+        if int(os.environ.get('FLASK_DEBUG', 0)) or args.dev:
+            # app.run(use_reloader=False)
+            server.run(debug=True, port=args.port, host='0.0.0.0', use_reloader=False)
+        else:
+            server.run(host='0.0.0.0', port=args.port)
@@ -1,14 +1,23 @@
 import os
+import hmac
 import json
 import base64
+import struct
+import hashlib
 
 from Crypto.Cipher import AES, PKCS1_OAEP
+from Crypto.Util import Counter
 from data_share.Pad import Pad
 from .EncryptionKeyGenerator import EncryptionKeyGenerator
 
 from Crypto.Hash import SHA
 from Crypto.PublicKey import RSA
 
+STREAM_MAGIC = b'DSS1'
+STREAM_NONCE_SIZE = 8
+FRAME_HEADER = struct.Struct('>IQB')
+FRAME_TAG_SIZE = 32
+
 
 class DataShare(object):
     """
@@ -16,19 +25,78 @@ class DataShare(object):
     """
 
     @staticmethod
-    def decrypt_data(data, encryption_key):
+    def decrypt_data(data, encryption_key, encoding='hex'):
         """
         The function takes data argument and decrypts it using ENCRYPTION_KEY. It also unpads the data to be prepared
         for saving
         :param data: (str)
         :param encryption_key: (str)
+        :param encoding: (str) hex (default) or base64
         :return: (str)
         """
         assert isinstance(data, str)
         obj = AES.new(encryption_key, AES.MODE_CBC, 'This is an IV456')
-        bytes_data = bytes.fromhex(data)
+        bytes_data = base64.b64decode(data) if encoding == 'base64' else bytes.fromhex(data)
         return Pad.unpad(obj.decrypt(bytes_data)).decode()
 
+    @staticmethod
+    def get_stream_keys(encryption_key):
+        """
+        This function derives encryption and authentication keys for streaming encryption.
+        :param encryption_key: (str) 32 character random encryption key
+        :return: (tuple) encryption key (bytes) and authentication key (bytes)
+        """
+        if isinstance(encryption_key, str):
+            encryption_key = encryption_key.encode()
+        return (hashlib.sha256(b'stream encryption' + encryption_key).digest(),
+                hashlib.sha256(b'stream authentication' + encryption_key).digest())
+
+    @staticmethod
+    def decrypt_stream(data, encryption_key):
+        """
+        This function decrypts stream sent by the server chunk by chunk (see server side `DataShare.encrypt_stream`).
+        :param data: (iterable) encrypted stream split into pieces of any size (bytes)
+        :param encryption_key: (str) 32 character random encryption key
+        :return: (generator) decrypted chunks (bytes)
+        :raises ValueError: if the stream was modified or truncated
+        """
+        cipher_key, mac_key = DataShare.get_stream_keys(encryption_key)
+        buffer, nonce, sequence, final = bytearray(), None, 0, False
+
+        for piece in data:
+            buffer.extend(piece)
+
+            if nonce is None:
+                if len(buffer) < len(STREAM_MAGIC) + STREAM_NONCE_SIZE:
+                    continue
+                if buffer[:len(STREAM_MAGIC)] != STREAM_MAGIC:
+                    raise ValueError('Invalid stream header.')
+                nonce = bytes(buffer[len(STREAM_MAGIC):len(STREAM_MAGIC) + STREAM_NONCE_SIZE])
+                del buffer[:len(STREAM_MAGIC) + STREAM_NONCE_SIZE]
+
+            while len(buffer) >= FRAME_HEADER.size:
+                length, frame_sequence, frame_final = FRAME_HEADER.unpack_from(buffer)
+                frame_size = FRAME_HEADER.size + length + FRAME_TAG_SIZE
+                if len(buffer) < frame_size:
+                    break
+
+                if final or frame_sequence != sequence:
+                    raise ValueError('Unexpected frame {}.'.format(frame_sequence))
+
+                frame = bytes(buffer[:frame_size])
+                del buffer[:frame_size]
+
+                expected_tag = hmac.new(mac_key, nonce + frame[:-FRAME_TAG_SIZE], hashlib.sha256).digest()
+                if not hmac.compare_digest(expected_tag, frame[-FRAME_TAG_SIZE:]):
+                    raise ValueError('Invalid authentication tag of frame {}.'.format(frame_sequence))
+
+                counter = Counter.new(64, prefix=nonce, initial_value=sequence << 32)
+                yield AES.new(cipher_key, AES.MODE_CTR, counter=counter).decrypt(frame[FRAME_HEADER.size:-FRAME_TAG_SIZE])
+                sequence, final = sequence + 1, bool(frame_final)
+
+        if not final or buffer:
+            raise ValueError('Stream truncated.')
+
     @staticmethod
     def encrypt_data(data):
         """
@@ -1,17 +1,28 @@
 import requests
 import argparse
+import base64
+import hashlib
+import hmac
+import itertools
 import json
 import os
 import sys
 import re
+import time
 import datetime
 
 from pprint import pprint
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from urllib.parse import urlparse, urljoin
 
 from data_share.DataShare import DataShare
 from data_share.KeyGeneration import KeyGeneration
+from utils.NodeClient import NodeClient
 from utils.PublicKeyPreparation import PublicKeyPreparation
+from utils.RandomIdGenerator import RandomIdGenerator
+
+SESSIONS_PATH = os.path.join('keys', 'sessions.json')
+NODES_CACHE_PATH = os.path.join('keys', 'nodes_cache.json')
 
 
 def prepare_public_request(chrom=None, start=None, end=None, genome_build=None):
@@ -24,16 +35,146 @@ def prepare_public_request(chrom=None, start=None, end=None, genome_build=None):
     return data
 
 
-def data_request_public(endpoint, genome_build, chrom=None, start=None, end=None):
+def data_request_public(endpoint, genome_build, chrom=None, start=None, end=None, stream=False):
     data = prepare_public_request(chrom, start, end, genome_build)
-    return requests.post(endpoint, json=data)
+    if stream:
+        data.update({'stream': True})
+    return NodeClient.post(endpoint, json=data, stream=stream)
 
 
-def data_request(endpoint, genome_build, chrom=None, start=None, end=None):
+def data_request(endpoint, genome_build, chrom=None, start=None, end=None, stream=False, transport=None, session_id=None):
     data = prepare_public_request(chrom, start, end, genome_build)
+    if stream:
+        data.update({'stream': True})
+    if transport:
+        data.update({'transport': transport})
+    if session_id:
+        data.update({'session_id': session_id})
     data.update({'user_id': PublicKeyPreparation.get_user_id()})
+    data = dict(sorted(data.items()))
+    data.update({'signature': DataShare.get_signature_for_message(data).decode()})
+    return NodeClient.post(endpoint, json=data, stream=stream)
+
+
+def load_sessions():
+    if not os.path.isfile(SESSIONS_PATH):
+        return {}
+    with open(SESSIONS_PATH, 'r') as file:
+        return json.load(file)
+
+
+def get_session(endpoint, renew=False):
+    """
+    This function returns private query session for a node. New session is negotiated if there is no valid one.
+    Sessions are saved in keys/sessions.json.
+    :param endpoint: (str) any endpoint of the node
+    :param renew: (bool) if True new session is negotiated (the old one is rotated)
+    :return: (dict) session_id, key and expires
+    """
+    parsed_uri = urlparse(endpoint)
+    node_address = '{uri.scheme}://{uri.netloc}/'.format(uri=parsed_uri)
+
+    sessions = load_sessions()
+    session = sessions.get(node_address)
+    if session is not None and not renew and session['expires'] > time.time() + 60:
+        return session
+
+    data = {
+        'request_id': RandomIdGenerator.generate_random_id(),
+        'user_id': PublicKeyPreparation.get_user_id(),
+    }
+    if session is not None:
+        data.update({'session_id': session['session_id']})
+    data = dict(sorted(data.items()))
     data.update({'signature': DataShare.get_signature_for_message(data).decode()})
-    return requests.post(endpoint, json=data)
+
+    r = NodeClient.post(urljoin(node_address, 'session'), json=data)
+    r.raise_for_status()
+    response = r.json()
+
+    session = {
+        'session_id': response['session_id'],
+        'key': DataShare.decrypt_using_private_key(bytes.fromhex(response['encryption_key'])),
+        'expires': response['expires'],
+    }
+    sessions[node_address] = session
+    with open(SESSIONS_PATH, 'w') as file:
+        json.dump(sessions, file)
+    return session
+
+
+def get_session_encryption_key(session_id, request_id):
+    """
+    This function derives response encryption key from session key (the same way as the server does).
+    :param session_id: (str) session identification string
+    :param request_id: (str) response request id
+    :return: (bytes) encryption key
+    """
+    for session in load_sessions().values():
+        if session['session_id'] == session_id:
+            return hmac.new(session['key'].encode(), request_id.encode(), hashlib.sha256).digest()
+    raise KeyError('Unknown session {}.'.format(session_id))
+
+
+def send_with_session(args, send):
+    """
+    This function sends private request using session if -ss option is set. Expired session is renewed once.
+    :param args: command line arguments
+    :param send: (function) takes session_id (or None) and sends the request
+    :return: response
+    """
+    if not args.session:
+        return send(None)
+
+    r = send(get_session(args.endpoint)['session_id'])
+    if r.status_code == 401:
+        r = send(get_session(args.endpoint, renew=True)['session_id'])
+    return r
+
+
+def parse_regions(regions):
+    """
+    This function parses regions given in command line (e.g. "1:100-200,2:300").
+    :param regions: (str) comma separated regions
+    :return: (list) regions ready to be send
+    """
+    parsed = []
+    for region in regions.split(','):
+        chrom, _, positions = region.strip().partition(':')
+        start, _, end = positions.partition('-')
+        parsed.append({'chrom': chrom, 'start': int(start), 'end': int(end or start)})
+    return parsed
+
+
+def load_bed_file(bed_path):
+    """
+    This function reads regions from BED file (0-based, half open) and converts them to 1-based inclusive regions.
+    :param bed_path: (str) path to BED file
+    :return: (list) regions ready to be send
+    """
+    regions = []
+    with open(bed_path, 'r') as file:
+        for line in file:
+            if not line.strip() or line.startswith(('#', 'track', 'browser')):
+                continue
+            chrom, start, end = line.split()[:3]
+            regions.append({'chrom': chrom, 'start': int(start) + 1, 'end': int(end)})
+    return regions
+
+
+def data_request_batch(endpoint, genome_build, regions, transport=None, session_id=None):
+    data = {
+        'genome_build': genome_build,
+        'regions': regions,
+        'user_id': PublicKeyPreparation.get_user_id(),
+    }
+    if transport:
+        data.update({'transport': transport})
+    if session_id:
+        data.update({'session_id': session_id})
+    data = dict(sorted(data.items()))
+    data.update({'signature': DataShare.get_signature_for_message(data).decode()})
+    return NodeClient.post(endpoint, json=data)
 
 
 def handle_request(r, args):
@@ -44,9 +185,9 @@ def handle_request(r, args):
             print('Raw response:')
             pprint(obtained_data)
 
-        if 'encryption_key' in obtained_data:
+        if 'encryption_key' in obtained_data or 'session_id' in obtained_data:
             obtained_data['result'] = decrypt_result(obtained_data)
-            obtained_data.pop('encryption_key')
+            obtained_data.pop('encryption_key', None)
 
         if args.save:
             with open('{}.json'.format(obtained_data['request_id']), 'w') as file:
@@ -61,6 +202,84 @@ def handle_request(r, args):
         pprint(r.text)
 
 
+def split_lines(pieces):
+    """
+    This function joins pieces of response (bytes) and splits them into lines.
+    """
+    buffer = b''
+    for piece in pieces:
+        buffer += piece
+        *lines, buffer = buffer.split(b'\n')
+        yield from lines
+    if buffer:
+        yield buffer
+
+
+def handle_stream_request(r, args):
+    """
+    This function processes streamed response row by row, so the whole result is never kept in memory.
+    Rows are printed (-v) and/or saved to <request_id>.ndjson file (-s).
+    """
+    if r.status_code != 200:
+        print(r.status_code)
+        pprint(r.text)
+        return
+
+    pieces = r.iter_content(chunk_size=64 * 1024)
+    buffer = b''
+    while b'\n' not in buffer:
+        piece = next(pieces, None)
+        if piece is None:
+            print('Malformed response: no request information line.')
+            return
+        buffer += piece
+    header_line, buffer = buffer.split(b'\n', 1)
+    try:
+        header = json.loads(header_line)
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or 'request_id' not in header or 'lab_name' not in header:
+        print('Malformed response: request information line is not valid.')
+        return
+    pieces = itertools.chain([buffer], pieces)
+
+    if 'encryption_key' in header or 'session_id' in header:
+        if 'session_id' in header:
+            encryption_key = get_session_encryption_key(header['session_id'], header['request_id'])
+        else:
+            encryption_key = DataShare.decrypt_using_private_key(bytes.fromhex(header.pop('encryption_key')))
+        if header.get('transport') == 'raw':
+            frames = pieces
+        else:
+            frames = (base64.b64decode(json.loads(line)['result']) for line in split_lines(pieces) if line)
+        lines = split_lines(DataShare.decrypt_stream(frames, encryption_key))
+    else:
+        lines = split_lines(pieces)
+
+    if args.raw:
+        print('Raw response header:')
+        pprint(header)
+
+    output_file = open('{}.ndjson'.format(header['request_id']), 'w') if args.save else None
+
+    rows_count = 0
+    for line in lines:
+        if not line:
+            continue
+
+        row = json.loads(line)
+        rows_count += 1
+        if args.verbose:
+            print(row)
+        if output_file is not None:
+            output_file.write(json.dumps(row) + '\n')
+
+    if output_file is not None:
+        output_file.close()
+        print('File has been saved.')
+    print('{} rows received from {}.'.format(rows_count, header['lab_name']))
+
+
 def handle_keys_generation():
     if os.path.isdir('keys'):
         choice = input("Keys are generated. Do you want to generate new ones? [y or n](default n)")
@@ -90,9 +309,11 @@ def get_params_from_query(query):
 
 
 def decrypt_result(message):
-    encryption_key = bytes.fromhex(message['encryption_key'])
-    encryption_key = DataShare.decrypt_using_private_key(encryption_key)
-    decrypted_data = json.loads(DataShare.decrypt_data(message['result'], encryption_key))
+    if 'session_id' in message:
+        encryption_key = get_session_encryption_key(message['session_id'], message['request_id'])
+    else:
+        encryption_key = DataShare.decrypt_using_private_key(bytes.fromhex(message['encryption_key']))
+    decrypted_data = json.loads(DataShare.decrypt_data(message['result'], encryption_key, message.get('transport', 'hex')))
     return decrypted_data
 
 
@@ -108,6 +329,37 @@ def load_public_key_for_sending(public_key_path):
     return public_key
 
 
+def get_federation_nodes(endpoint, timeout=None):
+    """
+    This function returns information about all nodes of the federation. The last response of every node is saved
+    in keys/nodes_cache.json and revalidated with its ETag (the node answers 304 if nothing has changed).
+    :param endpoint: (str) any endpoint of the node
+    :param timeout: (float) request timeout (in seconds)
+    :return: (list) nodes information
+    """
+    parsed_uri = urlparse(endpoint)
+    node_address = '{uri.scheme}://{uri.netloc}/'.format(uri=parsed_uri)
+
+    cache = {}
+    if os.path.isfile(NODES_CACHE_PATH):
+        with open(NODES_CACHE_PATH, 'r') as file:
+            cache = json.load(file)
+
+    cached = cache.get(node_address)
+    headers = {'If-None-Match': cached['etag']} if cached is not None else {}
+    r = NodeClient.post(urljoin(node_address, 'nodes'), headers=headers, timeout=timeout, idempotent=True)
+    if r.status_code == 304 and cached is not None:
+        return cached['nodes']
+    r.raise_for_status()
+
+    nodes = r.json()
+    if r.headers.get('ETag') and os.path.isdir('keys'):
+        cache[node_address] = {'etag': r.headers['ETag'], 'nodes': nodes}
+        with open(NODES_CACHE_PATH, 'w') as file:
+            json.dump(cache, file)
+    return nodes
+
+
 def add_node(endpoint, public_key_path, node_address, lab_name):
     public_key = load_public_key_for_sending(public_key_path)
     data = {
@@ -119,14 +371,12 @@ def add_node(endpoint, public_key_path, node_address, lab_name):
     data = dict(sorted(data.items()))
     data.update({'signature': DataShare.get_signature_for_message(data).decode()})
 
-    parsed_uri = urlparse(endpoint)
-    result = '{uri.scheme}://{uri.netloc}/'.format(uri=parsed_uri)
-    all_nodes = requests.post(urljoin(result, 'nodes')).json()
+    all_nodes = get_federation_nodes(endpoint)
 
     add_node_endpoint = lambda x: urljoin(x, 'add-node')
 
     print('Adding {} laboratory at {} to every node.'.format(lab_name, node_address))
-    r = requests.post(endpoint, json=data)
+    r = NodeClient.post(endpoint, json=data)
     for node in all_nodes:
 
         if node['laboratory-name'] == data['laboratory-name']:
@@ -134,7 +384,7 @@ def add_node(endpoint, public_key_path, node_address, lab_name):
 
         add_node_specific_endpoint = add_node_endpoint(node['address'])
         try:
-            r = requests.post(add_node_specific_endpoint, json=data)
+            r = NodeClient.post(add_node_specific_endpoint, json=data)
             print('Adding node for {} at {} with {} status_code'.format(node['laboratory-name'], node['address'], r.status_code))
             print(r.text)
         except Exception as e:
@@ -143,7 +393,7 @@ def add_node(endpoint, public_key_path, node_address, lab_name):
 
 
 def get_nodes(args):
-    available_laboratories = requests.post(args.endpoint).json()
+    available_laboratories = get_federation_nodes(args.endpoint)
     print('There are {} laboratories available.'.format(len(available_laboratories)))
 
     if args.verbose:
@@ -170,29 +420,118 @@ def get_nodes(args):
         print('If you want to save the result please specify -s flag.')
 
 
-def variants_from_all_nodes(args, private=False):
-    available_laboratories = requests.post(urljoin(args.endpoint, 'nodes')).json()
+def change_profiling(args):
+    """
+    This function enables, disables or shows requests profiling of a node (only for node administrators).
+    :param args: (obj) parsed command line arguments
+    """
+    data = {
+        'user_id': get_user_id(),
+        'timestamp': time.time(),
+    }
+    if args.profiling != 'status':
+        data.update({
+            'enabled': args.profiling == 'on',
+            'sample_rate': args.sample_rate,
+            'endpoints': args.profile_endpoints.split(',') if args.profile_endpoints else None,
+            'duration': args.duration,
+        })
+    data.update({'signature': DataShare.get_signature_for_message(data).decode()})
 
-    result, data = {}, []
-    for lab in available_laboratories[::-1]:
-        print('Getting information from \"{}\" laboratory.'.format(lab['laboratory-name']))
+    r = NodeClient.post(urljoin(args.endpoint, 'profiling'), json=data)
 
-        if private:
-            endpoint = urljoin(lab['address'], 'variants-private')
-        else:
-            endpoint = urljoin(lab['address'], 'variants')
-        r = data_request(endpoint, args.genome_build, args.chrom, args.start, args.stop)
+    if r.status_code == 200:
+        pprint(r.json())
+    else:
+        print('You are not allowed to change profiling settings of this node.')
+
+
+def request_node(endpoint, data, timeout):
+    """
+    This function sends request to a single node and measures the time it took.
+    :return: (tuple) response and time taken (in seconds)
+    """
+    start = time.monotonic()
+    r = NodeClient.post(endpoint, json=data, timeout=timeout, retries=0)
+    return r, time.monotonic() - start
+
+
+def fan_out_variants(args, available_laboratories, private=False):
+    """
+    This function asks all laboratories at the same time (at most args.workers requests at once) and yields results
+    as they arrive. Request is signed once and the same message is send to every node. Encrypted results are decrypted
+    in separate processes.
+    :param args: command line arguments
+    :param available_laboratories: (list) laboratories information returned by /nodes endpoint
+    :param private: (bool) if True private endpoint is used
+    :return: (generator) tuples of laboratory name, obtained data (None in case of error) and node report
+    """
+    data = prepare_public_request(args.chrom, args.start, args.stop, args.genome_build)
+    data.update({'user_id': PublicKeyPreparation.get_user_id()})
+    data = dict(sorted(data.items()))
+    data.update({'signature': DataShare.get_signature_for_message(data).decode()})
 
-        try:
-            obtained_data = r.json()
-        except Exception:
-            print('ERROR from \"{}\" laboratory.'.format(lab['laboratory-name']))
-            continue
+    endpoint_name = 'variants-private' if private else 'variants'
+    start = time.monotonic()
 
-        if 'encryption_key' in obtained_data:
-            obtained_data['result'] = decrypt_result(obtained_data)
-            obtained_data.pop('encryption_key')
+    with ThreadPoolExecutor(max_workers=args.workers) as request_pool, \
+            ProcessPoolExecutor(max_workers=args.workers) as decryption_pool:
+        pending = {}
+        for lab in available_laboratories:
+            future = request_pool.submit(request_node, urljoin(lab['address'], endpoint_name), data, args.timeout)
+            pending[future] = (lab['laboratory-name'], None, None)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                lab_name, obtained_data, request_time = pending.pop(future)
+                report = {'laboratory-name': lab_name, 'status': 'ok'}
+
+                if obtained_data is not None:
+                    try:
+                        obtained_data['result'] = future.result()
+                        obtained_data.pop('encryption_key', None)
+                    except Exception as e:
+                        report['status'], report['error'], obtained_data = 'error', str(e), None
+                    report.update({'request_time': round(request_time, 4), 'time_taken': round(time.monotonic() - start, 4)})
+                    yield lab_name, obtained_data, report
+                    continue
+
+                try:
+                    r, request_time = future.result()
+                    if r.status_code != 200:
+                        raise ValueError('status code {}'.format(r.status_code))
+                    obtained_data = r.json()
+                    if not isinstance(obtained_data, dict):
+                        raise ValueError('malformed response')
+                except requests.exceptions.Timeout:
+                    report.update({'status': 'timeout', 'time_taken': round(time.monotonic() - start, 4)})
+                    yield lab_name, None, report
+                    continue
+                except Exception as e:
+                    report.update({'status': 'error', 'error': str(e), 'time_taken': round(time.monotonic() - start, 4)})
+                    yield lab_name, None, report
+                    continue
+
+                if 'encryption_key' in obtained_data:
+                    pending[decryption_pool.submit(decrypt_result, obtained_data)] = (lab_name, obtained_data, request_time)
+                    continue
+
+                report.update({'request_time': round(request_time, 4), 'time_taken': round(time.monotonic() - start, 4)})
+                yield lab_name, obtained_data, report
 
+
+def variants_from_all_nodes(args, private=False):
+    available_laboratories = get_federation_nodes(args.endpoint, timeout=args.timeout)
+
+    data, nodes = [], []
+    for lab_name, obtained_data, report in fan_out_variants(args, available_laboratories, private):
+        nodes.append(report)
+        if obtained_data is None:
+            print('{} from \"{}\" laboratory after {} s.'.format(report['status'].upper(), lab_name, report['time_taken']))
+            continue
+
+        print('Got information from \"{}\" laboratory in {} s.'.format(lab_name, report['time_taken']))
         data.append(obtained_data)
 
     result = {
@@ -200,6 +539,8 @@ def variants_from_all_nodes(args, private=False):
         'start': args.start,
         'stop': args.stop,
         'request_time': datetime.datetime.now().isoformat(),
+        'nodes': nodes,
+        'timed_out': [report['laboratory-name'] for report in nodes if report['status'] == 'timeout'],
         'result': data
     }
 
@@ -227,8 +568,12 @@ if __name__ == '__main__':
     parser.add_argument('--start', type=int, help='Starting position.')
     parser.add_argument('--stop', type=int, help='Ending position.')
     parser.add_argument('-gb', '--genome-build', type=str, help='Holds information about gemone build.', default='hg19')
+    parser.add_argument('-b', '--bed', type=str, help='Path to a BED file with regions for batch private request.')
+    parser.add_argument('-rg', '--regions', type=str, help='Regions for batch private request (e.g. "1:100-200,2:300").')
 
     parser.add_argument('-a', '--all-nodes', action='store_true', help='This flag will aggregate data form all available nodes.')
+    parser.add_argument('-w', '--workers', type=int, default=8, help='Number of nodes asked at the same time (with -a).')
+    parser.add_argument('--timeout', type=float, default=60, help='Timeout (in seconds) of a request to a single node.')
     parser.add_argument('-k', '--key', type=str, help='Path to a public key file.')
     parser.add_argument('-ln', '--lab-name', type=str, help='Full laboratory name (as in config file)')
     parser.add_argument('-la', '--lab-address', type=str, help='This is a laboratory address (e.g. ')
@@ -236,10 +581,21 @@ if __name__ == '__main__':
     parser.add_argument('-s', '--save', action='store_true')
     parser.add_argument('-v', '--verbose', action='store_true')
     parser.add_argument('-r', '--raw', action='store_true', help='Will print raw response.')
+    parser.add_argument('-st', '--stream', action='store_true', help='Will receive and process the result row by row.')
+    parser.add_argument('-ss', '--session', action='store_true',
+                        help='Will use session key for private requests (no RSA decryption for every response).')
+    parser.add_argument('-t', '--transport', type=str, choices=['hex', 'base64', 'raw'],
+                        help='Encoding of private result: hex or base64 (raw or base64 for streamed result).')
 
     parser.add_argument('-ck', '--check-key', action='store_true', help="Will check your key")
     parser.add_argument('-uk', '--update-user-key', action='store_true', help="Will update your key")
 
+    parser.add_argument('-pf', '--profiling', type=str, choices=['on', 'off', 'status'],
+                        help='Enables, disables or shows requests profiling of the node (for node administrators).')
+    parser.add_argument('--sample-rate', type=float, default=1.0, help='Part of requests which are profiled.')
+    parser.add_argument('--profile-endpoints', type=str, help='Profiled endpoints separated by commas (e.g. "variants_private").')
+    parser.add_argument('--duration', type=int, help='Number of seconds after which profiling is disabled.')
+
     args = parser.parse_args()
 
     if not args.verbose:
@@ -254,18 +610,36 @@ if __name__ == '__main__':
 
     elif args.endpoint.endswith('variants'):
         if args.chrom and args.start:
-            r = data_request_public(args.endpoint, args.genome_build, args.chrom, args.start)
-            handle_request(r, args)
+            r = data_request_public(args.endpoint, args.genome_build, args.chrom, args.start, stream=args.stream)
         elif args.query:
             chrom, start = get_params_from_query(args.query)
-            r = data_request_public(args.endpoint, args.genome_build, chrom, start)
+            r = data_request_public(args.endpoint, args.genome_build, chrom, start, stream=args.stream)
+        else:
+            r = None
+
+        if r is not None and args.stream:
+            handle_stream_request(r, args)
+        elif r is not None:
             handle_request(r, args)
 
+    elif args.endpoint.endswith(('variants-private', 'variants-private-batch')) and (args.bed or args.regions):
+        regions = load_bed_file(args.bed) if args.bed else parse_regions(args.regions)
+        endpoint = args.endpoint if args.endpoint.endswith('batch') else '{}-batch'.format(args.endpoint)
+        r = send_with_session(args, lambda session_id: data_request_batch(
+            endpoint, args.genome_build, regions, args.transport, session_id))
+        handle_request(r, args)
+
     elif args.endpoint.endswith('variants-private') and args.all_nodes:
         variants_from_all_nodes(args, private=True)
 
+    elif args.endpoint.endswith('variants-private') and args.stream:
+        r = send_with_session(args, lambda session_id: data_request(
+            args.endpoint, args.genome_build, args.chrom, args.start, args.stop, True, args.transport, session_id))
+        handle_stream_request(r, args)
+
     elif args.endpoint.endswith('variants-private'):
-        r = data_request(args.endpoint, args.genome_build, args.chrom, args.start, args.stop)
+        r = send_with_session(args, lambda session_id: data_request(
+            args.endpoint, args.genome_build, args.chrom, args.start, args.stop, False, args.transport, session_id))
         if r.status_code == 200:
             message = json.loads(r.text)
             handle_request(r, args)
@@ -288,13 +662,16 @@ if __name__ == '__main__':
         }
         data.update({'signature': DataShare.get_signature_for_message(data).decode()})
 
-        r = requests.post(urljoin(args.endpoint, 'check-key'), json=data)
+        r = NodeClient.post(urljoin(args.endpoint, 'check-key'), json=data)
 
         if not r.json():
             print('Your key is authorized to perform private queries.')
         else:
             print('You are not authorized to perform private operations or your key has expired.')
 
+    elif args.profiling:
+        change_profiling(args)
+
     elif args.update_user_key:
         username = PublicKeyPreparation.get_user_id()
         old_public_name = 'public.old.{}.key'.format(username)
@@ -317,7 +694,7 @@ if __name__ == '__main__':
         data = dict(sorted(data.items()))
         data.update({'signature': DataShare.get_signature_for_message(data, 'private.old.key').decode()})
 
-        r = requests.post(args.endpoint, json=data)
+        r = NodeClient.post(args.endpoint, json=data)
 
         if r.status_code == 200:
             print('Key successfully updated.')
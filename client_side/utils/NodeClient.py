@@ -0,0 +1,151 @@
+import time
+import random
+import threading
+
+import requests
+
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+from urllib.parse import urlsplit
+
+
+class NodeClient(object):
+    """
+    This class is a shared HTTP client for requests sent to nodes.
+
+    Every host gets its own session, so connections are kept alive and pooled per host.
+    Requests have default timeouts and failed connections are retried a few times with jittered exponential backoff.
+    Requests which are not idempotent (e.g. POST) are retried only if connection could not be established,
+    so they are never applied twice.
+    Number of requests, errors, retries and latency are counted per host (see `get_stats`).
+    """
+
+    RETRY_STATUS_CODES = (502, 503, 504)
+    IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+    CONNECT_TIMEOUT = 5
+    READ_TIMEOUT = 600
+    RETRIES = 2
+    BACKOFF = 0.2
+    POOL_SIZE = 10
+
+    _sessions = {}
+    _stats = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_timeout():
+        return NodeClient.CONNECT_TIMEOUT, NodeClient.READ_TIMEOUT
+
+    @staticmethod
+    def get_retries():
+        return NodeClient.RETRIES
+
+    @staticmethod
+    def get_backoff(attempt):
+        """
+        This function returns time to wait before the next attempt (exponential backoff with full jitter).
+        :param attempt: (int) number of the failed attempt (starting from 0)
+        :return: (float) time in seconds
+        """
+        return random.uniform(0, NodeClient.BACKOFF * 2 ** attempt)
+
+    @staticmethod
+    def get_host(url):
+        return urlsplit(url).netloc
+
+    @staticmethod
+    def get_session(host):
+        """
+        This function returns session used for requests sent to the host.
+        :param host: (str) host (with port)
+        :return: (requests.Session) session with its own connection pool
+        """
+        with NodeClient._lock:
+            session = NodeClient._sessions.get(host)
+            if session is None:
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=NodeClient.POOL_SIZE)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                NodeClient._sessions[host] = session
+                NodeClient._stats[host] = {'requests': 0, 'errors': 0, 'retries': 0, 'latency': 0.0}
+            return session
+
+    @staticmethod
+    def is_connect_error(error):
+        """
+        This function checks if request failed before it was sent (connection was not established).
+        :param error: (requests.ConnectionError) error
+        :return: (bool)
+        """
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(error, requests.ConnectTimeout) or isinstance(reason, ConnectTimeoutError)
+
+    @staticmethod
+    def _count(host, latency, error=False, retry=False):
+        with NodeClient._lock:
+            stats = NodeClient._stats[host]
+            stats['requests'] += 1
+            stats['latency'] += latency
+            stats['errors'] += error
+            stats['retries'] += retry
+
+    @staticmethod
+    def request(method, url, timeout=None, retries=None, idempotent=None, **kwargs):
+        """
+        This function sends a request to other node.
+        :param method: (str) HTTP method
+        :param url: (str) request address
+        :param timeout: (float or tuple) connect and read timeout (default `CONNECT_TIMEOUT`, `READ_TIMEOUT`)
+        :param retries: (int) how many times request is repeated after connection error or 502, 503, 504 status code
+        :param idempotent: (bool) request can be repeated after it has reached the node (by default only for
+            `IDEMPOTENT_METHODS`), otherwise it is repeated only if connection could not be established
+        :param kwargs: other `requests` arguments (e.g. json, stream)
+        :return: (requests.Response) response
+        :raises requests.RequestException: if the last attempt has failed
+        """
+        host = NodeClient.get_host(url)
+        session = NodeClient.get_session(host)
+        timeout = NodeClient.get_timeout() if timeout is None else timeout
+        retries = NodeClient.get_retries() if retries is None else retries
+        idempotent = method.upper() in NodeClient.IDEMPOTENT_METHODS if idempotent is None else idempotent
+
+        for attempt in range(retries + 1):
+            start = time.monotonic()
+            try:
+                response = session.request(method, url, timeout=timeout, **kwargs)
+            except requests.ConnectionError as e:
+                NodeClient._count(host, time.monotonic() - start, error=True, retry=attempt > 0)
+                if attempt == retries or not (idempotent or NodeClient.is_connect_error(e)):
+                    raise
+            except requests.RequestException:
+                NodeClient._count(host, time.monotonic() - start, error=True, retry=attempt > 0)
+                raise
+            else:
+                failed = response.status_code in NodeClient.RETRY_STATUS_CODES
+                NodeClient._count(host, time.monotonic() - start, error=failed, retry=attempt > 0)
+                if not failed or attempt == retries or not idempotent:
+                    return response
+                response.close()
+
+            time.sleep(NodeClient.get_backoff(attempt))
+
+    @staticmethod
+    def get(url, **kwargs):
+        return NodeClient.request('GET', url, **kwargs)
+
+    @staticmethod
+    def post(url, **kwargs):
+        return NodeClient.request('POST', url, **kwargs)
+
+    @staticmethod
+    def get_stats():
+        """
+        This function returns statistics of requests sent to each host.
+        :return: (dict) host: requests, errors, retries, total and average latency (in seconds)
+        """
+        with NodeClient._lock:
+            return {
+                host: dict(stats, average_latency=stats['latency'] / stats['requests'] if stats['requests'] else 0.0)
+                for host, stats in NodeClient._stats.items()
+            }
@@ -1,10 +1,16 @@
 import os
+import hmac
 import json
 import base64
+import struct
+import hashlib
 
 from Crypto.Cipher import AES, PKCS1_OAEP
+from Crypto.Util import Counter
 from data_share.Pad import Pad
+from data_share.KeyStore import KeyStore
 from utils.user_validation.UserValidation import UserValidation
+from utils.metrics.Metrics import Metrics
 
 from Crypto.Hash import SHA256
 from Crypto.PublicKey import RSA
@@ -14,6 +20,14 @@ from Crypto.Signature import PKCS1_v1_5
 from Crypto.Hash import SHA
 from Crypto.PublicKey import RSA
 
+STREAM_MAGIC = b'DSS1'
+STREAM_NONCE_SIZE = 8
+FRAME_HEADER = struct.Struct('>IQB')
+FRAME_TAG_SIZE = 32
+
+Metrics.describe('crypto_operation_seconds', 'histogram', 'Duration of encryption and signature operations.')
+Metrics.describe('crypto_encrypted_bytes_total', 'counter', 'Number of encrypted bytes.')
+
 
 class DataShare(object):
     """
@@ -21,34 +35,135 @@ class DataShare(object):
     """
 
     @staticmethod
-    def decrypt_data(data, encryption_key):
+    @Metrics.timed('crypto_operation_seconds', operation='aes_decrypt')
+    def decrypt_data(data, encryption_key, encoding='hex'):
         """
         The function takes data argument and decrypts it using ENCRYPTION_KEY. It also unpads the data to be prepared
         for saving
         :param data: (str) data to be decrypted
         :param encryption_key: (str) 32 character random encryption key
+        :param encoding: (str) hex (default) or base64 - encoding of the data
         :return: (str) decrypted information
         """
         assert isinstance(data, str)
         obj = AES.new(encryption_key, AES.MODE_CBC, 'This is an IV456')
-        bytes_data = bytes.fromhex(data)
+        bytes_data = base64.b64decode(data) if encoding == 'base64' else bytes.fromhex(data)
         return Pad.unpad(obj.decrypt(bytes_data)).decode()
 
     @staticmethod
-    def encrypt_data(data, encryption_key):
+    @Metrics.timed('crypto_operation_seconds', operation='aes_encrypt')
+    def encrypt_data(data, encryption_key, encoding='hex'):
         """
         This function encrypts data and prepares it for sending.
         :param data: (str) holds unprocessed data to be send
         :param encryption_key: (str) 32 character random encryption key
+        :param encoding: (str) hex (default) or base64 - encoding of the result (base64 is 1/3 larger than binary
+            data while hex is twice as large)
         :return: (str) data ready to be send
         """
         assert isinstance(data, str)
         obj = AES.new(encryption_key, AES.MODE_CBC, 'This is an IV456')
         padded = Pad.pad(data.encode())
         ciphertext = obj.encrypt(padded)
+        Metrics.inc('crypto_encrypted_bytes_total', len(ciphertext), operation='aes_encrypt')
+        if encoding == 'base64':
+            return base64.b64encode(ciphertext).decode()
         return ciphertext.hex()
 
     @staticmethod
+    def get_stream_keys(encryption_key):
+        """
+        This function derives encryption and authentication keys for streaming encryption.
+        :param encryption_key: (str) 32 character random encryption key
+        :return: (tuple) encryption key (bytes) and authentication key (bytes)
+        """
+        if isinstance(encryption_key, str):
+            encryption_key = encryption_key.encode()
+        return (hashlib.sha256(b'stream encryption' + encryption_key).digest(),
+                hashlib.sha256(b'stream authentication' + encryption_key).digest())
+
+    @staticmethod
+    def encrypt_stream(chunks, encryption_key):
+        """
+        This function encrypts chunks one by one so the data never has to be kept in memory as a whole.
+
+        The first yielded item is stream header (magic and random nonce). Every next item is a frame holding header
+        (ciphertext length, sequence number and final flag), AES-CTR ciphertext and HMAC-SHA256 tag. The tag covers
+        nonce, frame header and ciphertext, so reordering, modifying or truncating frames is detected.
+        :param chunks: (iterable) chunks (bytes or str) to be encrypted
+        :param encryption_key: (str) 32 character random encryption key
+        :return: (generator) stream header followed by frames (bytes)
+        """
+        cipher_key, mac_key = DataShare.get_stream_keys(encryption_key)
+        nonce = os.urandom(STREAM_NONCE_SIZE)
+        yield STREAM_MAGIC + nonce
+
+        chunks = iter(chunks)
+        chunk, sequence = next(chunks, b''), 0
+        while True:
+            next_chunk = next(chunks, None)
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+
+            counter = Counter.new(64, prefix=nonce, initial_value=sequence << 32)
+            ciphertext = AES.new(cipher_key, AES.MODE_CTR, counter=counter).encrypt(chunk)
+            Metrics.inc('crypto_encrypted_bytes_total', len(ciphertext), operation='stream_encrypt')
+            frame_header = FRAME_HEADER.pack(len(ciphertext), sequence, next_chunk is None)
+            tag = hmac.new(mac_key, nonce + frame_header + ciphertext, hashlib.sha256).digest()
+            yield frame_header + ciphertext + tag
+
+            if next_chunk is None:
+                return
+            chunk, sequence = next_chunk, sequence + 1
+
+    @staticmethod
+    def decrypt_stream(data, encryption_key):
+        """
+        This function decrypts stream produced by `encrypt_stream` chunk by chunk.
+        :param data: (iterable) encrypted stream split into pieces of any size (bytes)
+        :param encryption_key: (str) 32 character random encryption key
+        :return: (generator) decrypted chunks (bytes)
+        :raises ValueError: if the stream was modified or truncated
+        """
+        cipher_key, mac_key = DataShare.get_stream_keys(encryption_key)
+        buffer, nonce, sequence, final = bytearray(), None, 0, False
+
+        for piece in data:
+            buffer.extend(piece)
+
+            if nonce is None:
+                if len(buffer) < len(STREAM_MAGIC) + STREAM_NONCE_SIZE:
+                    continue
+                if buffer[:len(STREAM_MAGIC)] != STREAM_MAGIC:
+                    raise ValueError('Invalid stream header.')
+                nonce = bytes(buffer[len(STREAM_MAGIC):len(STREAM_MAGIC) + STREAM_NONCE_SIZE])
+                del buffer[:len(STREAM_MAGIC) + STREAM_NONCE_SIZE]
+
+            while len(buffer) >= FRAME_HEADER.size:
+                length, frame_sequence, frame_final = FRAME_HEADER.unpack_from(buffer)
+                frame_size = FRAME_HEADER.size + length + FRAME_TAG_SIZE
+                if len(buffer) < frame_size:
+                    break
+
+                if final or frame_sequence != sequence:
+                    raise ValueError('Unexpected frame {}.'.format(frame_sequence))
+
+                frame = bytes(buffer[:frame_size])
+                del buffer[:frame_size]
+
+                expected_tag = hmac.new(mac_key, nonce + frame[:-FRAME_TAG_SIZE], hashlib.sha256).digest()
+                if not hmac.compare_digest(expected_tag, frame[-FRAME_TAG_SIZE:]):
+                    raise ValueError('Invalid authentication tag of frame {}.'.format(frame_sequence))
+
+                counter = Counter.new(64, prefix=nonce, initial_value=sequence << 32)
+                yield AES.new(cipher_key, AES.MODE_CTR, counter=counter).decrypt(frame[FRAME_HEADER.size:-FRAME_TAG_SIZE])
+                sequence, final = sequence + 1, bool(frame_final)
+
+        if not final or buffer:
+            raise ValueError('Stream truncated.')
+
+    @staticmethod
+    @Metrics.timed('crypto_operation_seconds', operation='verify_signature')
     def validate_signature_from_message(message, signature=None, public_key=None):
         """
         This function checks if incoming message is valid for this machine.
@@ -69,11 +184,9 @@ class DataShare(object):
         message = json.dumps(message)
 
         if public_key is None:
-            public_key_path = os.path.join('keys', 'public.key')
-            with open(public_key_path, 'rb') as file:
-                public_key = RSA.importKey(file.read())
+            public_key = KeyStore.get_key(os.path.join('keys', 'public.key'))
         else:
-            public_key = RSA.importKey(public_key)
+            public_key = KeyStore.import_key(public_key)
 
         h = SHA.new(message.encode()).digest()
 
@@ -95,15 +208,14 @@ class DataShare(object):
         user_id = message['user_id']
 
         message = json.dumps(message)
-        public_key_path = os.path.join('public_keys', f'public.{user_id}.key')
-        with open(public_key_path, 'rb') as file:
-            public_key = RSA.importKey(file.read())
+        public_key = KeyStore.get_key(os.path.join('public_keys', f'public.{user_id}.key'))
 
         h = SHA.new(message.encode()).digest()
 
         return public_key.verify(h, signature)
 
     @staticmethod
+    @Metrics.timed('crypto_operation_seconds', operation='sign')
     def get_signature_for_message(message, filename='private.key'):
         """
         This function prepares signature for the message.
@@ -113,9 +225,7 @@ class DataShare(object):
         message = dict(sorted(message.items()))
         message = json.dumps(message)
 
-        private_key_path = os.path.join('keys', filename)
-        with open(private_key_path, 'rb') as file:
-            private_key = RSA.importKey(file.read())
+        private_key = KeyStore.get_key(os.path.join('keys', filename))
 
         h = SHA.new(message.encode()).digest()
         signature = private_key.sign(h, '')
@@ -123,6 +233,7 @@ class DataShare(object):
         return base64.b64encode(bytes(str(signature[0]).encode()))
 
     @staticmethod
+    @Metrics.timed('crypto_operation_seconds', operation='rsa_encrypt')
     def encrypt_using_public_key(message, user_id, public_key=None):
         """
         This function perform encryption with given public key.
@@ -133,26 +244,23 @@ class DataShare(object):
         :return: (str) encrypted information
         """
         if public_key is None:
-            public_key_path = os.path.join('public_keys', f'public.{user_id}.key')
-            with open(public_key_path, 'rb') as file:
-                public_key = RSA.importKey(file.read())
+            public_key = KeyStore.get_key(os.path.join('public_keys', f'public.{user_id}.key'))
         else:
-            public_key = RSA.importKey(public_key)
+            public_key = KeyStore.import_key(public_key)
 
         cipher = PKCS1_OAEP.new(public_key)
         encrypted = cipher.encrypt(message.encode())
         return encrypted.hex()
 
     @staticmethod
+    @Metrics.timed('crypto_operation_seconds', operation='rsa_decrypt')
     def decrypt_using_private_key(message):
         """
         This function decrypts information using default private key for the machine.
         :param message: (str) message to be decrypted
         :return: (str) unencrypted message
         """
-        public_key_path = os.path.join('keys', 'private.key')
-        with open(public_key_path, 'rb') as file:
-            private_key = RSA.importKey(file.read())
+        private_key = KeyStore.get_key(os.path.join('keys', 'private.key'))
 
         cipher = PKCS1_OAEP.new(private_key)
         encrypted = cipher.decrypt(message)
@@ -165,9 +273,23 @@ class DataShare(object):
         :param message: (dict) holds whole request json information
         :return: (tuple) True, <public_key> if user is authorized and False, None if not
         """
+        signature = message.pop('signature')
+        user_validation = UserValidation.validate_user(message['user_id'])
+        if not user_validation:
+            # unknown users (also remote users with cached negative result) are rejected without asking other nodes
+            return False, None
+        if DataShare.validate_signature_from_message(message, signature=signature, public_key=user_validation):
+            return True, user_validation
+
+        if not UserValidation.is_remote_user(message['user_id']):
+            return False, user_validation
+
+        # cached public key of a remote user may be outdated (the user has updated the key in own node)
+        UserValidation.invalidate_remote_user(message['user_id'])
         user_validation = UserValidation.validate_user(message['user_id'])
         if user_validation:
-            return DataShare.validate_signature_from_message(message, public_key=user_validation), user_validation
+            valid = DataShare.validate_signature_from_message(message, signature=signature, public_key=user_validation)
+            return valid, user_validation
         return False, None
 
 
@@ -5,6 +5,9 @@ import Crypto.Random
 from Crypto.PublicKey import RSA
 from Crypto.Cipher import PKCS1_OAEP
 
+from data_share.KeyPool import KeyPool
+from data_share.KeyStore import KeyStore
+
 
 class KeyGeneration(object):
     """
@@ -15,6 +18,10 @@ class KeyGeneration(object):
         public_key  (obj): holds public key object
     """
 
+    TEMPORARY_KEY_LENGTH = 2048
+    # file in `keys` folder marking keys which should be replaced with a key from the key pool
+    TEMPORARY_MARKER = 'temporary'
+
     def __init__(self):
         self.private_key = 0
         self.public_key = 0
@@ -28,9 +35,18 @@ class KeyGeneration(object):
         self.private_key = RSA.generate(key_length, random_gen)
         self.public_key = self.private_key.publickey()
 
-    def save_keys(self):
+    def load_from_pool(self, timeout=None):
+        """
+        This function takes keys generated in advance by the key pool (see `KeyPool`).
+        :param timeout: (float) maximum waiting time in seconds if there is no key ready
+        """
+        self.private_key = KeyPool.get_key(timeout)
+        self.public_key = self.private_key.publickey()
+
+    def save_keys(self, temporary=False):
         """
         This function saves public and private keys to `keys` folder.
+        :param temporary: (bool) keys are marked as temporary (they are replaced as soon as possible)
         """
         with open(os.path.join('keys', 'private.key'), 'wb') as file:
             file.write(self.private_key.exportKey())
@@ -38,6 +54,15 @@ class KeyGeneration(object):
         with open(os.path.join('keys', 'public.key'), 'wb') as file:
             file.write(self.public_key.exportKey())
 
+        KeyStore.invalidate(os.path.join('keys', 'private.key'))
+        KeyStore.invalidate(os.path.join('keys', 'public.key'))
+
+        marker = os.path.join('keys', KeyGeneration.TEMPORARY_MARKER)
+        if temporary:
+            open(marker, 'w').close()
+        elif os.path.exists(marker):
+            os.remove(marker)
+
     def load_keys(self):
         """
         This function loads public and private key from `keys` folder.
@@ -62,27 +87,36 @@ class KeyGeneration(object):
         """
         This function loads private key.
         """
-        path = os.path.join('keys')
-        with open(os.path.join(path, '{}.key'.format(filename)), 'rb') as file:
-            self.private_key = RSA.importKey(file.read())
+        self.private_key = KeyStore.get_key(os.path.join('keys', '{}.key'.format(filename)))
 
     def _load_public(self, filename='public'):
         """
         This function loads public key.
         """
-        path = os.path.join('keys')
-        with open(os.path.join(path, '{}.key'.format(filename)), 'rb') as file:
-            self.public_key = RSA.importKey(file.read())
+        self.public_key = KeyStore.get_key(os.path.join('keys', '{}.key'.format(filename)))
+
+    def has_temporary_keys(self):
+        """
+        This function checks if node uses temporary keys (generated on the first start).
+        :return: (bool)
+        """
+        return os.path.exists(os.path.join('keys', KeyGeneration.TEMPORARY_MARKER))
 
     def load_or_generate(self):
         """
         This function depending on the current state will generate or load keys.
+
+        If there are no keys, shorter temporary keys are generated, so the node can start immediately.
+        They should be replaced with a key from the key pool as soon as it is ready.
+        :return: (bool) True if temporary keys were generated
         """
         path = os.path.join('keys')
 
         keys_path_content = os.listdir(path)
 
-        if 'private.key' not in keys_path_content or 'public.key' not in keys_path_content:
-            self.generate_keys(4 * 1024)
-            self.save_keys()
+        temporary = 'private.key' not in keys_path_content or 'public.key' not in keys_path_content
+        if temporary:
+            self.generate_keys(KeyGeneration.TEMPORARY_KEY_LENGTH)
+            self.save_keys(temporary=True)
         self.load_keys()
+        return temporary
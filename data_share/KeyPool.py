@@ -0,0 +1,108 @@
+import os
+import signal
+import threading
+import multiprocessing
+
+from collections import deque
+from multiprocessing import TimeoutError
+from configparser import ConfigParser
+
+import Crypto.Random
+from Crypto.PublicKey import RSA
+
+config = ConfigParser()
+config.read(os.path.join(os.getcwd(), 'config.ini'), encoding='utf-8')
+
+
+def initialize_worker():
+    """
+    This function prepares key pool process (it is forked, so parent's signal handlers and random state are reset).
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    Crypto.Random.atfork()
+
+
+def generate_private_key(key_length):
+    """
+    This function generates private key. It is run in a key pool process.
+    :param key_length: (int)
+    :return: (bytes) private key in PEM format
+    """
+    return RSA.generate(key_length, Crypto.Random.new().read).exportKey()
+
+
+class KeyPool(object):
+    """
+    This class generates RSA keys ahead of need in a separate process, so key generation does not slow down
+    request handling. There are always `KEY_POOL_SIZE` keys generated or being generated.
+    """
+
+    _pool = None
+    _keys = deque()
+    _key_length = 4096
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_size():
+        return config.getint('NODE', 'KEY_POOL_SIZE', fallback=1)
+
+    @staticmethod
+    def _submit():
+        KeyPool._keys.append(KeyPool._pool.apply_async(generate_private_key, (KeyPool._key_length,)))
+
+    @staticmethod
+    def start(key_length=4096):
+        """
+        This function starts key pool process and begins generating keys.
+        :param key_length: (int) length of generated keys
+        """
+        with KeyPool._lock:
+            if KeyPool._pool is not None:
+                return
+            KeyPool._key_length = key_length
+            KeyPool._pool = multiprocessing.get_context('fork').Pool(1, initializer=initialize_worker)
+            for _ in range(KeyPool.get_size()):
+                KeyPool._submit()
+
+    @staticmethod
+    def ready():
+        """
+        This function checks if there is a key that can be taken without waiting.
+        :return: (bool)
+        """
+        with KeyPool._lock:
+            return bool(KeyPool._keys) and KeyPool._keys[0].ready()
+
+    @staticmethod
+    def get_key(timeout=None):
+        """
+        This function takes generated private key from the pool (and starts generating the next one).
+        It waits for the key if the pool is empty.
+        :param timeout: (float) maximum waiting time in seconds (None means no limit)
+        :return: (obj) RSA private key object
+        :raises multiprocessing.TimeoutError: if key was not generated in time
+        """
+        KeyPool.start()
+        with KeyPool._lock:
+            result = KeyPool._keys.popleft()
+            # after a timeout there is one key more than the pool size
+            if len(KeyPool._keys) < KeyPool.get_size():
+                KeyPool._submit()
+
+        try:
+            private_key = result.get(timeout)
+        except TimeoutError:
+            # the key is still being generated, it is given back to be taken by the next call
+            with KeyPool._lock:
+                KeyPool._keys.appendleft(result)
+            raise
+        return RSA.importKey(private_key)
+
+    @staticmethod
+    def shutdown():
+        with KeyPool._lock:
+            if KeyPool._pool is None:
+                return
+            KeyPool._pool.terminate()
+            KeyPool._pool = None
+            KeyPool._keys.clear()
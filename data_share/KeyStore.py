@@ -0,0 +1,98 @@
+import os
+import threading
+
+from collections import OrderedDict
+
+from Crypto.PublicKey import RSA
+
+
+class KeyStore(object):
+    """
+    This class is a process wide cache of RSA keys (from `keys`, `public_keys` and `nodes` folders).
+
+    Files are read and parsed once. Cached entry is reloaded when file modification time or size changes
+    and can be dropped explicitly with `invalidate` (e.g. after key rotation).
+    """
+
+    MAX_IMPORTED_KEYS = 1024
+
+    _files = {}
+    _imported = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _get_file(path):
+        """
+        This function returns cached file content together with parsed key (parsed lazily).
+        :param path: (str) path to a key file
+        :return: (list) file content (str) and parsed key (obj or None)
+        """
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with KeyStore._lock:
+            cached = KeyStore._files.get(path)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+        with open(path, 'r') as file:
+            entry = [file.read(), None]
+
+        with KeyStore._lock:
+            KeyStore._files[path] = (version, entry)
+        return entry
+
+    @staticmethod
+    def read(path):
+        """
+        This function returns content of a key file.
+        :param path: (str) path to a key file
+        :return: (str) key in PEM format
+        :raises FileNotFoundError: if there is no such file
+        """
+        return KeyStore._get_file(path)[0]
+
+    @staticmethod
+    def get_key(path):
+        """
+        This function returns parsed key stored in a file.
+        :param path: (str) path to a key file
+        :return: (obj) RSA key object
+        :raises FileNotFoundError: if there is no such file
+        """
+        entry = KeyStore._get_file(path)
+        if entry[1] is None:
+            entry[1] = KeyStore.import_key(entry[0])
+        return entry[1]
+
+    @staticmethod
+    def import_key(key):
+        """
+        This function parses key given as a string. Recently parsed keys are kept in memory.
+        :param key: (str) key in PEM format
+        :return: (obj) RSA key object
+        """
+        with KeyStore._lock:
+            if key in KeyStore._imported:
+                KeyStore._imported.move_to_end(key)
+                return KeyStore._imported[key]
+
+        parsed_key = RSA.importKey(key)
+
+        with KeyStore._lock:
+            KeyStore._imported[key] = parsed_key
+            while len(KeyStore._imported) > KeyStore.MAX_IMPORTED_KEYS:
+                KeyStore._imported.popitem(last=False)
+        return parsed_key
+
+    @staticmethod
+    def invalidate(path=None):
+        """
+        This function drops cached key file. It should be called when the key is rotated.
+        :param path: (str) path to a key file (None drops all cached files)
+        """
+        with KeyStore._lock:
+            if path is None:
+                KeyStore._files.clear()
+            else:
+                KeyStore._files.pop(path, None)
@@ -1,10 +1,7 @@
-import os
-import json
 import requests
 import urllib
 
-
-NODES_PATH = os.path.join('..', 'nodes')
+from utils.node_registry.NodeRegistry import NodeRegistry
 
 
 class Node(object):
@@ -19,18 +16,16 @@ class Node(object):
 
     @staticmethod
     def get_all_nodes():
-        return [node.split('.')[0] for node in os.listdir(NODES_PATH) if node.endswith(".json")]
+        return list(NodeRegistry.get_nodes())
 
     def load_node_information(self, lab_name):
-        if lab_name not in Node.get_all_nodes():
+        laboratory_informations = NodeRegistry.get_node(lab_name)
+        if laboratory_informations is None:
             raise NameError("There is no laboratory with this name")
 
-        with open(os.path.join(NODES_PATH, '{}.json'.format(lab_name))) as file:
-            laboratory_informations = json.load(file)
-
         self.ip_address = laboratory_informations['address']
-        self.name = laboratory_informations['name']
-        self.public_key = laboratory_informations['public_key']
+        self.name = laboratory_informations['laboratory-name']
+        self.public_key = laboratory_informations['public-key']
 
     def get_node_status(self):
         url = urllib.parse.urlunparse(('http', '{}'.format(self.ip_address), '/', None, '', ''))
@@ -1,46 +1,190 @@
 import json
+import base64
 import logging
 import os
 import datetime
 import re
+import time
 
-from logging.handlers import TimedRotatingFileHandler
 from configparser import ConfigParser
-from flask import Flask, render_template, redirect, url_for, jsonify, request, abort
+from flask import Flask, Response, render_template, redirect, url_for, jsonify, request, abort, g
 
 from data_share.DataShare import DataShare
-from data_share.KeyGeneration import KeyGeneration
-from variant_db.TabixedTableVarinatDB import TabixedTableVarinatDB
+from data_share.KeyStore import KeyStore
+from variant_db.VariantDBFactory import VariantDBFactory
+from variant_db.RegionCache import RegionCache
+from variant_db.RegionBatch import RegionBatch
 from utils.public_variants_handler.PublicVariantsHandler import PublicVariantsHandler
 from utils.request_id_generator.RequestIdGenerator import RequestIdGenerator
 from utils.encryption_key_generator.EncryptionKeyGenerator import EncryptionKeyGenerator
 from utils.user_validation.UserValidation import UserValidation
+from utils.session_store.SessionStore import SessionStore
+from utils.logging_pipeline.LoggingPipeline import LoggingPipeline
+from utils.metrics.Metrics import Metrics
+from utils.request_profiler.RequestProfiler import RequestProfiler
+from utils.node_client.NodeClient import NodeClient
+from utils.node_registry.NodeRegistry import NodeRegistry
+from utils.heartbeat.Heartbeat import Heartbeat
 
 config = ConfigParser()
 config.read(os.path.join(os.getcwd(), 'config.ini'), encoding='utf-8')
 
 server = Flask(__name__)
 
+variant_db = VariantDBFactory.get_variant_db(config.get('DATA', 'VARIANT_DB', fallback='tabix'))
+region_cache = RegionCache(
+    variant_db,
+    max_bytes=config.getint('CACHE', 'REGION_CACHE_MAX_BYTES', fallback=64 * 1024 * 1024),
+    ttl=config.getint('CACHE', 'REGION_CACHE_TTL', fallback=3600),
+)
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
+LoggingPipeline.add_file_handler(logger, 'logs/website/data_haring_website.log')
 
-formatter = logging.Formatter('%(asctime)s:%(name)s:%(funcName)s:%(message)s')
+data_sharing_logger = logging.getLogger('data_sharing')
+data_sharing_logger.setLevel(logging.INFO)
+LoggingPipeline.add_file_handler(data_sharing_logger, 'logs/data_sharing/data_sharing.log')
 
-website_file_rotating_handler = TimedRotatingFileHandler('logs/website/data_haring_website.log', when="midnight", interval=1)
-website_file_rotating_handler.setLevel(logging.INFO)
-website_file_rotating_handler.setFormatter(formatter)
-website_file_rotating_handler.suffix = "%Y-%m-%d"
+Metrics.describe('http_requests_total', 'counter', 'Handled HTTP requests.')
+Metrics.describe('http_request_duration_seconds', 'histogram', 'Time spent in request handlers (streamed bodies excluded).')
 
-logger.addHandler(website_file_rotating_handler)
 
-data_sharing_logger = logging.getLogger('data_sharing')
-data_sharing_logger.setLevel(logging.INFO)
+def collect_component_stats():
+    """
+    This function returns statistics kept by region cache, logging pipeline and node client as metric values.
+    :return: (list) (name, labels, value) tuples
+    """
+    values = []
+    for name, value in region_cache.stats().items():
+        metric_name = 'region_cache_{}'.format(name) if name in ('entries', 'bytes') else 'region_cache_{}_total'.format(name)
+        values.append((metric_name, {}, value))
+    for name, value in LoggingPipeline.get_stats().items():
+        metric_name = 'log_records_queued' if name == 'queued' else 'log_records_{}_total'.format(name)
+        values.append((metric_name, {}, value))
+    for host, stats in NodeClient.get_stats().items():
+        for name in ('requests', 'errors', 'retries'):
+            values.append(('node_client_{}_total'.format(name), {'host': host}, stats[name]))
+        values.append(('node_client_latency_seconds_total', {'host': host}, stats['latency']))
+    return values
+
+
+Metrics.add_collector(collect_component_stats)
+
+
+@server.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if RequestProfiler.should_profile(request.endpoint):
+        g.profile = RequestProfiler.start()
+
+
+@server.after_request
+def record_request_metrics(response):
+    """
+    This function records number and duration of handled requests per endpoint.
+    """
+    endpoint = request.endpoint or 'unknown'
+    Metrics.inc('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+    start = g.get('request_start')
+    if start is not None:
+        Metrics.observe('http_request_duration_seconds', time.perf_counter() - start,
+                        endpoint=endpoint, method=request.method)
+    return response
+
+
+@server.after_request
+def finish_profiling(response):
+    """
+    This function stops profiling of a sampled request. Streamed responses are profiled until the whole body is sent.
+    """
+    state = g.pop('profile', None)
+    if state is None:
+        return response
 
-data_sharing_file_rotating_handler = TimedRotatingFileHandler('logs/data_sharing/data_sharing.log', when="midnight", interval=1)
-data_sharing_file_rotating_handler.setLevel(logging.INFO)
-data_sharing_file_rotating_handler.setFormatter(formatter)
-data_sharing_file_rotating_handler.suffix = "%Y-%m-%d"
-data_sharing_logger.addHandler(data_sharing_file_rotating_handler)
+    endpoint = request.endpoint or 'unknown'
+    params = {'method': request.method, 'url': request.path, 'status': response.status_code}
+
+    def stop():
+        result = RequestProfiler.stop(state, endpoint)
+        logger.info('Profiled request {}: {}'.format(endpoint, dict(params, **result)))
+
+    if response.is_streamed:
+        response.call_on_close(stop)
+    else:
+        stop()
+    return response
+
+
+def stream_public_results(header, rows):
+    """
+    This function generates NDJSON response. The first line holds request information, every next line holds single row.
+    :param header: (dict) request information (request_id, lab_name)
+    :param rows: (generator) rows returned by variant database
+    :return: (generator) NDJSON lines
+    """
+    yield json.dumps(header) + '\n'
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+def stream_private_results(header, rows, encryption_key, transport='base64'):
+    """
+    This function generates encrypted streamed response. The first line holds request information with encryption key.
+    It is followed by stream encrypted with `DataShare.encrypt_stream`, every chunk holds NDJSON with at most
+    `STREAM_CHUNK_ROWS` rows.
+
+    With base64 transport every stream frame is sent as `result` in separate NDJSON line. With raw transport frames are
+    sent as binary data directly after the first line.
+    :param header: (dict) request information (request_id, lab_name, encryption_key)
+    :param rows: (generator) rows returned by variant database
+    :param encryption_key: (str) key used for encrypting chunks
+    :param transport: (str) base64 or raw
+    :return: (generator) response parts
+    """
+    chunk_rows = config.getint('NODE', 'STREAM_CHUNK_ROWS', fallback=1000)
+
+    def row_chunks():
+        chunk = []
+        for row in rows:
+            chunk.append(json.dumps(row) + '\n')
+            if len(chunk) >= chunk_rows:
+                yield ''.join(chunk)
+                chunk = []
+        if chunk:
+            yield ''.join(chunk)
+
+    header = dict(header, transport=transport)
+    if transport == 'raw':
+        yield (json.dumps(header) + '\n').encode()
+        yield from DataShare.encrypt_stream(row_chunks(), encryption_key)
+    else:
+        yield json.dumps(header) + '\n'
+        for frame in DataShare.encrypt_stream(row_chunks(), encryption_key):
+            yield json.dumps({'result': base64.b64encode(frame).decode()}) + '\n'
+
+
+def get_response_encryption(params, public_key, request_id):
+    """
+    This function prepares encryption key for private response.
+
+    If request holds `session_id` the key is derived from session key, otherwise new key is generated and wrapped
+    with user public key. Invalid or expired session results in 401 status code.
+    :param params: (dict) request json information
+    :param public_key: (str) user public key
+    :param request_id: (str) response request id
+    :return: (tuple) encryption key and dictionary with fields needed by the user to recover it
+    """
+    if 'session_id' in params:
+        session_key = SessionStore.get_session_key(params['session_id'], params['user_id'])
+        if session_key is None:
+            data_sharing_logger.info('Session expired. User id:{}'.format(params['user_id']))
+            abort(401, 'Session expired.')
+        return SessionStore.derive_key(session_key, request_id), {'session_id': params['session_id']}
+
+    encryption_key = EncryptionKeyGenerator().generate_encryption_key()
+    data_sharing_logger.debug('Encryption key: {}'.format(encryption_key))
+    return encryption_key, {'encryption_key': DataShare.encrypt_using_public_key(encryption_key, params['user_id'], public_key)}
 
 
 @server.route("/")
@@ -52,6 +196,53 @@ def home():
     return render_template('index.html', **data)
 
 
+@server.route('/profiling', methods=['POST'])
+def profiling():
+    """
+    This function changes profiling settings of all server processes. Message has to be signed by one of
+    `ADMIN_USERS` and can not be older than `MAX_MESSAGE_AGE` seconds. Without `enabled` field current settings
+    are returned.
+    :return: (json) profiling settings
+    """
+    data = request.json
+    admin_users = [user for user in re.split(r'[,\s]+', config.get('PROFILING', 'ADMIN_USERS', fallback='')) if user]
+    if data is None or data.get('user_id') not in admin_users:
+        abort(401)
+
+    try:
+        public_key = KeyStore.read(os.path.join('public_keys', 'public.{}.key'.format(data['user_id'])))
+    except FileNotFoundError:
+        abort(401)
+
+    if not DataShare.validate_signature_from_message(data, public_key=public_key):
+        abort(401)
+
+    max_age = config.getint('PROFILING', 'MAX_MESSAGE_AGE', fallback=300)
+    if not isinstance(data.get('timestamp'), (int, float)) or abs(time.time() - data['timestamp']) > max_age:
+        logger.info('Profiling message of {} expired.'.format(data['user_id']))
+        abort(401)
+
+    if 'enabled' not in data:
+        return jsonify(RequestProfiler.get_settings())
+
+    try:
+        settings = RequestProfiler.configure(
+            data['enabled'], data.get('sample_rate', 1.0), data.get('endpoints'), data.get('duration')
+        )
+    except (TypeError, ValueError):
+        abort(400)
+    logger.info('Profiling settings changed by {}: {}'.format(data['user_id'], settings))
+    return jsonify(settings)
+
+
+@server.route('/metrics')
+def metrics():
+    """
+    This function returns metrics of all server processes in Prometheus text format.
+    """
+    return Response(Metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 @server.errorhandler(404)
 def page_not_found(error):
     """
@@ -76,7 +267,7 @@ def receive_data():
     """
     if request.method == 'POST':
         data = json.loads(request.get_json())
-        print('Data received: ' + json.dumps(data))
+        logger.debug('Data received: %s', data)
         if not DataShare.validate_signature_from_message(data):
             logger.info("Invalid signature.")
             abort(403, "Invalid signature.")
@@ -116,11 +307,8 @@ def add_node():
 
         data_sharing_logger.info('Add node: {}'.format(data))
 
-        with open(os.path.join('nodes', '{}.json'.format(data['laboratory-name'])), 'w') as file:
-            json.dump(data, file)
-
-        with open(os.path.join('nodes', 'public.{}.key'.format(data['laboratory-name'])), 'w') as file:
-            file.writelines(data['public-key'])
+        NodeRegistry.add_node(data)
+        KeyStore.invalidate(os.path.join('nodes', 'public.{}.key'.format(data['laboratory-name'])))
 
         return 'Success', 200
     abort(403)
@@ -139,18 +327,16 @@ def variants_public():
         chr (str): chromosome number
         start (str): starting point
         end (str): end point
+        stream (bool): if true the result is sent as NDJSON (request information line and then one line per row)
 
     Having bad post arguments will result in 406 status code.
+    Reaching the daily limit or the per client limit will result in 429 status code.
     Having problems with running tabix will result in 500 internal error status code.
     """
     if request.method == 'POST':
-        if PublicVariantsHandler.get_limit_left() <= 0:
-            logger.info("Public request reached.")
-            abort(400, 'Limit reached.')
-
         try:
             params = request.get_json()
-            print(params)
+            logger.debug('Public request: %s', params)
             try:
                 genome_build = params['genome_build']
             except KeyError as e:
@@ -176,14 +362,26 @@ def variants_public():
             logger.exception(e)
             return abort(500)
 
+        if not PublicVariantsHandler.try_acquire(request.remote_addr):
+            logger.info("Public request limit reached.")
+            abort(429, 'Limit reached.')
+
         try:
-            chromosome_results = TabixedTableVarinatDB.get_variants(chrom, start, start, genome_build)
+            if params.get('stream'):
+                header = {
+                    'request_id': RequestIdGenerator.generate_random_id(),
+                    'lab_name': config.get('NODE', 'LABORATORY_NAME'),
+                }
+                data_sharing_logger.info('{} - {}'.format(header['request_id'], params))
+                rows = variant_db.get_variants(chrom, start, start, genome_build)
+                return Response(stream_public_results(header, rows), mimetype='application/x-ndjson')
+
+            chromosome_results = region_cache.get_variants(chrom, start, start, genome_build)
             response = {
                 'request_id': RequestIdGenerator.generate_random_id(),
                 'lab_name': config.get('NODE', 'LABORATORY_NAME'),
                 'result': list(chromosome_results)
             }
-            PublicVariantsHandler.decrease_number_of_requests_left()
             data_sharing_logger.info('{} - {}'.format(response['request_id'], params))
             return json.dumps(response), 200
         except Exception as e:
@@ -213,6 +411,11 @@ def variants_private():
         start (str): starting point
         end (str): end point
         signature (str): TODO
+        stream (bool): if true the result is sent as stream (request information line with encryption key followed by
+            authenticated encrypted chunks of rows), so the memory usage does not depend on the size of the region
+        transport (str): hex (default) or base64 encoding of the result, for streamed result base64 (default) or raw
+        session_id (str): session negotiated at /session endpoint, if given the result is encrypted with key derived
+            from session key instead of new key wrapped with user public key
 
     Having bad post arguments will result in 406 status code.
     Having problems with running tabix will result in 500 internal error status code.
@@ -239,13 +442,22 @@ def variants_private():
                 genome_build = 'hg19'
 
             if 'end' in param_keys and 'start' in param_keys and 'chrom' in param_keys:
-                chromosome_results = TabixedTableVarinatDB.get_variants(params['chrom'], params['start'], params['end'], genome_build)
+                query = (params['chrom'], params['start'], params['end'])
             elif 'start' in param_keys and 'chrom' in param_keys:
-                chromosome_results = TabixedTableVarinatDB.get_variants(params['chrom'], params['start'], params['start'], genome_build)
+                query = (params['chrom'], params['start'], params['start'])
             elif 'chrom' in param_keys:
-                chromosome_results = TabixedTableVarinatDB.get_variants(params['chrom'], genome_build)
+                query = (params['chrom'], None, None)
+            else:
+                query = None
+
+            transport = params.get('transport', 'base64' if params.get('stream') else 'hex')
+            if transport not in (('base64', 'raw') if params.get('stream') else ('hex', 'base64')):
+                return abort(406, 'Invalid transport.')
+
+            if params.get('stream'):
+                chromosome_results = [] if query is None else variant_db.get_variants(*query, genome_type=genome_build)
             else:
-                chromosome_results = []
+                chromosome_results = [] if query is None else region_cache.get_variants(*query, genome_type=genome_build)
 
         except KeyError as e:
             data_sharing_logger.exception(e)
@@ -254,15 +466,26 @@ def variants_private():
             data_sharing_logger.exception(e)
             return abort(406, 'Invalid type or data not supplied.')
 
+        request_id = RequestIdGenerator.generate_random_id()
+        _new_encryption_key, encryption_information = get_response_encryption(params, public_key, request_id)
+
         try:
-            _new_encryption_key = EncryptionKeyGenerator().generate_encryption_key()
-            data_sharing_logger.debug('Encryption key: {}'.format(_new_encryption_key))
+            if params.get('stream'):
+                header = {
+                    'request_id': request_id,
+                    'lab_name': config.get('NODE', 'LABORATORY_NAME'),
+                    **encryption_information,
+                }
+                data_sharing_logger.info('{} - {}'.format(header['request_id'], params))
+                return Response(stream_private_results(header, chromosome_results, _new_encryption_key, transport),
+                                mimetype='application/octet-stream' if transport == 'raw' else 'application/x-ndjson')
 
             response = {
-                'request_id': RequestIdGenerator.generate_random_id(),
+                'request_id': request_id,
                 'lab_name': config.get('NODE', 'LABORATORY_NAME'),
-                'encryption_key': DataShare.encrypt_using_public_key(_new_encryption_key, params['user_id'], public_key),
-                'result': DataShare.encrypt_data(json.dumps(list(chromosome_results)), _new_encryption_key)
+                **encryption_information,
+                'transport': transport,
+                'result': DataShare.encrypt_data(json.dumps(list(chromosome_results)), _new_encryption_key, transport)
             }
             data_sharing_logger.info('{} - {}'.format(response['request_id'], params))
             return json.dumps(response), 200
@@ -278,29 +501,118 @@ def variants_private():
     return render_template('private_variants.html', **data)
 
 
-def get_all_nodes_info():
-    nodes_path = os.path.join('nodes')
-    nodes = [node for node in os.listdir(nodes_path) if node.endswith('.json')]
-    my_keys = ['address', 'public-key', 'laboratory-name']
+@server.route('/variants-private-batch', methods=['GET', 'POST'])
+def variants_private_batch():
+    """
+    This is a private variant download api that will return variants for many regions at once.
+
+    As a GET request is presents a website how to use this endpoint.
+
+    As a POST request is returns information about variants in all regions given in the POST request data.
+    Signature validation and encryption key wrapping are performed once for the whole batch.
+    POST arguments:
+        genome_build (str): information about the genome build (hg19 or hg38)
+        regions (list): dictionaries with chrom, start and optional end keys
+        transport (str): hex (default) or base64 encoding of the result
+        session_id (str): session negotiated at /session endpoint (optional)
+        user_id (str): user identification string
+        signature (str): signature of the request
+
+    Result is a list with chrom, start, end and result for every requested region (in request order).
 
-    nodes_information = []
-    for node_path in [os.path.join(nodes_path, node) for node in nodes]:
+    Having bad post arguments will result in 406 status code.
+    Having problems with reading variants will result in 500 internal error status code.
+    """
+    if request.method == 'POST':
+        params = request.get_json()
         try:
-            with open(node_path, 'r') as file:
-                node_info = json.load(file)
-        except json.decoder.JSONDecodeError as e:
-            logger.exception(e)
-            continue
+            valid_signature, public_key = DataShare.validate_signature(params)
+            if not valid_signature:
+                data_sharing_logger.info("Invalid signature. User id:{}".format(params['user_id']))
+                abort(403, "Invalid signature.")
+        except KeyError:
+            data_sharing_logger.info("Signature not provided.")
+            abort(406, "Invalid data supplied.")
+        except FileNotFoundError:
+            data_sharing_logger.info("No public key supports this request.")
+            abort(400)
+
+        try:
+            genome_build = params.get('genome_build', 'hg19')
+            regions = RegionBatch.parse_regions(params['regions'])
+            transport = params.get('transport', 'hex')
+            if transport not in ('hex', 'base64'):
+                raise ValueError('Invalid transport {}.'.format(transport))
+        except (KeyError, TypeError, ValueError) as e:
+            data_sharing_logger.exception(e)
+            return abort(406, 'Invalid regions supplied.')
+
+        if len(regions) > config.getint('NODE', 'MAX_BATCH_REGIONS', fallback=1000):
+            return abort(406, 'Too many regions supplied.')
+
+        request_id = RequestIdGenerator.generate_random_id()
+        _new_encryption_key, encryption_information = get_response_encryption(params, public_key, request_id)
+
+        try:
+            grouped_results = RegionBatch.get_variants(region_cache, regions, genome_build)
+
+            response = {
+                'request_id': request_id,
+                'lab_name': config.get('NODE', 'LABORATORY_NAME'),
+                **encryption_information,
+                'transport': transport,
+                'result': DataShare.encrypt_data(json.dumps(grouped_results), _new_encryption_key, transport)
+            }
+            data_sharing_logger.info('{} - {}'.format(response['request_id'], params))
+            return json.dumps(response), 200
+        except Exception as e:
+            data_sharing_logger.exception(e)
+            return abort(500)
+
+    data = {
+        'lab_name': config.get('NODE', 'LABORATORY_NAME'),
+        'lab_address': '{}{}'.format(config.get('NODE', 'NODE_ADDRESS'), 'variants-private-batch'),
+    }
+    logger.info("Private batch variants rendered")
+    return render_template('private_variants_batch.html', **data)
+
+
+@server.route('/session', methods=['GET', 'POST'])
+def session():
+    """
+    This function negotiates symmetric session key for private queries.
+
+    As a get request this function will give 400 bad request status code.
+
+    As a post request (signed by the user) this function creates session and returns its id together with session key
+    wrapped with user public key. Passing `session_id` of the current session rotates it (the old one is closed).
+    Responses for requests with `session_id` are encrypted with keys derived from session key and response request_id
+    (HMAC-SHA256), so the user does not need to perform RSA decryption for every response.
+    """
+    if request.method == 'POST':
+        params = request.get_json()
+        try:
+            valid_signature, public_key = DataShare.validate_signature(params)
+            if not valid_signature:
+                data_sharing_logger.info("Invalid signature. User id:{}".format(params['user_id']))
+                abort(403, "Invalid signature.")
+        except KeyError:
+            data_sharing_logger.info("Signature not provided.")
+            abort(406, "Invalid data supplied.")
+        except FileNotFoundError:
+            data_sharing_logger.info("No public key supports this request.")
+            abort(400)
 
-        nodes_information.append({key: node_info[key] for key in my_keys})
+        session_id, session_key, expires = SessionStore.create_session(params['user_id'], params.get('session_id'))
+        response = {
+            'session_id': session_id,
+            'encryption_key': DataShare.encrypt_using_public_key(session_key, params['user_id'], public_key),
+            'expires': expires,
+        }
+        data_sharing_logger.info('Session created. User id:{}'.format(params['user_id']))
+        return jsonify(response)
 
-    my_lab_name = config.get('NODE', 'LABORATORY_NAME')
-    my_lab_address = config.get('NODE', 'NODE_ADDRESS')
-    keys = KeyGeneration()
-    keys.load_keys()
-    my_public_key = keys.public_key.exportKey().decode()
-    nodes_information.append({'address': my_lab_address, 'public-key': my_public_key, 'laboratory-name': my_lab_name})
-    return nodes_information
+    abort(400)
 
 
 @server.route('/nodes', methods=['GET', 'POST'])
@@ -308,24 +620,22 @@ def available_nodes():
     """
     As a get request this function renders /nodes webpage on which nodes that are available are presented.
 
-    As a post request this function will return information about all available nodes.
+    As a post request this function will return information about all nodes of the federation. Response has ETag,
+    so it can be revalidated (with If-None-Match header) and 304 is returned if nodes have not changed.
     """
-    available_nodes_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'nodes_available', 'nodes_available.json')
-
-    try:
-        with open(available_nodes_path, 'r') as json_file:
-            nodes = json.load(json_file)
-    except FileNotFoundError:
-        logger.exception('Nodes available not found.')
-        nodes = {}
-
     if request.method == 'POST':
-        return jsonify(get_all_nodes_info())
+        body, etag = NodeRegistry.export()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        return response
 
     data = {
         'lab_name': config.get('NODE', 'LABORATORY_NAME')
     }
-    return render_template('nodes.html', nodes=nodes, **data)
+    return render_template('nodes.html', nodes=NodeRegistry.get_availability(), **data)
 
 
 @server.route('/check-user', methods=['GET', 'POST'])
@@ -341,8 +651,7 @@ def check_user():
         data = request.json
 
         try:
-            with open(os.path.join('nodes', 'public.{}.key'.format(data['request_node'])), 'r') as file:
-                public_key = file.read()
+            public_key = KeyStore.read(os.path.join('nodes', 'public.{}.key'.format(data['request_node'])))
         except FileNotFoundError as e:
             data_sharing_logger.exception("Remote user check failed. Request: {}".format(data))
             data_sharing_logger.exception(e)
@@ -376,8 +685,7 @@ def update_keys():
     if 'user_id' in keys:
         public_key_path = os.path.join('public_keys', 'public.{}.key'.format(data['user_id']))
         try:
-            with open(public_key_path, 'r') as file:
-                public_key = file.read()
+            public_key = KeyStore.read(public_key_path)
         except FileNotFoundError as e:
             data_sharing_logger.info('No user id {}, present in node'.format(data['user_id']))
             abort(400)
@@ -390,8 +698,11 @@ def update_keys():
             new_public_key = os.path.join('public_keys', 'public.{}.key'.format(data['user_id']))
             with open(new_public_key, 'w') as file:
                 file.writelines(data['public_key'])
+            KeyStore.invalidate(new_public_key)
 
             UserValidation.update_expiration_key_date(data['user_id'])
+            SessionStore.close_user_sessions(data['user_id'])
+            UserValidation.invalidate_remote_user(data['user_id'])
             data_sharing_logger.info('User {} updated key.'.format(data['user_id']))
         except Exception as e:
             data_sharing_logger.error('Error in user_id update key')
@@ -401,20 +712,24 @@ def update_keys():
     if 'node' in keys:
         public_key_path = os.path.join('nodes', 'public.{}.key'.format(data['node']))
         try:
-            with open(public_key_path, 'r') as file:
-                public_key = file.read()
+            public_key = KeyStore.read(public_key_path)
         except FileNotFoundError as e:
             data_sharing_logger.info('No node {}, present in node'.format(data['node']))
             abort(400)
 
+        # the same update can be sent again if node acknowledgement was lost
+        if public_key.strip() == data['public_key'].strip():
+            return "Success", 200
+
         if not DataShare.validate_signature_from_message(data, public_key=public_key):
             data_sharing_logger.info('Node {}, invalid signature'.format(data['node']))
             abort(400)
 
         try:
-            new_public_key = os.path.join('nodes', 'public.{}.key'.format(data['node']))
-            with open(new_public_key, 'w') as file:
-                file.writelines(data['public_key'])
+            NodeRegistry.update_public_key(data['node'], data['public_key'])
+            KeyStore.invalidate(public_key_path)
+            UserValidation.invalidate_remote_user(node=data['node'])
+            Heartbeat.invalidate(data['node'])
 
             data_sharing_logger.info('Node {} updated key.'.format(data['node']))
         except Exception:
@@ -435,8 +750,7 @@ def check_key():
 
     public_key_path = os.path.join('public_keys', 'public.{}.key'.format(data['user_id']))
     try:
-        with open(public_key_path, 'r') as file:
-            public_key = file.read()
+        public_key = KeyStore.read(public_key_path)
     except FileNotFoundError as e:
         abort(400)
 
@@ -451,8 +765,7 @@ def check_node():
     if request.method == 'POST':
         data = request.json
         try:
-            with open(os.path.join('nodes', 'public.{}.key'.format(data['request_node'])), 'r') as file:
-                public_key = file.read()
+            public_key = KeyStore.read(os.path.join('nodes', 'public.{}.key'.format(data['request_node'])))
         except FileNotFoundError as e:
             data_sharing_logger.exception("Remote node check failed. Request: {}".format(data))
             data_sharing_logger.exception(e)
@@ -464,3 +777,38 @@ def check_node():
 
         return 'Success', 200
     return 'Success', 200
+
+
+@server.route('/heartbeat-key', methods=['POST'])
+def heartbeat_key():
+    """
+    This function agrees MAC key used for heartbeats with other node. The request has to be signed with the node key.
+    :return: (json) MAC key encrypted with public key of the node, signed with this node key
+    """
+    data = request.json
+    if not data or not isinstance(data, dict):
+        abort(400)
+
+    answer = Heartbeat.accept_handshake(data)
+    if answer is None:
+        data_sharing_logger.info('Heartbeat key not agreed with node {}'.format(data.get('request_node')))
+        abort(401)
+
+    data_sharing_logger.info('Heartbeat key agreed with node {}'.format(data['request_node']))
+    return jsonify(answer)
+
+
+@server.route('/heartbeat', methods=['POST'])
+def heartbeat():
+    """
+    This function answers HMAC authenticated heartbeat of other node.
+    :return: (json) answer authenticated with the same key
+    """
+    data = request.json
+    if not data or not isinstance(data, dict):
+        abort(400)
+
+    answer = Heartbeat.answer(data)
+    if answer is None:
+        abort(401)
+    return jsonify(answer)
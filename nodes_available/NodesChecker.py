@@ -1,29 +1,45 @@
 import os
-import requests
+import time
 import json
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, wait
 
 from data_share import DataShare
+from utils.heartbeat.Heartbeat import Heartbeat
+from utils.metrics.Metrics import Metrics
+from utils.node_client.NodeClient import NodeClient
+from utils.node_registry.NodeRegistry import NodeRegistry
 from utils.request_id_generator.RequestIdGenerator import RequestIdGenerator
 
 from configparser import ConfigParser
 from urllib.parse import urljoin
 
-NODES_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'nodes')
-
 config = ConfigParser()
 config.read(os.path.join(os.getcwd(), 'config.ini'), encoding='utf-8')
 
 
 class NodesChecker(object):
+    """
+    This class checks availability of other nodes.
+
+    Nodes are checked with HMAC authenticated heartbeats (see `Heartbeat`). Nodes which do not support heartbeats
+    are checked with RSA signed message, which is signed once and reused for `CHECK_MESSAGE_TTL` seconds.
+    """
+
+    CHECK_MESSAGE_TTL = 30
+
+    _check_message = None
+    _lock = threading.Lock()
 
     @staticmethod
     def get_all_nodes():
         """
         This function will get all nodes minus host node.
-        :return: (list)
+        :return: (list) laboratory names
         """
         this_node = config.get('NODE', 'LABORATORY_NAME')
-        return [node for node in os.listdir(NODES_PATH) if node.endswith(".json") and not node.startswith(this_node)]
+        return [node for node in NodeRegistry.get_nodes() if node != this_node]
 
     @staticmethod
     def get_node_information(node_name):
@@ -31,53 +47,120 @@ class NodesChecker(object):
         This function returns information about the node given by its name
         :param node_name: (str) laboratory name
         :return: (dict) information about the node.
+        :raises ValueError: if there is no such node
         """
-        with open(os.path.join(NODES_PATH, node_name)) as f:
-            node_information = json.load(f)
+        node_information = NodeRegistry.get_node(node_name)
+        if node_information is None:
+            raise ValueError('There is no node {}'.format(node_name))
         return node_information
 
     @staticmethod
-    def get_node_availability(node_information, address_key='address'):
+    def get_check_message():
+        """
+        This function prepares signed message for node checks. The same message is used for all nodes
+        for `CHECK_MESSAGE_TTL` seconds.
+        :return: (dict) signed message
+        """
+        with NodesChecker._lock:
+            if NodesChecker._check_message is not None and \
+                    time.monotonic() - NodesChecker._check_message[0] < NodesChecker.CHECK_MESSAGE_TTL:
+                return dict(NodesChecker._check_message[1])
+
+            data = {
+                'request_node': config.get('NODE', 'LABORATORY_NAME'),
+                'request_id': RequestIdGenerator.generate_random_id()
+            }
+            data = dict(sorted(data.items()))
+            data.update({'signature': DataShare.get_signature_for_message(data).decode()})
+            NodesChecker._check_message = (time.monotonic(), data)
+            return dict(data)
+
+    @staticmethod
+    def get_node_availability(node_information, address_key='address', message=None):
         """
         This function checks if specific node is available.
         :param node_information: (dict)
         :param address_key: (str) default 'address' holds key value for address
+        :param message: (dict) signed check message used if the node does not support heartbeats
         :return: (bool) says if node is available for data sharing
         """
         try:
-            request_address = urljoin(node_information[address_key], 'check-node')
+            address = node_information[address_key]
+            request_address = urljoin(address, 'check-node')
         except KeyError:
             return False
 
         try:
-            data = {
-                'request_node': config.get('NODE', 'LABORATORY_NAME'),
-                'request_id': RequestIdGenerator.generate_random_id()
-            }
-            data = dict(sorted(data.items()))
-            data.update({'signature': DataShare.get_signature_for_message(data).decode()})
-            return requests.post(request_address, json=data).status_code == 200
+            timeout = (config.getfloat('NODE', 'NODE_CHECK_CONNECT_TIMEOUT', fallback=3),
+                       config.getfloat('NODE', 'NODE_CHECK_READ_TIMEOUT', fallback=10))
+            availability = Heartbeat.send(address, node_information['laboratory-name'], timeout)
+            if availability is not None:
+                return availability
+
+            if message is None:
+                message = NodesChecker.get_check_message()
+            return NodeClient.post(request_address, json=message, timeout=timeout, retries=0).status_code == 200
         except Exception:
             return False
 
+    @staticmethod
+    def check_node(node_information, message=None):
+        """
+        This function checks node availability and measures the time of the check.
+        :param node_information: (dict)
+        :param message: (dict) signed check message (used if the node does not support heartbeats)
+        :return: (dict) availability, address and latency (in seconds) of the node
+        """
+        start = time.monotonic()
+        availability = NodesChecker.get_node_availability(node_information, message=message)
+        latency = time.monotonic() - start
+
+        node = node_information.get('laboratory-name')
+        Metrics.observe('node_check_seconds', latency, node=node)
+        Metrics.inc('node_checks_total', node=node, available=str(availability).lower())
+        return {
+            'availability': availability,
+            'address': node_information.get('address'),
+            'latency': round(latency, 4),
+        }
+
     @staticmethod
     def get_all_nodes_availability():
         """
         This function will check availability of all nodes and save this information to a file.
+
+        Nodes are checked concurrently (at most `NODE_CHECK_WORKERS` at a time). Nodes not answering before
+        `NODE_CHECK_DEADLINE` seconds are marked as unavailable. The file is replaced atomically once all results are known.
         :return: (dict) nodes availability information
         """
-        all_nodes = NodesChecker.get_all_nodes()
+        nodes = []
+        for node in NodesChecker.get_all_nodes():
+            try:
+                nodes.append(NodesChecker.get_node_information(node))
+            except (OSError, ValueError):
+                continue
 
         node_availability = {}
-        for node in all_nodes:
-            node = NodesChecker.get_node_information(node)
-            data = {
-                'availability': NodesChecker.get_node_availability(node),
-                'address': node['address']
-            }
-            node_availability[node['laboratory-name']] = data
+        if nodes:
+            workers = min(config.getint('NODE', 'NODE_CHECK_WORKERS', fallback=16), len(nodes))
+            executor = ThreadPoolExecutor(max_workers=workers)
+            futures = {executor.submit(NodesChecker.check_node, node): node for node in nodes}
+            done, _ = wait(futures, timeout=config.getfloat('NODE', 'NODE_CHECK_DEADLINE', fallback=30))
+            executor.shutdown(wait=False)
+
+            for future, node in futures.items():
+                if future in done:
+                    data = future.result()
+                else:
+                    future.cancel()
+                    data = {'availability': False, 'address': node.get('address'), 'latency': None, 'timeout': True}
+                node_availability[node['laboratory-name']] = data
 
-        with open(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'nodes_available.json'), 'w') as json_file:
+        nodes_available_path = NodeRegistry.AVAILABILITY_FILE
+        os.makedirs(os.path.dirname(nodes_available_path), exist_ok=True)
+        temporary_path = '{}.{}.tmp'.format(nodes_available_path, os.getpid())
+        with open(temporary_path, 'w') as json_file:
             json.dump(node_availability, json_file)
+        os.replace(temporary_path, nodes_available_path)
 
         return node_availability
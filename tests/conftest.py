@@ -0,0 +1,14 @@
+import pytest
+
+from utils.shared_state.SharedState import SharedState
+
+
+@pytest.fixture(autouse=True)
+def shared_state(monkeypatch, tmp_path):
+    """
+    Every test gets its own shared state database.
+    """
+    monkeypatch.setattr(SharedState, 'get_database_path', staticmethod(lambda: str(tmp_path / 'shared_state.db')))
+    SharedState._local.connection = None
+    yield
+    SharedState._local.connection = None
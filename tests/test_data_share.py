@@ -31,3 +31,24 @@ def test_pad():
 
     unpadded = data_share.Pad.unpad(padded_message)
     assert unpadded == b'dawid'
+
+
+def test_stream_encryption():
+    chunks = [b'first chunk', 'second chunk', b'', b'x' * 100000]
+    encrypted = b''.join(data_share.DataShare.encrypt_stream(chunks, 'k' * 32))
+    pieces = [encrypted[i:i + 1000] for i in range(0, len(encrypted), 1000)]
+
+    decrypted = list(data_share.DataShare.decrypt_stream(pieces, 'k' * 32))
+    assert decrypted == [b'first chunk', b'second chunk', b'', b'x' * 100000]
+
+
+def test_stream_tampering():
+    encrypted = b''.join(data_share.DataShare.encrypt_stream([b'first chunk', b'second chunk'], 'k' * 32))
+
+    with pytest.raises(ValueError):
+        list(data_share.DataShare.decrypt_stream([encrypted[:-1]], 'k' * 32))
+
+    modified = bytearray(encrypted)
+    modified[30] ^= 1
+    with pytest.raises(ValueError):
+        list(data_share.DataShare.decrypt_stream([bytes(modified)], 'k' * 32))
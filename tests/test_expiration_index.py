@@ -0,0 +1,75 @@
+import os
+import json
+import datetime
+import multiprocessing
+
+from utils.user_validation.ExpirationIndex import ExpirationIndex
+
+
+def use_folder(monkeypatch, tmp_path):
+    monkeypatch.setattr(ExpirationIndex, 'EXPIRATION_DATES_FILE', str(tmp_path / 'expiration_dates.json'))
+    monkeypatch.setattr(ExpirationIndex, 'PUBLIC_KEYS_FOLDER', str(tmp_path / 'public_keys'))
+    os.mkdir(str(tmp_path / 'public_keys'))
+    ExpirationIndex.clear()
+
+
+def add_key(tmp_path, user_id):
+    open(str(tmp_path / 'public_keys' / 'public.{}.key'.format(user_id)), 'w').close()
+
+
+def test_new_keys_are_added_incrementally(monkeypatch, tmp_path):
+    use_folder(monkeypatch, tmp_path)
+    date = datetime.date(2030, 1, 1)
+    add_key(tmp_path, 'a@lab')
+
+    assert ExpirationIndex.add_new_keys(date) == ['a@lab']
+    assert ExpirationIndex.add_new_keys(date) == []
+
+    add_key(tmp_path, 'b@lab')
+    os.utime(str(tmp_path / 'public_keys'), ns=(1, 1))
+    assert ExpirationIndex.add_new_keys(date) == ['b@lab']
+
+    with open(str(tmp_path / 'expiration_dates.json')) as file:
+        assert json.load(file) == {'a@lab': '2030-01-01', 'b@lab': '2030-01-01'}
+
+
+def test_updates_are_written_through(monkeypatch, tmp_path):
+    use_folder(monkeypatch, tmp_path)
+    ExpirationIndex.set_expiration_date('a@lab', datetime.date(2030, 1, 1))
+
+    with open(str(tmp_path / 'expiration_dates.json')) as file:
+        assert json.load(file) == {'a@lab': '2030-01-01'}
+    assert ExpirationIndex.get_expiration_date('a@lab') == datetime.date(2030, 1, 1)
+    assert ExpirationIndex.get_expiration_date('b@lab') is None
+
+
+def test_file_changed_by_other_process_is_reloaded(monkeypatch, tmp_path):
+    use_folder(monkeypatch, tmp_path)
+    ExpirationIndex.set_expiration_date('a@lab', datetime.date(2030, 1, 1))
+
+    with open(str(tmp_path / 'expiration_dates.json'), 'w') as file:
+        json.dump({'a@lab': '2000-01-01', 'b@lab': '2031-02-03'}, file)
+
+    assert ExpirationIndex.get_expiration_date('a@lab') == datetime.date(2000, 1, 1)
+    assert ExpirationIndex.get_expiration_date('b@lab') == datetime.date(2031, 2, 3)
+
+
+def test_updates_of_other_processes_are_not_lost(monkeypatch, tmp_path):
+    use_folder(monkeypatch, tmp_path)
+    ExpirationIndex.set_expiration_date('a@lab', datetime.date(2030, 1, 1))
+
+    def update(process_number):
+        for user_number in range(20):
+            user_id = '{}-{}@lab'.format(process_number, user_number)
+            ExpirationIndex.set_expiration_date(user_id, datetime.date(2030, 1, 1))
+
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=update, args=(process_number,)) for process_number in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+
+    with open(str(tmp_path / 'expiration_dates.json')) as file:
+        assert len(json.load(file)) == 1 + 4 * 20
+    assert ExpirationIndex.get_expiration_date('3-19@lab') == datetime.date(2030, 1, 1)
@@ -0,0 +1,72 @@
+import os
+import json
+
+import requests
+
+from configparser import ConfigParser
+
+from utils.federation_harness.FederationHarness import FederationHarness, parse_overrides
+from utils.federation_harness.LoadDriver import LoadDriver
+
+
+def test_nodes_are_prepared_and_cross_registered(tmp_path):
+    harness = FederationHarness(nodes=2, base_port=9000, workdir=str(tmp_path), variants=300, key_length=1024,
+                                overrides=parse_overrides(['CACHE.REGION_CACHE_MAX_BYTES=0']))
+    harness.prepare()
+
+    first, second = harness.names
+    path = harness.get_node_path(first)
+
+    node_config = ConfigParser()
+    node_config.read(os.path.join(path, 'config.ini'))
+    assert node_config.get('NODE', 'LABORATORY_NAME') == first
+    assert node_config.get('NODE', 'NODE_ADDRESS') == 'http://127.0.0.1:9000/'
+    assert node_config.get('CACHE', 'REGION_CACHE_MAX_BYTES') == '0'
+    assert os.path.isfile(os.path.join(path, 'data', 'hg19', node_config.get('DATA', 'HG_19_FILENAME') + '.tbi'))
+    # short keys are marked to be replaced on start
+    assert os.path.isfile(os.path.join(path, 'keys', 'temporary'))
+
+    with open(os.path.join(path, 'nodes', '{}.json'.format(second))) as file:
+        information = json.load(file)
+    with open(os.path.join(harness.get_node_path(second), 'keys', 'public.key')) as file:
+        assert information['public-key'] == file.read()
+    assert information['address'] == 'http://127.0.0.1:9001/'
+    assert not os.path.exists(os.path.join(path, 'nodes', '{}.json'.format(first)))
+
+    with open(os.path.join(path, 'nodes_available', 'nodes_available.json')) as file:
+        assert json.load(file)[second]['address'] == 'http://127.0.0.1:9001/'
+
+    assert sorted(user_id.split('@')[1] for user_id in harness.users) == [first, second]
+    for user_id in harness.users:
+        user_path = harness.get_node_path(user_id.split('@')[1])
+        assert os.path.isfile(os.path.join(user_path, 'public_keys', 'public.{}.key'.format(user_id)))
+
+
+class Response(object):
+    status_code = 200
+    content = b'{"result": []}'
+
+
+def test_load_driver_reports_every_endpoint(monkeypatch):
+    sent = []
+
+    def post(session, url, json=None, timeout=None):
+        sent.append((url, json))
+        if len(sent) % 5 == 0:
+            raise requests.ConnectionError()
+        return Response()
+
+    monkeypatch.setattr(requests.Session, 'post', post)
+    queries = {'point': [('1', 100, 100)], 'range': [('1', 100, 200)]}
+    driver = LoadDriver({'a': 'http://a/', 'b': 'http://b/'}, {}, queries, LoadDriver.parse_mix('public=1'))
+
+    results = driver.run(concurrency=3, requests_count=20)
+
+    assert results['requests'] == 20
+    statistics = results['endpoints']['variants']
+    assert statistics['requests'] == 20
+    assert statistics['errors'] == 4
+    assert statistics['statuses'] == {'200': 16, 'ConnectionError': 4}
+    assert statistics['p50_ms'] <= statistics['p99_ms'] <= statistics['max_ms']
+    assert {url for url, _ in sent} == {'http://a/variants', 'http://b/variants'}
+    assert all(data == {'chrom': '1', 'start': 100, 'genome_build': 'hg19'} for _, data in sent)
@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import hashlib
+
+from configparser import ConfigParser
+
+import pytest
+
+from utils.heartbeat import Heartbeat as heartbeat_module
+from utils.heartbeat.Heartbeat import Heartbeat, INCOMING, OUTGOING
+
+validate_signature_from_message = heartbeat_module.DataShare.validate_signature_from_message
+
+
+def sign(message):
+    message = {key: value for key, value in message.items() if key != 'signature'}
+    return hashlib.sha256(json.dumps(dict(sorted(message.items()))).encode()).hexdigest()
+
+
+class Response(object):
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+@pytest.fixture
+def peer(monkeypatch):
+    """
+    Both nodes are named `lab` and share the database, the peer answers through `Heartbeat` functions.
+    """
+    calls = {'signatures': 0, 'handshakes': 0, 'heartbeats': 0, 'supported': True, 'forged_answer': None}
+
+    def get_signature_for_message(message):
+        calls['signatures'] += 1
+        return sign(message).encode()
+
+    def validate_signature_from_message(message, signature=None, public_key=None):
+        if signature is None:
+            signature = message.pop('signature')
+        return signature == sign(message)
+
+    def post(url, json, timeout=None, retries=None):
+        if not calls['supported']:
+            return Response(404)
+        if url.endswith('heartbeat-key'):
+            calls['handshakes'] += 1
+            answer = Heartbeat.accept_handshake(json)
+            if answer and calls['forged_answer']:
+                answer.update(calls['forged_answer'])
+            return Response(200, answer) if answer else Response(401)
+        calls['heartbeats'] += 1
+        answer = Heartbeat.answer(json)
+        return Response(200, answer) if answer else Response(401)
+
+    config = ConfigParser()
+    config.read_dict({'NODE': {'LABORATORY_NAME': 'lab'}})
+    monkeypatch.setattr(heartbeat_module, 'config', config)
+    monkeypatch.setattr(heartbeat_module.KeyStore, 'read', staticmethod(lambda path: 'public key'))
+    monkeypatch.setattr(heartbeat_module.DataShare, 'get_signature_for_message', staticmethod(get_signature_for_message))
+    monkeypatch.setattr(heartbeat_module.DataShare, 'validate_signature_from_message',
+                        staticmethod(validate_signature_from_message))
+    monkeypatch.setattr(heartbeat_module.DataShare, 'encrypt_using_public_key',
+                        staticmethod(lambda message, user_id, public_key: message.encode().hex()))
+    monkeypatch.setattr(heartbeat_module.DataShare, 'decrypt_using_private_key', staticmethod(lambda message: message.hex()))
+    monkeypatch.setattr(heartbeat_module.NodeClient, 'post', staticmethod(post))
+    return calls
+
+
+def test_key_is_agreed_once(peer):
+    assert all(Heartbeat.send('http://lab/', 'lab') for _ in range(3))
+
+    # handshake request and its answer
+    assert peer['signatures'] == 2
+    assert peer['handshakes'] == 1
+    assert peer['heartbeats'] == 3
+    assert Heartbeat.get_key('lab', INCOMING) == Heartbeat.get_key('lab', OUTGOING)
+
+
+def test_key_is_agreed_again_when_peer_dropped_it(peer):
+    assert Heartbeat.send('http://lab/', 'lab')
+
+    # the peer has got new key of this node
+    Heartbeat.invalidate('lab', INCOMING)
+    assert Heartbeat.send('http://lab/', 'lab')
+    assert peer['handshakes'] == 2
+
+    Heartbeat.invalidate()
+    assert Heartbeat.get_key('lab', OUTGOING) is None
+
+
+def test_invalid_heartbeats_are_rejected(peer):
+    assert Heartbeat.send('http://lab/', 'lab')
+    key = Heartbeat.get_key('lab', OUTGOING)
+
+    message = {'nonce': 'n', 'request_node': 'lab', 'timestamp': time.time()}
+    assert Heartbeat.answer(dict(message, mac=Heartbeat.get_mac(key, message)))
+    assert Heartbeat.answer(dict(message, mac=Heartbeat.get_mac(key, dict(message, nonce='other')))) is None
+    assert Heartbeat.answer(dict(message, mac=Heartbeat.get_mac('00' * 32, message))) is None
+
+    message['timestamp'] -= 3600
+    assert Heartbeat.answer(dict(message, mac=Heartbeat.get_mac(key, message))) is None
+
+
+def test_invalid_handshake_is_rejected(peer):
+    data = {'request_id': 'id', 'request_node': 'lab', 'timestamp': time.time(), 'signature': 'forged'}
+    assert Heartbeat.accept_handshake(data) is None
+
+    data = {'request_id': 'id', 'request_node': 'lab', 'timestamp': time.time() - 3600}
+    assert Heartbeat.accept_handshake(dict(data, signature=sign(data))) is None
+    assert Heartbeat.get_key('lab', INCOMING) is None
+
+
+@pytest.mark.parametrize('forged_answer', [
+    {'signature': 'forged'},
+    {'encryption_key': '00' * 32},
+    {'request_id': 'other'},
+    {'timestamp': time.time() - 3600},
+])
+def test_forged_handshake_answer_is_rejected(peer, forged_answer):
+    peer['forged_answer'] = forged_answer
+    assert Heartbeat.send('http://lab/', 'lab') is False
+    assert Heartbeat.get_key('lab', OUTGOING) is None
+
+
+def test_handshake_request_is_accepted_once(peer):
+    data = {'request_id': 'id', 'request_node': 'lab', 'timestamp': time.time()}
+    data['signature'] = sign(data)
+    assert Heartbeat.accept_handshake(dict(data))
+    key = Heartbeat.get_key('lab', INCOMING)
+
+    assert Heartbeat.accept_handshake(dict(data)) is None
+    assert Heartbeat.get_key('lab', INCOMING) == key
+
+
+def test_heartbeats_not_supported(peer):
+    peer['supported'] = False
+    assert Heartbeat.send('http://lab/', 'lab') is None
+
+
+def test_malformed_handshake_is_rejected(peer, monkeypatch):
+    monkeypatch.setattr(heartbeat_module.DataShare, 'validate_signature_from_message',
+                        staticmethod(validate_signature_from_message))
+
+    data = {'request_id': 'id', 'request_node': 'lab', 'timestamp': time.time(), 'signature': 12345}
+    assert Heartbeat.accept_handshake(data) is None
+    assert Heartbeat.accept_handshake({'request_node': ['lab'], 'timestamp': time.time()}) is None
+
+
+def test_malformed_heartbeat_is_rejected(peer):
+    assert Heartbeat.send('http://lab/', 'lab')
+    assert Heartbeat.answer({'request_node': ['lab'], 'nonce': 'n', 'timestamp': time.time(), 'mac': 'mac'}) is None
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join('logs', 'website'))
+    os.makedirs(os.path.join('logs', 'data_sharing'))
+    from data_share_website.data_share_website import server
+    return server.test_client()
+
+
+@pytest.mark.parametrize('endpoint', ['/heartbeat-key', '/heartbeat'])
+@pytest.mark.parametrize('body', [['lab'], 'lab', 1, {}])
+def test_bodies_which_are_not_objects_are_rejected(client, endpoint, body):
+    assert client.post(endpoint, json=body).status_code == 400
@@ -0,0 +1,61 @@
+import os
+import time
+
+from multiprocessing import TimeoutError
+
+import pytest
+
+from data_share import KeyPool as key_pool_module
+from data_share.KeyGeneration import KeyGeneration
+from data_share.KeyPool import KeyPool, generate_private_key
+
+
+def generate_slowly(key_length):
+    time.sleep(1)
+    return generate_private_key(key_length)
+
+
+def test_keys_are_generated_in_other_process():
+    KeyPool.start(key_length=1024)
+    try:
+        first = KeyPool.get_key(timeout=60)
+        second = KeyPool.get_key(timeout=60)
+    finally:
+        KeyPool.shutdown()
+
+    assert first.has_private() and second.has_private()
+    assert first.n.bit_length() == 1024
+    assert first.n != second.n
+
+
+def test_temporary_keys_are_generated_on_first_start(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(KeyGeneration, 'TEMPORARY_KEY_LENGTH', 1024)
+    os.mkdir('keys')
+
+    assert KeyGeneration().load_or_generate()
+    assert not KeyGeneration().load_or_generate()
+    assert sorted(os.listdir('keys')) == ['private.key', 'public.key', 'temporary']
+    assert KeyGeneration().has_temporary_keys()
+
+    keys = KeyGeneration()
+    keys.generate_keys(1024)
+    keys.save_keys()
+    assert not KeyGeneration().has_temporary_keys()
+
+
+def test_key_not_generated_in_time_is_taken_by_next_call(monkeypatch):
+    monkeypatch.setattr(key_pool_module, 'generate_private_key', generate_slowly)
+    KeyPool.start(key_length=1024)
+    try:
+        pending = KeyPool._keys[0]
+        with pytest.raises(TimeoutError):
+            KeyPool.get_key(timeout=0.01)
+        # the key is not thrown away and no other key is generated in its place
+        assert KeyPool._keys[0] is pending
+        assert len(KeyPool._keys) == 2
+
+        KeyPool.get_key(timeout=60)
+        assert len(KeyPool._keys) == 1
+    finally:
+        KeyPool.shutdown()
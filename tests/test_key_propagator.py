@@ -0,0 +1,67 @@
+import os
+
+from utils.nodes_key_pair_updator.KeyPropagator import KeyPropagator
+
+
+class Response(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def prepare(monkeypatch, tmp_path, available):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('keys')
+    for path in KeyPropagator.OLD_KEYS:
+        open(path, 'w').close()
+
+    sent = []
+
+    def post(url, json, timeout):
+        if url.split('/')[2] not in available:
+            raise ConnectionError('unavailable')
+        sent.append((url.split('/')[2], json['public_key']))
+        return Response(200)
+
+    nodes = {'a': 'http://a/', 'b': 'http://b/', 'c': 'http://c/'}
+    monkeypatch.setattr(KeyPropagator, 'get_nodes', staticmethod(lambda: dict(nodes)))
+    monkeypatch.setattr(KeyPropagator, 'prepare_message', staticmethod(lambda public_key: {'public_key': public_key}))
+    monkeypatch.setattr('utils.nodes_key_pair_updator.KeyPropagator.NodeClient.post', post)
+    return sent
+
+
+def test_old_keys_are_retired_after_quorum(monkeypatch, tmp_path):
+    available = {'a', 'b'}
+    sent = prepare(monkeypatch, tmp_path, available)
+
+    KeyPropagator.propagate('key 1')
+
+    assert sorted(sent) == [('a', 'key 1'), ('b', 'key 1')]
+    assert list(KeyPropagator.load_queue()['pending']) == ['c']
+    assert not any(os.path.isfile(path) for path in KeyPropagator.OLD_KEYS)
+
+
+def test_old_keys_are_kept_without_quorum(monkeypatch, tmp_path):
+    available = {'a'}
+    prepare(monkeypatch, tmp_path, available)
+
+    KeyPropagator.propagate('key 1')
+    assert all(os.path.isfile(path) for path in KeyPropagator.OLD_KEYS)
+
+    available.add('b')
+    KeyPropagator.retry()
+    assert sorted(KeyPropagator.load_queue()['pending']) == ['c']
+    assert not any(os.path.isfile(path) for path in KeyPropagator.OLD_KEYS)
+
+
+def test_missed_updates_are_sent_in_order(monkeypatch, tmp_path):
+    available = {'a', 'b'}
+    sent = prepare(monkeypatch, tmp_path, available)
+
+    KeyPropagator.propagate('key 1')
+    KeyPropagator.propagate('key 2')
+    assert KeyPropagator.load_queue()['pending']['c']['messages'] == [{'public_key': 'key 1'}, {'public_key': 'key 2'}]
+
+    available.add('c')
+    KeyPropagator.retry()
+    assert [key for node, key in sent if node == 'c'] == ['key 1', 'key 2']
+    assert KeyPropagator.load_queue()['pending'] == {}
@@ -0,0 +1,32 @@
+import os
+
+from Crypto.PublicKey import RSA
+
+from data_share.KeyStore import KeyStore
+
+
+def test_key_is_parsed_once_and_reloaded_on_change(tmp_path):
+    key_path = str(tmp_path / 'public.key')
+    with open(key_path, 'wb') as file:
+        file.write(RSA.generate(1024).publickey().exportKey())
+
+    key = KeyStore.get_key(key_path)
+    assert KeyStore.get_key(key_path) is key
+
+    with open(key_path, 'wb') as file:
+        file.write(RSA.generate(1024).publickey().exportKey())
+    os.utime(key_path, ns=(0, 0))
+
+    assert KeyStore.get_key(key_path) is not key
+
+
+def test_invalidate(tmp_path):
+    key_path = str(tmp_path / 'public.key')
+    with open(key_path, 'wb') as file:
+        file.write(RSA.generate(1024).publickey().exportKey())
+
+    content = KeyStore.read(key_path)
+    KeyStore.invalidate(key_path)
+
+    assert key_path not in KeyStore._files
+    assert KeyStore.read(key_path) == content
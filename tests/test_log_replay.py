@@ -0,0 +1,74 @@
+import json
+import gzip
+
+import requests
+
+from utils.log_replay.LogReplay import LogReplay
+
+
+TEXT_LOG = """2024-05-02 10:00:01,500:data_sharing:variants_private:req2 - {'chrom': '1', 'start': 5, 'end': 9, 'user_id': 'u@lab', 'session_id': 's'}
+2024-05-02 10:00:01,600:data_sharing:variants_private:Invalid signature. User id:u@lab
+Traceback (most recent call last):
+  File "x.py", line 1, in <module>
+2024-05-02 10:00:02,000:data_sharing:check_user:Remote user check. {'request_id': 'x', 'result': False}
+2024-05-02 10:00:03,000:data_sharing:variants_private_batch:req3 - {'regions': [{'chrom': '2', 'start': 1, 'end': 2}], 'user_id': 'u@lab'}
+"""
+
+
+def test_logs_are_parsed_into_sorted_workload(tmp_path):
+    (tmp_path / 'data_sharing.log').write_text(TEXT_LOG)
+    rotated = json.dumps({'time': '2024-05-02 10:00:00,250', 'level': 'INFO', 'logger': 'data_sharing',
+                          'function': 'variants_public', 'message': "req1 - {'chrom': 1, 'start': 100}"})
+    with gzip.open(str(tmp_path / 'data_sharing.log.2024-05-01.gz'), 'wt') as file:
+        file.write(rotated + '\n{"message": "not a query"}\n')
+    (tmp_path / 'other.txt').write_text('ignored')
+
+    queries = LogReplay.parse_logs([str(tmp_path)])
+
+    assert [query['request_id'] for query in queries] == ['req1', 'req2', 'req3']
+    assert [query['endpoint'] for query in queries] == ['variants', 'variants-private', 'variants-private-batch']
+    assert [query['offset'] for query in queries] == [0.0, 1.25, 2.75]
+    assert queries[0]['params'] == {'chrom': 1, 'start': 100}
+    assert queries[2]['params']['regions'] == [{'chrom': '2', 'start': 1, 'end': 2}]
+
+    LogReplay.save_workload(queries, str(tmp_path / 'workload.jsonl'))
+    assert list(LogReplay.load_workload(str(tmp_path / 'workload.jsonl'), limit=2)) == queries[:2]
+
+
+class Response(object):
+    status_code = 200
+    content = b'{}'
+
+
+def test_workload_is_replayed_with_pacing_and_concurrency_limit(monkeypatch):
+    sent = []
+
+    def post(session, url, json=None, timeout=None):
+        sent.append((url, json))
+        return Response()
+
+    monkeypatch.setattr(requests.Session, 'post', post)
+    workload = [
+        {'endpoint': 'variants', 'params': {'chrom': 1, 'start': 100}, 'offset': 0.0},
+        {'endpoint': 'variants-private', 'params': {'chrom': '1', 'user_id': 'u@lab'}, 'offset': 0.1},
+        {'endpoint': 'variants', 'params': {'chrom': 2, 'start': 200}, 'offset': 0.4},
+    ]
+
+    results = LogReplay.replay(workload, 'http://node/', speed=2, concurrency=2)
+
+    assert results['requests'] == 2
+    assert results['skipped'] == 1
+    assert results['wall_time'] >= 0.2
+    assert results['endpoints']['variants']['requests'] == 2
+    assert results['endpoints']['variants']['lag_p99_ms'] >= 0
+    assert sent == [('http://node/variants', {'chrom': 1, 'start': 100}),
+                    ('http://node/variants', {'chrom': 2, 'start': 200})]
+
+
+def test_private_queries_are_sent_as_given_user(monkeypatch):
+    monkeypatch.setattr('utils.federation_harness.LoadDriver.LoadDriver.sign',
+                        staticmethod(lambda message, private_key: dict(sorted(message.items()), signature='s')))
+    query = {'endpoint': 'variants-private', 'params': {'chrom': '1', 'user_id': 'old@lab', 'session_id': 'x'}}
+
+    assert LogReplay.prepare_request(query) is None
+    assert LogReplay.prepare_request(query, 'new@lab', object()) == {'chrom': '1', 'user_id': 'new@lab', 'signature': 's'}
@@ -0,0 +1,91 @@
+import os
+import json
+import queue
+import logging
+import multiprocessing
+
+from utils.logging_pipeline.LoggingPipeline import LoggingPipeline, JsonLinesFormatter
+
+
+def get_logger(tmp_path, name):
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    handler = LoggingPipeline.add_file_handler(logger, str(tmp_path / '{}.log'.format(name)))
+    return logger, handler
+
+
+def test_records_are_written_in_background(tmp_path):
+    logger, handler = get_logger(tmp_path, 'pipeline_text')
+    for i in range(100):
+        logger.info('%s - %s', i, {'chrom': '1'})
+    logger.debug('not written')
+    LoggingPipeline.flush()
+
+    with open(str(tmp_path / 'pipeline_text.log')) as file:
+        lines = file.read().splitlines()
+    assert len(lines) == 100
+    assert lines[-1].endswith(":pipeline_text:test_records_are_written_in_background:99 - {'chrom': '1'}")
+    logger.removeHandler(handler)
+
+
+def test_json_lines_format(tmp_path):
+    logger, handler = get_logger(tmp_path, 'pipeline_json')
+    handler.target.setFormatter(JsonLinesFormatter())
+    try:
+        raise ValueError('broken')
+    except ValueError:
+        logger.exception('failed')
+    LoggingPipeline.flush()
+
+    with open(str(tmp_path / 'pipeline_json.log')) as file:
+        record = json.loads(file.readline())
+    assert record['message'] == 'failed' and record['level'] == 'ERROR'
+    assert 'ValueError: broken' in record['exception']
+    logger.removeHandler(handler)
+
+
+def test_records_are_dropped_when_queue_is_full(monkeypatch, tmp_path):
+    logger, handler = get_logger(tmp_path, 'pipeline_full')
+    full_queue = queue.Queue(1)
+    full_queue.put(None)
+    monkeypatch.setattr(LoggingPipeline, '_queue', full_queue)
+    monkeypatch.setattr(LoggingPipeline, '_pid', os.getpid())
+    dropped = LoggingPipeline.get_stats()['dropped']
+
+    logger.info('dropped')
+    assert LoggingPipeline.get_stats()['dropped'] == dropped + 1
+    logger.removeHandler(handler)
+
+
+def test_records_of_all_processes_are_written_by_one_writer(monkeypatch, tmp_path):
+    monkeypatch.setattr(LoggingPipeline, '_shared_queue', None)
+    monkeypatch.setattr(LoggingPipeline, '_queue', None)
+    monkeypatch.setattr(LoggingPipeline, '_pid', None)
+    LoggingPipeline.share()
+    logger, handler = get_logger(tmp_path, 'pipeline_shared')
+
+    def log_records():
+        for i in range(200):
+            logger.info('%s %s', os.getpid(), i)
+        LoggingPipeline.close()
+
+    context = multiprocessing.get_context('fork')
+    writer = context.Process(target=LoggingPipeline.run_writer)
+    writer.start()
+    processes = [context.Process(target=log_records) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(10)
+    writer.terminate()
+    writer.join(10)
+    logger.removeHandler(handler)
+
+    # file is opened only by the writer process
+    assert handler.target.stream is None
+    assert writer.exitcode == 0
+    with open(str(tmp_path / 'pipeline_shared.log')) as file:
+        lines = file.read().splitlines()
+    assert len(lines) == 400
+    assert {line.split(':')[-1].split()[0] for line in lines} == {str(process.pid) for process in processes}
@@ -0,0 +1,104 @@
+import os
+import json
+import time
+
+from utils.metrics.Metrics import Metrics
+from utils.shared_state.SharedState import SharedState
+
+
+def setup_function():
+    Metrics._counters.clear()
+    Metrics._histograms.clear()
+
+
+def test_counter_rendering():
+    Metrics.describe('test_events_total', 'counter', 'Test events.')
+    Metrics.inc('test_events_total', kind='a')
+    Metrics.inc('test_events_total', 2, kind='a')
+    Metrics.inc('test_events_total', kind='b"c')
+
+    rendered = Metrics.render()
+    assert '# HELP test_events_total Test events.' in rendered
+    assert '# TYPE test_events_total counter' in rendered
+    assert 'test_events_total{kind="a"} 3' in rendered
+    assert 'test_events_total{kind="b\\"c"} 1' in rendered
+
+
+def test_histogram_rendering():
+    Metrics.observe('test_duration_seconds', 0.003, endpoint='home')
+    Metrics.observe('test_duration_seconds', 0.2, endpoint='home')
+    Metrics.observe('test_duration_seconds', 100, endpoint='home')
+
+    rendered = Metrics.render()
+    assert '# TYPE test_duration_seconds histogram' in rendered
+    assert 'test_duration_seconds_bucket{endpoint="home",le="0.001"} 0' in rendered
+    assert 'test_duration_seconds_bucket{endpoint="home",le="0.005"} 1' in rendered
+    assert 'test_duration_seconds_bucket{endpoint="home",le="0.25"} 2' in rendered
+    assert 'test_duration_seconds_bucket{endpoint="home",le="60"} 2' in rendered
+    assert 'test_duration_seconds_bucket{endpoint="home",le="+Inf"} 3' in rendered
+    assert 'test_duration_seconds_count{endpoint="home"} 3' in rendered
+
+
+def test_timed_rows():
+    @Metrics.timed_rows('test_query', backend='memory')
+    def rows(count):
+        for index in range(count):
+            yield index
+
+    assert list(rows(5)) == [0, 1, 2, 3, 4]
+
+    partial = rows(10)
+    next(partial)
+    partial.close()
+
+    counters, histograms = Metrics.collect()
+    key = (('backend', 'memory'),)
+    assert counters[('test_query_rows_total', key)] == 6
+    assert sum(histograms[('test_query_seconds', key)][:-1]) == 2
+
+
+def test_collector():
+    Metrics.add_collector(lambda: [('test_cache_entries', {}, 7)])
+    try:
+        assert 'test_cache_entries 7' in Metrics.render()
+        assert '# TYPE test_cache_entries gauge' in Metrics.render()
+    finally:
+        Metrics._collectors.pop()
+
+
+def test_snapshots_of_live_processes_are_summed():
+    Metrics.inc('test_events_total', kind='a')
+    Metrics.observe('test_duration_seconds', 0.003)
+
+    other = Metrics.snapshot()
+    # parent process stands for another live worker
+    SharedState.connect().execute('INSERT INTO metrics (pid, snapshot, updated) VALUES (?, ?, ?)',
+                                  (os.getppid(), json.dumps(other), time.time()))
+
+    counters, histograms = Metrics.collect()
+    assert counters[('test_events_total', (('kind', 'a'),))] == 2
+    assert sum(histograms[('test_duration_seconds', ())][:-1]) == 2
+
+
+def test_counters_of_exited_processes_are_kept():
+    Metrics.inc('test_events_total', kind='a')
+    Metrics.observe('test_duration_seconds', 0.003)
+    Metrics.add_collector(lambda: [('test_cache_entries', {}, 7)])
+    try:
+        other = Metrics.snapshot()
+    finally:
+        Metrics._collectors.pop()
+
+    connection = SharedState.connect()
+    # pids which do not exist stand for exited workers
+    for pid in (2 ** 22 + 1, 2 ** 22 + 2):
+        connection.execute('INSERT INTO metrics (pid, snapshot, updated) VALUES (?, ?, ?)',
+                           (pid, json.dumps(other), time.time()))
+
+    for _ in range(2):
+        counters, histograms = Metrics.collect()
+        assert counters[('test_events_total', (('kind', 'a'),))] == 3
+        assert sum(histograms[('test_duration_seconds', ())][:-1]) == 3
+        # gauges of exited processes are not kept
+        assert ('test_cache_entries', ()) not in counters
+    assert connection.execute('SELECT pid FROM metrics').fetchall() == [(Metrics.RETIRED_PID,)]
@@ -0,0 +1,107 @@
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+import requests
+
+from utils.node_client.NodeClient import NodeClient
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    failures = 0
+    disconnect = False
+    requests = 0
+    connections = set()
+
+    def do_GET(self):
+        self.do_POST()
+
+    def do_POST(self):
+        Handler.connections.add(self.client_address)
+        Handler.requests += 1
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if Handler.disconnect:
+            # request has reached the node, but the answer is lost
+            self.close_connection = True
+            return
+        status = 200
+        if Handler.failures:
+            Handler.failures -= 1
+            status = 503
+        body = json.dumps({'status': status}).encode()
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(NodeClient, 'get_backoff', staticmethod(lambda attempt: 0))
+    Handler.failures = 0
+    Handler.disconnect = False
+    Handler.requests = 0
+    Handler.connections = set()
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:{}/'.format(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_connections_are_kept_alive(server):
+    for _ in range(5):
+        assert NodeClient.post(server, json={}).status_code == 200
+
+    assert len(Handler.connections) == 1
+    assert NodeClient.get_stats()[NodeClient.get_host(server)]['requests'] == 5
+
+
+def test_unavailable_node_is_retried(server):
+    Handler.failures = 2
+    assert NodeClient.get(server, retries=2).status_code == 200
+
+    stats = NodeClient.get_stats()[NodeClient.get_host(server)]
+    assert (stats['requests'], stats['errors'], stats['retries']) == (3, 2, 2)
+
+
+def test_last_response_is_returned_after_retries(server):
+    Handler.failures = 5
+    assert NodeClient.get(server, retries=1).status_code == 503
+
+
+def test_post_which_has_reached_node_is_not_retried(server):
+    Handler.failures = 1
+    assert NodeClient.post(server, json={}, retries=2).status_code == 503
+    assert Handler.requests == 1
+
+    Handler.disconnect = True
+    with pytest.raises(requests.ConnectionError):
+        NodeClient.post(server, json={}, retries=2)
+    assert Handler.requests == 2
+
+    Handler.disconnect = False
+    Handler.failures = 1
+    assert NodeClient.post(server, json={}, retries=2, idempotent=True).status_code == 200
+    assert Handler.requests == 4
+
+
+def test_connection_error_is_raised_after_retries(monkeypatch):
+    monkeypatch.setattr(NodeClient, 'get_backoff', staticmethod(lambda attempt: 0))
+    # connection is refused, so POST is retried as well
+    with pytest.raises(requests.ConnectionError):
+        NodeClient.post('http://127.0.0.1:1/', json={}, retries=1)
+
+    stats = NodeClient.get_stats()['127.0.0.1:1']
+    assert stats['errors'] >= 2
@@ -0,0 +1,92 @@
+import os
+import json
+
+import pytest
+
+from utils.node_registry.NodeRegistry import NodeRegistry
+
+
+@pytest.fixture(autouse=True)
+def registry_folder(monkeypatch, tmp_path):
+    os.mkdir(str(tmp_path / 'nodes'))
+    os.mkdir(str(tmp_path / 'keys'))
+    with open(str(tmp_path / 'keys' / 'public.key'), 'w') as file:
+        file.write('my key')
+
+    monkeypatch.setattr(NodeRegistry, 'NODES_FOLDER', str(tmp_path / 'nodes'))
+    monkeypatch.setattr(NodeRegistry, 'AVAILABILITY_FILE', str(tmp_path / 'nodes_available.json'))
+    monkeypatch.setattr(NodeRegistry, 'PUBLIC_KEY_FILE', str(tmp_path / 'keys' / 'public.key'))
+    NodeRegistry.clear()
+    yield
+    NodeRegistry.clear()
+
+
+def add_node(name, public_key='key'):
+    NodeRegistry.add_node({'laboratory-name': name, 'address': 'http://{}/'.format(name), 'public-key': public_key})
+
+
+def test_nodes_are_added_and_exported():
+    add_node('a')
+    add_node('b')
+
+    assert sorted(NodeRegistry.get_nodes()) == ['a', 'b']
+    body, etag = NodeRegistry.export()
+    nodes = json.loads(body.decode())
+    assert [node['laboratory-name'] for node in nodes][:2] == ['a', 'b']
+    assert nodes[-1]['public-key'] == 'my key'
+
+    assert NodeRegistry.export() == (body, etag)
+
+    NodeRegistry.update_public_key('a', 'new key')
+    assert NodeRegistry.get_node('a')['public-key'] == 'new key'
+    new_body, new_etag = NodeRegistry.export()
+    assert new_etag != etag
+    assert json.loads(new_body.decode())[0]['public-key'] == 'new key'
+
+
+def test_external_changes_are_picked_up(tmp_path):
+    add_node('a')
+    NodeRegistry.get_nodes()
+
+    # other process rewrites the file in place (folder modification time does not change)
+    path = str(tmp_path / 'nodes' / 'a.json')
+    with open(path, 'w') as file:
+        json.dump({'laboratory-name': 'a', 'address': 'http://changed-address/', 'public-key': 'key'}, file)
+    os.utime(path, ns=(1, 1))
+    assert NodeRegistry.get_node('a')['address'] == 'http://changed-address/'
+
+    with open(str(tmp_path / 'nodes' / 'b.json'), 'w') as file:
+        json.dump({'laboratory-name': 'b', 'address': 'http://b/', 'public-key': 'key'}, file)
+    os.utime(str(tmp_path / 'nodes'), ns=(1, 1))
+    assert sorted(NodeRegistry.get_nodes()) == ['a', 'b']
+
+    os.remove(path)
+    os.utime(str(tmp_path / 'nodes'), ns=(2, 2))
+    assert sorted(NodeRegistry.get_nodes()) == ['b']
+
+
+def test_files_are_not_read_again_if_unchanged(monkeypatch):
+    add_node('a')
+    NodeRegistry.get_nodes()
+
+    def read_node(name):
+        raise AssertionError('node {} read again'.format(name))
+
+    monkeypatch.setattr(NodeRegistry, '_read_node', staticmethod(read_node))
+    assert NodeRegistry.get_node('a')['address'] == 'http://a/'
+
+
+def test_invalid_node_file_is_skipped(tmp_path):
+    with open(str(tmp_path / 'nodes' / 'broken.json'), 'w') as file:
+        file.write('{')
+    add_node('a')
+
+    assert list(NodeRegistry.get_nodes()) == ['a']
+
+
+def test_node_address_from_availability(tmp_path):
+    assert NodeRegistry.get_node_address('a') is None
+
+    with open(str(tmp_path / 'nodes_available.json'), 'w') as file:
+        json.dump({'a': {'availability': True, 'address': 'http://a/'}}, file)
+    assert NodeRegistry.get_node_address('a') == 'http://a/'
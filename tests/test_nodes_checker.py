@@ -0,0 +1,33 @@
+import json
+import time
+
+from nodes_available import NodesChecker as nodes_checker_module
+from nodes_available.NodesChecker import NodesChecker
+from utils.node_registry.NodeRegistry import NodeRegistry
+
+
+def test_nodes_are_checked_concurrently_with_deadline(tmp_path, monkeypatch):
+    nodes = {
+        'fast.json': {'laboratory-name': 'fast', 'address': 'http://fast/'},
+        'hung.json': {'laboratory-name': 'hung', 'address': 'http://hung/'},
+    }
+
+    def get_node_availability(node_information, address_key='address', message=None):
+        if node_information['laboratory-name'] == 'hung':
+            time.sleep(2)
+        return True
+
+    monkeypatch.setattr(NodeRegistry, 'AVAILABILITY_FILE', str(tmp_path / 'nodes_available.json'))
+    monkeypatch.setattr(NodesChecker, 'get_all_nodes', staticmethod(lambda: list(nodes)))
+    monkeypatch.setattr(NodesChecker, 'get_node_information', staticmethod(lambda name: nodes[name]))
+    monkeypatch.setattr(NodesChecker, 'get_check_message', staticmethod(lambda: {}))
+    monkeypatch.setattr(NodesChecker, 'get_node_availability', staticmethod(get_node_availability))
+    monkeypatch.setattr(nodes_checker_module.config, 'getfloat', lambda section, option, fallback=None: 0.5)
+
+    availability = NodesChecker.get_all_nodes_availability()
+
+    assert availability['fast']['availability'] is True
+    assert availability['fast']['latency'] is not None
+    assert availability['hung'] == {'availability': False, 'address': 'http://hung/', 'latency': None, 'timeout': True}
+    with open(str(tmp_path / 'nodes_available.json')) as file:
+        assert json.load(file) == availability
@@ -0,0 +1,72 @@
+import os
+import time
+import signal
+import sys
+import socket
+import subprocess
+import multiprocessing
+
+import requests
+
+from utils.production_server.PreforkServer import PreforkServer
+
+
+def load_app():
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [str(os.getpid()).encode()]
+    return app
+
+
+def get_free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def get_worker_pids(port, requests_number=30):
+    pids = set()
+    for _ in range(requests_number):
+        with requests.Session() as session:
+            pids.add(session.get('http://127.0.0.1:{}/'.format(port), timeout=5).text)
+    return pids
+
+
+def wait_for_server(port):
+    for _ in range(100):
+        try:
+            return get_worker_pids(port, 1)
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise AssertionError('server has not started')
+
+
+def test_workers_are_reloaded_and_stopped():
+    port = get_free_port()
+    server = PreforkServer(load_app, host='127.0.0.1', port=port, workers=2)
+    process = multiprocessing.get_context('fork').Process(target=server.run)
+    process.start()
+    try:
+        wait_for_server(port)
+        pids = get_worker_pids(port)
+        assert 1 <= len(pids) <= 2
+
+        os.kill(process.pid, signal.SIGHUP)
+        time.sleep(1)
+        assert get_worker_pids(port).isdisjoint(pids)
+    finally:
+        os.kill(process.pid, signal.SIGTERM)
+        process.join(10)
+
+    assert process.exitcode == 0
+
+
+def test_supervisor_does_not_import_application():
+    # application modules imported by the supervisor would be inherited by new workers and not reloaded
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = ("import sys, app; print(' '.join(name for name in sys.modules if name.split('.')[0] in "
+            "('data_share', 'data_share_website', 'nodes_available', 'variant_db') or "
+            "(name.startswith('utils.') and name.split('.')[1] not in ('production_server', 'logging_pipeline'))))")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=root, env=env)
+    assert output.decode().split() == []
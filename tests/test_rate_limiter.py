@@ -0,0 +1,75 @@
+import multiprocessing
+
+from utils.shared_state.SharedState import SharedState
+from utils.public_variants_handler.TokenBucketLimiter import TokenBucketLimiter
+from utils.public_variants_handler.PublicVariantsHandler import PublicVariantsHandler
+
+
+def acquire_many(path, count, results):
+    SharedState.get_database_path = staticmethod(lambda: path)
+    SharedState._local.connection = None
+    results.put(sum(TokenBucketLimiter.acquire([('global', 50, 0)]) for _ in range(count)))
+
+
+def test_bucket_is_exhausted_and_reset():
+    TokenBucketLimiter.reset('global', 3)
+
+    assert [TokenBucketLimiter.acquire([('global', 3, 0)]) for _ in range(4)] == [True, True, True, False]
+    assert TokenBucketLimiter.get_tokens('global', 3) == 0
+
+    TokenBucketLimiter.reset('global', 3)
+    assert TokenBucketLimiter.get_tokens('global', 3) == 3
+
+
+def test_tokens_are_taken_only_if_all_buckets_allow():
+    TokenBucketLimiter.reset('global', 10)
+
+    assert TokenBucketLimiter.acquire([('global', 10, 0), ('client', 1, 0)])
+    assert not TokenBucketLimiter.acquire([('global', 10, 0), ('client', 1, 0)])
+    assert TokenBucketLimiter.get_tokens('global', 10) == 9
+    assert TokenBucketLimiter.acquire([('global', 10, 0), ('other-client', 1, 0)])
+
+
+def test_bucket_refills_with_rate(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('utils.public_variants_handler.TokenBucketLimiter.time.time', lambda: now[0])
+
+    assert TokenBucketLimiter.acquire([('client', 2, 0.5)])
+    assert TokenBucketLimiter.acquire([('client', 2, 0.5)])
+    assert not TokenBucketLimiter.acquire([('client', 2, 0.5)])
+
+    now[0] += 2
+    assert TokenBucketLimiter.acquire([('client', 2, 0.5)])
+    assert not TokenBucketLimiter.acquire([('client', 2, 0.5)])
+
+
+def test_no_updates_are_lost_between_processes():
+    TokenBucketLimiter.reset('global', 50)
+
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=acquire_many, args=(SharedState.get_database_path(), 20, results))
+                 for _ in range(4)]
+    [process.start() for process in processes]
+    [process.join() for process in processes]
+
+    assert sum(results.get() for _ in processes) == 50
+    assert TokenBucketLimiter.get_tokens('global', 50) == 0
+
+
+def test_full_client_buckets_are_removed_by_daily_reset(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('utils.public_variants_handler.TokenBucketLimiter.time.time', lambda: now[0])
+    PublicVariantsHandler.create_limits()
+
+    assert PublicVariantsHandler.try_acquire('10.0.0.1')
+    while PublicVariantsHandler.try_acquire('10.0.0.2'):
+        pass
+
+    # the first client has refilled its bucket, the second one has not
+    now[0] += 10
+    PublicVariantsHandler.reset_limit()
+
+    names = [row[0] for row in SharedState.connect().execute('SELECT name FROM token_buckets')]
+    assert sorted(names) == ['public_variants', 'public_variants_client:10.0.0.2']
+    assert not PublicVariantsHandler.try_acquire('10.0.0.2', 3)
+    assert PublicVariantsHandler.try_acquire('10.0.0.1', 10)
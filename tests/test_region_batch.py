@@ -0,0 +1,38 @@
+import pytest
+
+from variant_db.RegionBatch import RegionBatch
+
+
+class ListVariantDB(object):
+    ROWS = [['1', str(position), 'A', 'G'] for position in (100, 150, 200, 5000)] + [['2', '10', 'C', 'T']]
+
+    def __init__(self):
+        self.queries = []
+
+    def get_variants(self, chrom=None, start=None, end=None, genome_type='hg19'):
+        self.queries.append((chrom, start, end))
+        return (row for row in self.ROWS if row[0] == chrom and start <= int(row[1]) <= end)
+
+
+def test_parse_regions():
+    regions = [{'chrom': 1, 'start': '100'}, {'chrom': '2', 'start': 5, 'end': 10}]
+    assert RegionBatch.parse_regions(regions) == [('1', 100, 100), ('2', 5, 10)]
+
+    with pytest.raises(ValueError):
+        RegionBatch.parse_regions([{'chrom': '1', 'start': 10, 'end': 5}])
+
+
+def test_coalesce():
+    regions = [('1', 150, 300), ('2', 1, 5), ('1', 100, 160), ('1', 301, 400), ('1', 1000, 2000)]
+    assert RegionBatch.coalesce(regions) == [('1', 100, 400), ('1', 1000, 2000), ('2', 1, 5)]
+
+
+def test_get_variants_grouped_by_region():
+    variant_db = ListVariantDB()
+    regions = [('1', 150, 200), ('2', 1, 20), ('1', 100, 150), ('1', 4000, 6000)]
+
+    grouped = RegionBatch.get_variants(variant_db, regions)
+
+    assert variant_db.queries == [('1', 100, 200), ('1', 4000, 6000), ('2', 1, 20)]
+    assert [[row[1] for row in region['result']] for region in grouped] == [['150', '200'], ['10'], ['100', '150'], ['5000']]
+    assert [(region['chrom'], region['start'], region['end']) for region in grouped] == regions
@@ -0,0 +1,88 @@
+import os
+
+from variant_db.RegionCache import RegionCache
+
+
+class CountingVariantDB(object):
+
+    def __init__(self, filename, empty=False):
+        self.filename = filename
+        self.empty = empty
+        self.calls = 0
+
+    def get_genome_filename(self, genome_type):
+        return self.filename
+
+    def get_variants(self, chrom=None, start=None, end=None, genome_type='hg19'):
+        self.calls += 1
+        return iter([] if self.empty else [[str(chrom), str(start), 'A', 'G']])
+
+
+def get_cache(tmp_path, empty=False, **kwargs):
+    data_file = tmp_path / 'variants.tsv.gz'
+    data_file.write_bytes(b'')
+    return RegionCache(CountingVariantDB(str(data_file), empty), **kwargs)
+
+
+def test_hit_and_miss(tmp_path):
+    cache = get_cache(tmp_path)
+
+    assert cache.get_variants('1', 100, 100) == [['1', '100', 'A', 'G']]
+    assert cache.get_variants('1', 100, 100) == [['1', '100', 'A', 'G']]
+
+    assert cache.variant_db.calls == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_eviction_by_size(tmp_path):
+    entry_size = RegionCache.result_size([['1', '100', 'A', 'G']])
+    cache = get_cache(tmp_path, max_bytes=2 * entry_size)
+
+    for start in (100, 200, 300):
+        cache.get_variants('1', start, start)
+
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['evictions'] == 1
+    cache.get_variants('1', 100, 100)
+    assert cache.variant_db.calls == 4
+
+
+def test_empty_results_are_limited_by_size(tmp_path):
+    cache = get_cache(tmp_path, empty=True, max_bytes=10 * RegionCache.result_size([]))
+
+    for start in range(1000):
+        assert cache.get_variants('1', start, start) == []
+
+    assert cache.stats()['entries'] == 10
+    assert cache.stats()['evictions'] == 990
+
+
+def test_zero_size_disables_caching(tmp_path):
+    cache = get_cache(tmp_path, empty=True, max_bytes=0)
+
+    for _ in range(2):
+        cache.get_variants('1', 100, 100)
+
+    assert cache.variant_db.calls == 2
+    assert cache.stats()['entries'] == 0
+
+
+def test_ttl(tmp_path):
+    cache = get_cache(tmp_path, ttl=-1)
+
+    cache.get_variants('1', 100, 100)
+    cache.get_variants('1', 100, 100)
+
+    assert cache.variant_db.calls == 2
+
+
+def test_data_file_change(tmp_path):
+    cache = get_cache(tmp_path)
+
+    cache.get_variants('1', 100, 100)
+    os.utime(cache.variant_db.filename, (0, 0))
+    cache.get_variants('1', 100, 100)
+
+    assert cache.variant_db.calls == 2
+    assert cache.stats()['invalidations'] == 1
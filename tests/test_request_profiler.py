@@ -0,0 +1,70 @@
+import os
+import json
+import pstats
+
+import pytest
+
+from utils.request_profiler.RequestProfiler import RequestProfiler
+from utils.shared_state.SharedState import SharedState
+
+
+@pytest.fixture(autouse=True)
+def profiles_folder(monkeypatch, tmp_path):
+    monkeypatch.setattr(RequestProfiler, 'PROFILES_FOLDER', str(tmp_path / 'profiles'))
+    RequestProfiler._checked = None
+    yield
+    RequestProfiler._checked = None
+
+
+def test_disabled_by_default():
+    assert RequestProfiler.get_settings() is None
+    assert not RequestProfiler.should_profile('variants_private')
+
+
+def test_endpoints_and_sample_rate():
+    RequestProfiler.configure(True, endpoints=['variants_private'])
+    assert RequestProfiler.should_profile('variants_private')
+    assert not RequestProfiler.should_profile('variants')
+
+    RequestProfiler.configure(True, sample_rate=0)
+    assert not RequestProfiler.should_profile('variants_private')
+
+    RequestProfiler.configure(False)
+    assert not RequestProfiler.should_profile('variants_private')
+
+
+def test_profiling_expires():
+    RequestProfiler.configure(True, duration=-1)
+    assert not RequestProfiler.should_profile('variants')
+
+
+def test_settings_are_refreshed_periodically():
+    RequestProfiler.configure(True)
+    assert RequestProfiler.should_profile('variants')
+
+    # other process disables profiling
+    SharedState.connect().execute(
+        'UPDATE settings SET value = ? WHERE name = ?', (json.dumps(dict(enabled=False)), 'profiling')
+    )
+    assert RequestProfiler.should_profile('variants')
+
+    RequestProfiler._checked -= RequestProfiler.SETTINGS_REFRESH
+    assert not RequestProfiler.should_profile('variants')
+
+
+def test_profile_is_saved():
+    state = RequestProfiler.start()
+    assert RequestProfiler.start() is None
+
+    data = [str(index) * 100 for index in range(10000)]
+    result = RequestProfiler.stop(state, 'variants')
+
+    assert len(data) == 10000
+    assert result['wall_time'] > 0 and result['cpu_time'] >= 0
+    assert result['peak_memory'] > 10000 * 100
+    assert os.path.dirname(result['path']) == RequestProfiler.PROFILES_FOLDER
+    assert pstats.Stats(result['path']).total_calls > 0
+
+    state = RequestProfiler.start()
+    assert state is not None
+    RequestProfiler.stop(state, 'variants')
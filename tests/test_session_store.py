@@ -0,0 +1,32 @@
+from utils.session_store.SessionStore import SessionStore
+
+
+def test_session_key_is_bound_to_user():
+    session_id, session_key, _ = SessionStore.create_session('user@lab')
+
+    assert SessionStore.get_session_key(session_id, 'user@lab') == session_key
+    assert SessionStore.get_session_key(session_id, 'other@lab') is None
+
+
+def test_session_rotation_and_closing():
+    session_id, _, _ = SessionStore.create_session('user@lab')
+    new_session_id, _, _ = SessionStore.create_session('user@lab', session_id)
+
+    assert SessionStore.get_session_key(session_id, 'user@lab') is None
+    assert SessionStore.get_session_key(new_session_id, 'user@lab') is not None
+
+    SessionStore.close_user_sessions('user@lab')
+    assert SessionStore.get_session_key(new_session_id, 'user@lab') is None
+
+
+def test_session_request_limit(monkeypatch):
+    monkeypatch.setattr(SessionStore, 'get_max_requests', staticmethod(lambda: 1))
+    session_id, _, _ = SessionStore.create_session('user@lab')
+
+    assert SessionStore.get_session_key(session_id, 'user@lab') is not None
+    assert SessionStore.get_session_key(session_id, 'user@lab') is None
+
+
+def test_derived_keys_differ_per_request():
+    assert SessionStore.derive_key('k' * 32, 'first') != SessionStore.derive_key('k' * 32, 'second')
+    assert len(SessionStore.derive_key('k' * 32, 'first')) == 32
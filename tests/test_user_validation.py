@@ -0,0 +1,96 @@
+import data_share  # UserValidation has to be imported through data_share (circular import)
+
+from utils.user_validation.UserValidation import UserValidation
+
+
+def count_remote_checks(monkeypatch, result):
+    calls = []
+
+    def check_remote_node(user_id, node):
+        calls.append('{}@{}'.format(user_id, node))
+        return result
+
+    monkeypatch.setattr(UserValidation, 'check_remote_node', staticmethod(check_remote_node))
+    UserValidation.invalidate_remote_user()
+    return calls
+
+
+def test_remote_user_is_validated_once(monkeypatch):
+    calls = count_remote_checks(monkeypatch, 'public key')
+
+    assert UserValidation.validate_user('user@Remote Lab') == 'public key'
+    assert UserValidation.validate_user('user@Remote Lab') == 'public key'
+    assert calls == ['user@Remote Lab']
+
+
+def test_negative_result_is_cached(monkeypatch):
+    calls = count_remote_checks(monkeypatch, False)
+
+    assert not UserValidation.validate_user('user@Remote Lab')
+    assert not UserValidation.validate_user('user@Remote Lab')
+    assert len(calls) == 1
+
+
+def test_expired_entry_is_validated_again(monkeypatch):
+    calls = count_remote_checks(monkeypatch, 'public key')
+    now = [100.0]
+    monkeypatch.setattr('utils.user_validation.UserValidation.time.time', lambda: now[0])
+
+    UserValidation.validate_user('user@Remote Lab')
+    now[0] += 301
+    UserValidation.validate_user('user@Remote Lab')
+    assert len(calls) == 2
+
+
+def test_invalidation(monkeypatch):
+    calls = count_remote_checks(monkeypatch, 'public key')
+
+    UserValidation.validate_user('a@Remote Lab')
+    UserValidation.validate_user('b@Remote Lab')
+    UserValidation.validate_user('c@Other Lab')
+
+    UserValidation.invalidate_remote_user('a@Remote Lab')
+    UserValidation.validate_user('a@Remote Lab')
+    UserValidation.validate_user('b@Remote Lab')
+    assert calls.count('a@Remote Lab') == 2 and calls.count('b@Remote Lab') == 1
+
+    UserValidation.invalidate_remote_user(node='Remote Lab')
+    UserValidation.validate_user('b@Remote Lab')
+    UserValidation.validate_user('c@Other Lab')
+    assert calls.count('b@Remote Lab') == 2 and calls.count('c@Other Lab') == 1
+
+
+def fake_signature_check(monkeypatch):
+    """
+    Signature is valid if it is equal to the public key.
+    """
+    def validate_signature_from_message(message, signature=None, public_key=None):
+        if signature is None:
+            signature = message.pop('signature')
+        return signature == public_key
+
+    monkeypatch.setattr(data_share.DataShare, 'validate_signature_from_message', staticmethod(validate_signature_from_message))
+
+
+def test_outdated_key_of_remote_user_is_replaced(monkeypatch):
+    fake_signature_check(monkeypatch)
+    calls = count_remote_checks(monkeypatch, 'old key')
+    UserValidation.validate_user('user@Remote Lab')
+
+    monkeypatch.setattr(UserValidation, 'check_remote_node', staticmethod(lambda user_id, node: calls.append(user_id) or 'new key'))
+    message = {'user_id': 'user@Remote Lab', 'signature': 'new key'}
+
+    assert data_share.DataShare.validate_signature(message) == (True, 'new key')
+    assert message == {'user_id': 'user@Remote Lab'}
+    assert len(calls) == 2
+    assert data_share.DataShare.validate_signature({'user_id': 'user@Remote Lab', 'signature': 'new key'}) == (True, 'new key')
+    assert len(calls) == 2
+
+
+def test_unknown_remote_user_is_not_checked_again(monkeypatch):
+    fake_signature_check(monkeypatch)
+    calls = count_remote_checks(monkeypatch, False)
+
+    for _ in range(3):
+        assert data_share.DataShare.validate_signature({'user_id': 'user@Remote Lab', 'signature': 'key'}) == (False, None)
+    assert len(calls) == 1
@@ -0,0 +1,160 @@
+import gzip
+import struct
+import zlib
+
+import pytest
+
+from variant_db.TabixIndex import TabixIndex, BgzfReader
+from variant_db.NativeTabixVariantDB import NativeTabixVariantDB
+from variant_db.ColumnarVariantDB import ColumnarVariantDB
+from variant_db.VariantDBFactory import VariantDBFactory
+from variant_db.SyntheticVariants import SyntheticVariants
+from variant_db.VariantDBBenchmark import VariantDBBenchmark
+
+
+BLOCK_SIZE = 50
+
+RECORDS = [
+    ['1', '100', 'A', 'G', '3', '0.1', '30'],
+    ['1', '150', 'C', 'T', '1', '0.01', '100'],
+    ['1', '150', 'C', 'A', '2', '0.02', '100'],
+    ['1', '20000', 'G', 'C', '5', '0.5', '10'],
+    ['2', '5', 'T', 'A', '1', '1.0', '1'],
+    ['2', '70000', 'A', 'C', '4', '0.4', '10'],
+]
+
+
+def bgzf_block(data):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    header = b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff' + struct.pack('<H', 6)
+    header += b'BC' + struct.pack('<HH', 2, len(compressed) + 25)
+    return header + compressed + struct.pack('<II', zlib.crc32(data) & 0xFFFFFFFF, len(data))
+
+
+def write_tabixed_file(path, records):
+    """
+    This function writes bgzipped file split into small blocks with tabix index holding single (root) bin per sequence.
+    """
+    text = b''.join('\t'.join(record).encode() + b'\n' for record in ['#CHROM POS'.split()] + records)
+    parts = [text[i:i + BLOCK_SIZE] for i in range(0, len(text), BLOCK_SIZE)]
+
+    block_offsets, content = [], b''
+    for part in parts + [b'']:
+        block_offsets.append(len(content))
+        content += bgzf_block(part)
+
+    def virtual_offset(position):
+        return block_offsets[position // BLOCK_SIZE] << 16 | position % BLOCK_SIZE
+
+    sequences, position = {}, text.index(b'\n') + 1
+    for record in records:
+        length = len('\t'.join(record)) + 1
+        first, _ = sequences.get(record[0], (position, None))
+        sequences[record[0]] = (first, position + length)
+        position += length
+
+    names = b''.join(name.encode() + b'\x00' for name in sequences)
+    index = b'TBI\x01' + struct.pack('<8i', len(sequences), 0, 1, 2, 2, ord('#'), 0, len(names)) + names
+    for first, last in sequences.values():
+        index += struct.pack('<iIiQQi', 1, 0, 1, virtual_offset(first), virtual_offset(last), 0)
+
+    path.write_bytes(content)
+    path.with_name(path.name + '.tbi').write_bytes(gzip.compress(index))
+
+
+@pytest.fixture
+def tabixed_file(tmp_path, monkeypatch):
+    path = tmp_path / 'variants.tsv.gz'
+    write_tabixed_file(path, RECORDS)
+    monkeypatch.setattr(NativeTabixVariantDB, 'get_genome_filename', staticmethod(lambda genome_type: str(path)))
+    return path
+
+
+def test_region_to_bins():
+    assert TabixIndex.region_to_bins(0, 1) == [0, 1, 9, 73, 585, 4681]
+    assert TabixIndex.region_to_bins(16383, 16385) == [0, 1, 9, 73, 585, 4681, 4682]
+
+
+def test_read_lines_across_blocks(tabixed_file):
+    with BgzfReader(str(tabixed_file)) as reader:
+        lines = list(reader.read_lines(0, 1 << 62))
+
+    assert lines[1:] == ['\t'.join(record).encode() for record in RECORDS]
+
+
+def test_point_query(tabixed_file):
+    assert list(NativeTabixVariantDB.get_variants('1', 150, 150)) == RECORDS[1:3]
+    assert list(NativeTabixVariantDB.get_variants(1, 151, 151)) == []
+
+
+def test_range_query(tabixed_file):
+    assert list(NativeTabixVariantDB.get_variants('1', 100, 20000)) == RECORDS[:4]
+    assert list(NativeTabixVariantDB.get_variants('2', 6, 80000)) == RECORDS[5:]
+
+
+def test_chromosome_query(tabixed_file):
+    assert list(NativeTabixVariantDB.get_variants('2')) == RECORDS[4:]
+    assert list(NativeTabixVariantDB.get_variants('X')) == []
+
+
+def test_columnar_store(tabixed_file, monkeypatch):
+    store_path = str(tabixed_file) + '.columnar'
+    assert ColumnarVariantDB.build(str(tabixed_file), store_path) == {'1': 4, '2': 2}
+    monkeypatch.setattr(ColumnarVariantDB, 'get_store_path', staticmethod(lambda genome_type: store_path))
+
+    assert list(ColumnarVariantDB.get_variants('1', 150, 150)) == RECORDS[1:3]
+    assert list(ColumnarVariantDB.get_variants('1', 100, 20000)) == RECORDS[:4]
+    assert list(ColumnarVariantDB.get_variants('2')) == RECORDS[4:]
+    assert list(ColumnarVariantDB.get_variants('X')) == []
+
+
+def test_variant_db_factory():
+    assert VariantDBFactory.get_variant_db('native') is NativeTabixVariantDB
+
+    with pytest.raises(ValueError):
+        VariantDBFactory.get_variant_db('unknown')
+
+
+def test_region_to_bin():
+    assert TabixIndex.region_to_bin(0, 1) == 4681
+    assert TabixIndex.region_to_bin(16383, 16385) == 585
+    assert TabixIndex.region_to_bin(0, 1 << 29) == 0
+
+
+@pytest.fixture
+def synthetic_file(tmp_path, monkeypatch):
+    path = tmp_path / 'synthetic.tsv.gz'
+    counts = SyntheticVariants.generate(str(path), 20000, density=5, chromosomes=['1', '2'], seed=1)
+    assert counts == {'1': 10000, '2': 10000}
+    monkeypatch.setattr(NativeTabixVariantDB, 'get_genome_filename', staticmethod(lambda genome_type: str(path)))
+    return path
+
+
+def test_synthetic_file_is_indexed(synthetic_file):
+    with gzip.open(str(synthetic_file), 'rt') as file:
+        rows = [line.rstrip('\n').split('\t') for line in file if not line.startswith('#')]
+    assert len(rows) == 20000
+    assert all(len(row) == 7 for row in rows)
+
+    assert list(NativeTabixVariantDB.get_variants('2')) == rows[10000:]
+    for chrom, start, end in [('1', 10000, 10000), ('1', 20000, 60000), ('2', 1, 1000000), ('2', 1500000, 1600000)]:
+        expected = [row for row in rows if row[0] == chrom and start <= int(row[1]) <= end]
+        assert list(NativeTabixVariantDB.get_variants(chrom, start, end)) == expected
+
+
+def test_benchmark(synthetic_file, monkeypatch):
+    store_path = str(synthetic_file) + '.columnar'
+    ColumnarVariantDB.build(str(synthetic_file), store_path)
+    monkeypatch.setattr(ColumnarVariantDB, 'get_store_path', staticmethod(lambda genome_type: store_path))
+
+    queries = VariantDBBenchmark.prepare_queries(str(synthetic_file), queries=20, range_size=10000, chromosome_queries=2)
+    results = VariantDBBenchmark.run(queries, ['native', 'columnar', 'unknown'])
+
+    assert results['native']['point']['rows'] == results['columnar']['point']['rows'] >= 20
+    assert results['native']['range']['rows'] == results['columnar']['range']['rows']
+    assert results['native']['chromosome']['queries'] == 2
+    assert 'error' in results['unknown']
+
+    comparison = VariantDBBenchmark.compare({'results': results}, {'results': results})
+    assert comparison and not any(regression for *_, regression in comparison)
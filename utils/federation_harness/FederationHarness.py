@@ -0,0 +1,331 @@
+import os
+import sys
+import json
+import time
+import signal
+import shutil
+import argparse
+import datetime
+import tempfile
+import subprocess
+
+import requests
+
+from configparser import ConfigParser
+
+from data_share.KeyGeneration import KeyGeneration
+from utils.federation_harness.LoadDriver import LoadDriver
+from utils.request_id_generator.RandomIdGenerator import RandomIdGenerator
+from variant_db.ColumnarVariantDB import ColumnarVariantDB
+from variant_db.SyntheticVariants import SyntheticVariants
+from variant_db.VariantDBBenchmark import VariantDBBenchmark
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+DATA_FILENAME = 'synthetic.tsv.gz'
+NODE_FOLDERS = ['keys', 'nodes', 'public_keys', 'nodes_available', 'logs', os.path.join('utils', 'user_validation'),
+                os.path.join('data', 'hg19'), os.path.join('data', 'hg38')]
+
+
+class FederationHarness(object):
+    """
+    This class runs a federation of nodes on localhost for load testing.
+
+    Every node is a separate `app.py` process (configuration, keys and caches of a node are bound to the working
+    directory of its process) with its own working directory holding config.ini, keys, nodes, public_keys and
+    synthetic variants. Nodes know each other from the start: information about other nodes, their public keys
+    and addresses are written to every working directory. Every node has one user whose private key is kept
+    by the harness, so private queries of the users can be sent to all nodes.
+    """
+
+    START_TIMEOUT = 60
+    STOP_TIMEOUT = 10
+
+    # public requests are sent from one address, so the public limits are lifted by default
+    NODE_CONFIG = {
+        'NODE': {
+            'MAX_PUBLIC_VARIANT_REQUEST_LIMIT': '1000000000',
+            'PUBLIC_CLIENT_BURST': '1000000000',
+            'PUBLIC_CLIENT_RATE': '1000000000',
+        },
+    }
+
+    def __init__(self, nodes=3, base_port=8100, workdir=None, variants=100000, density=1.0, chromosomes=None,
+                 variant_db='native', key_length=4096, workers=0, overrides=None):
+        """
+        :param nodes: (int) number of nodes
+        :param base_port: (int) port of the first node (next nodes use next ports)
+        :param workdir: (str) folder for working directories of nodes (temporary folder by default)
+        :param variants: (int) number of synthetic variants (the same data is shared by all nodes)
+        :param density: (float) mean number of variants per 1000 bases
+        :param chromosomes: (list) chromosome names
+        :param variant_db: (str) variant database backend of nodes
+        :param key_length: (int) length of node keys (nodes with keys of at most 2048 bits replace them on start)
+        :param workers: (int) number of worker processes of every node (0 runs development server)
+        :param overrides: (dict) section: {option: value} changed in config.ini of every node
+        """
+        self.names = ['harness-lab-{}'.format(number) for number in range(nodes)]
+        self.ports = {name: base_port + number for number, name in enumerate(self.names)}
+        self.workdir = workdir
+        self.variants = variants
+        self.density = density
+        self.chromosomes = chromosomes or ['1', '2', '3']
+        self.variant_db = variant_db
+        self.key_length = key_length
+        self.workers = workers
+        self.overrides = overrides or {}
+
+        self.users = {}
+        self.processes = {}
+        self._temporary_folder = None
+
+    def get_address(self, name):
+        return 'http://127.0.0.1:{}/'.format(self.ports[name])
+
+    def get_addresses(self):
+        return {name: self.get_address(name) for name in self.names}
+
+    def get_node_path(self, name):
+        return os.path.join(self.workdir, name)
+
+    def get_data_filename(self):
+        return os.path.join(self.workdir, DATA_FILENAME)
+
+    def write_config(self, name):
+        """
+        This function writes config.ini of the node (the repository config with changed node options).
+        :param name: (str) laboratory name
+        """
+        node_config = ConfigParser()
+        node_config.read(os.path.join(REPOSITORY_PATH, 'config.ini'), encoding='utf-8')
+        node_config.read_dict(FederationHarness.NODE_CONFIG)
+        node_config.read_dict({
+            'NODE': {'LABORATORY_NAME': name, 'NODE_ADDRESS': self.get_address(name)},
+            'DATA': {'HG_19_FILENAME': DATA_FILENAME, 'HG_38_FILENAME': DATA_FILENAME, 'VARIANT_DB': self.variant_db},
+        })
+        node_config.read_dict(self.overrides)
+        with open(os.path.join(self.get_node_path(name), 'config.ini'), 'w', encoding='utf-8') as file:
+            node_config.write(file)
+
+    def generate_key(self):
+        keys = KeyGeneration()
+        keys.generate_keys(self.key_length)
+        return keys.private_key
+
+    def prepare_data(self):
+        """
+        This function generates synthetic variants (and columnar store if it is used) once for all nodes.
+        """
+        filename = self.get_data_filename()
+        SyntheticVariants.generate(filename, self.variants, self.density, self.chromosomes)
+        if self.variant_db == 'columnar':
+            ColumnarVariantDB.build(filename, '{}.columnar'.format(filename))
+
+    def link_data(self, name):
+        filename = self.get_data_filename()
+        for genome_build in ('hg19', 'hg38'):
+            folder = os.path.join(self.get_node_path(name), 'data', genome_build)
+            for suffix in ('', '.tbi', '.columnar'):
+                link = os.path.join(folder, DATA_FILENAME + suffix)
+                if os.path.lexists(link):
+                    os.remove(link)
+                if os.path.exists(filename + suffix):
+                    os.symlink(filename + suffix, link)
+
+    def prepare_node(self, name):
+        """
+        This function prepares working directory of the node with its config, keys, data and user.
+        :param name: (str) laboratory name
+        :return: (str) public key of the node in PEM format
+        """
+        path = self.get_node_path(name)
+        for folder in NODE_FOLDERS:
+            os.makedirs(os.path.join(path, folder), exist_ok=True)
+        self.write_config(name)
+        self.link_data(name)
+
+        private_key = self.generate_key()
+        with open(os.path.join(path, 'keys', 'private.key'), 'wb') as file:
+            file.write(private_key.exportKey())
+        public_key = private_key.publickey().exportKey().decode()
+        with open(os.path.join(path, 'keys', 'public.key'), 'w') as file:
+            file.write(public_key)
+        if self.key_length <= KeyGeneration.TEMPORARY_KEY_LENGTH:
+            # short keys are replaced by the node on start
+            open(os.path.join(path, 'keys', KeyGeneration.TEMPORARY_MARKER), 'w').close()
+
+        user_id = '{}@{}'.format(RandomIdGenerator.generate_random_id(20), name)
+        self.users[user_id] = self.generate_key()
+        with open(os.path.join(path, 'public_keys', 'public.{}.key'.format(user_id)), 'wb') as file:
+            file.write(self.users[user_id].publickey().exportKey())
+        return public_key
+
+    def register_nodes(self, public_keys):
+        """
+        This function makes every node know all other nodes (the same files as written by /add-node and availability
+        check).
+        :param public_keys: (dict) laboratory name: public key in PEM format
+        """
+        for name in self.names:
+            path = self.get_node_path(name)
+            availability = {}
+            for other in self.names:
+                if other == name:
+                    continue
+                information = {'laboratory-name': other, 'address': self.get_address(other), 'public-key': public_keys[other]}
+                with open(os.path.join(path, 'nodes', '{}.json'.format(other)), 'w') as file:
+                    json.dump(information, file)
+                with open(os.path.join(path, 'nodes', 'public.{}.key'.format(other)), 'w') as file:
+                    file.write(public_keys[other])
+                availability[other] = {'availability': True, 'address': self.get_address(other), 'latency': None}
+
+            with open(os.path.join(path, 'nodes_available', 'nodes_available.json'), 'w') as file:
+                json.dump(availability, file)
+
+    def prepare(self):
+        """
+        This function prepares working directories of all nodes.
+        """
+        if self.workdir is None:
+            self._temporary_folder = tempfile.mkdtemp(prefix='federation-')
+            self.workdir = self._temporary_folder
+        os.makedirs(self.workdir, exist_ok=True)
+
+        self.prepare_data()
+        public_keys = {name: self.prepare_node(name) for name in self.names}
+        self.register_nodes(public_keys)
+
+    def start(self):
+        """
+        This function starts all nodes and waits until they answer.
+        :raises RuntimeError: if a node exits or does not answer before `START_TIMEOUT` seconds
+        """
+        environment = dict(os.environ)
+        environment['PYTHONPATH'] = os.pathsep.join(filter(None, [REPOSITORY_PATH, environment.get('PYTHONPATH')]))
+
+        for name in self.names:
+            command = [sys.executable, os.path.join(REPOSITORY_PATH, 'app.py'), '-p', str(self.ports[name])]
+            if self.workers:
+                command += ['--production', '-w', str(self.workers)]
+            with open(os.path.join(self.get_node_path(name), 'logs', 'harness.log'), 'ab') as log:
+                # every node gets its own process group, so key pool and worker processes are stopped together
+                self.processes[name] = subprocess.Popen(command, cwd=self.get_node_path(name), env=environment,
+                                                        stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+
+        for name in self.names:
+            self.wait_until_ready(name)
+
+    def wait_until_ready(self, name):
+        deadline = time.monotonic() + FederationHarness.START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.processes[name].poll() is not None:
+                raise RuntimeError('Node {} has exited (see {}).'.format(
+                    name, os.path.join(self.get_node_path(name), 'logs', 'harness.log')))
+            try:
+                requests.get(self.get_address(name), timeout=1)
+                return
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise RuntimeError('Node {} has not started in {} seconds.'.format(name, FederationHarness.START_TIMEOUT))
+
+    def stop(self):
+        """
+        This function stops all nodes. Temporary working directories are removed.
+        """
+        for process in self.processes.values():
+            if process.poll() is None:
+                os.killpg(process.pid, signal.SIGTERM)
+        for process in self.processes.values():
+            try:
+                process.wait(FederationHarness.STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+        self.processes = {}
+
+        if self._temporary_folder is not None:
+            shutil.rmtree(self._temporary_folder, ignore_errors=True)
+            self._temporary_folder = None
+            self.workdir = None
+
+    def __enter__(self):
+        try:
+            self.prepare()
+            self.start()
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def parse_overrides(values):
+    """
+    This function parses config options given on command line.
+    :param values: (list) SECTION.OPTION=VALUE strings
+    :return: (dict) section: {option: value}
+    """
+    overrides = {}
+    for value in values or []:
+        option, value = value.split('=', 1)
+        section, option = option.split('.', 1)
+        overrides.setdefault(section, {})[option] = value
+    return overrides
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs a federation of nodes on localhost and sends a mix of queries to them.')
+    parser.add_argument('-n', '--nodes', type=int, default=3, help='Number of nodes.')
+    parser.add_argument('-p', '--base-port', type=int, default=8100, help='Port of the first node.')
+    parser.add_argument('--workdir', type=str, help='Folder for working directories of nodes (kept after the run).')
+    parser.add_argument('--variants', type=int, default=100000, help='Number of synthetic variants.')
+    parser.add_argument('--variant-db', type=str, default='native', help='Variant database backend of nodes.')
+    parser.add_argument('--key-length', type=int, default=4096,
+                        help='Length of node keys (keys of at most 2048 bits are replaced by nodes on start).')
+    parser.add_argument('-w', '--workers', type=int, default=0,
+                        help='Worker processes of every node (production server), 0 runs development server.')
+    parser.add_argument('--set', type=str, action='append', metavar='SECTION.OPTION=VALUE',
+                        help='Changes an option in config.ini of every node (can be repeated).')
+    parser.add_argument('-m', '--mix', type=str, default='public=1,private=1,batch=1',
+                        help='Weights of request types (public, private and batch).')
+    parser.add_argument('-b', '--batch-size', type=int, default=10, help='Number of regions in batch queries.')
+    parser.add_argument('-r', '--range-size', type=int, default=100000, help='Number of bases in private queries.')
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help='Number of concurrent clients.')
+    parser.add_argument('-d', '--duration', type=float, default=60, help='Duration of the load in seconds.')
+    parser.add_argument('--requests', type=int, help='Total number of requests (instead of duration).')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Random seed.')
+    parser.add_argument('-o', '--output', type=str, default='federation_load.json', help='Path to JSON results.')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    harness = FederationHarness(args.nodes, args.base_port, args.workdir and os.path.abspath(args.workdir),
+                                args.variants, variant_db=args.variant_db, key_length=args.key_length,
+                                workers=args.workers, overrides=parse_overrides(args.set))
+
+    print('Starting {} nodes.'.format(args.nodes))
+    with harness:
+        queries = VariantDBBenchmark.prepare_queries(harness.get_data_filename(), 200, args.range_size, 0, args.seed)
+        driver = LoadDriver(harness.get_addresses(), harness.users, queries, LoadDriver.parse_mix(args.mix),
+                            args.batch_size, seed=args.seed)
+
+        print('Sending requests.')
+        load = driver.run(args.concurrency, None if args.requests else args.duration, args.requests)
+
+    results = {
+        'created': datetime.datetime.now().isoformat(),
+        'parameters': {'nodes': args.nodes, 'workers': args.workers, 'variant_db': args.variant_db,
+                       'variants': args.variants, 'mix': LoadDriver.parse_mix(args.mix), 'batch_size': args.batch_size,
+                       'range_size': args.range_size, 'concurrency': args.concurrency, 'overrides': args.set or []},
+        'results': load,
+    }
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    print('{} requests in {:.1f} s ({:.1f} requests/s)'.format(load['requests'], load['wall_time'],
+                                                              load['requests_per_second'] or 0))
+    for endpoint, statistics in load['endpoints'].items():
+        print('{:40} {:7} requests {:6} errors {:8.1f}/s  p50 {:9.3f} ms  p99 {:9.3f} ms  max {:9.3f} ms'.format(
+            endpoint, statistics['requests'], statistics['errors'], statistics['requests_per_second'] or 0,
+            statistics['p50_ms'], statistics['p99_ms'], statistics['max_ms']))
+    print('Results saved to {}.'.format(output))
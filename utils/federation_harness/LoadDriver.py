@@ -0,0 +1,217 @@
+import json
+import time
+import base64
+import random
+import threading
+
+from urllib.parse import urljoin
+
+import numpy as np
+import requests
+
+from Crypto.Hash import SHA
+
+
+ENDPOINTS = {'public': 'variants', 'private': 'variants-private', 'batch': 'variants-private-batch'}
+
+
+class LoadDriver(object):
+    """
+    This class sends a mix of public, private and batch variant queries to nodes of a federation and measures
+    throughput and latency per endpoint.
+
+    Every worker thread has its own HTTP session and sends the next request as soon as the previous one is answered
+    (closed loop), so the load is controlled with the number of workers. Private and batch queries are signed
+    with private key of a randomly chosen user. Queries of users of other nodes are reported separately
+    (`<endpoint> (remote user)`), because the node has to validate such user with `/check-user` request.
+    """
+
+    def __init__(self, nodes, users, queries, mix=None, batch_size=10, genome_build='hg19', seed=0):
+        """
+        :param nodes: (dict) laboratory name: node address
+        :param users: (dict) user_id (with node part): private key
+        :param queries: (dict) query type (point, range): list of (chrom, start, end) tuples
+        :param mix: (dict) request type (public, private, batch): weight
+        :param batch_size: (int) number of regions in batch queries
+        :param genome_build: (str) hg19 or hg38
+        :param seed: (int) random seed
+        """
+        self.nodes = nodes
+        self.users = users
+        self.queries = queries
+        self.mix = mix or {'public': 1, 'private': 1, 'batch': 1}
+        self.batch_size = batch_size
+        self.genome_build = genome_build
+        self.seed = seed
+
+        unknown = set(self.mix) - set(ENDPOINTS)
+        if unknown:
+            raise ValueError('Unknown request types: {}.'.format(', '.join(sorted(unknown))))
+
+        self._results = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse_mix(mix):
+        """
+        This function parses request mix given on command line.
+        :param mix: (str) comma separated type=weight pairs (e.g. public=5,private=3,batch=2)
+        :return: (dict) request type: weight
+        """
+        weights = {}
+        for part in mix.split(','):
+            request_type, weight = part.split('=')
+            weights[request_type.strip()] = float(weight)
+        return weights
+
+    @staticmethod
+    def sign(message, private_key):
+        """
+        This function signs the request the same way as the client does.
+        :param message: (dict) request data
+        :param private_key: (RSA key) private key of the user
+        :return: (dict) sorted request data with signature
+        """
+        message = dict(sorted(message.items()))
+        digest = SHA.new(json.dumps(message).encode()).digest()
+        signature = private_key.sign(digest, '')
+        message.update({'signature': base64.b64encode(str(signature[0]).encode()).decode()})
+        return message
+
+    def prepare_request(self, rng, request_type):
+        """
+        This function draws the node, the user and the regions of the next request.
+        :param rng: (random.Random) random generator of the worker
+        :param request_type: (str) public, private or batch
+        :return: (tuple) node name, URL, request data and user node (None for public requests)
+        """
+        node = rng.choice(sorted(self.nodes))
+        url = urljoin(self.nodes[node], ENDPOINTS[request_type])
+
+        if request_type == 'public':
+            chrom, start, _ = rng.choice(self.queries['point'])
+            return node, url, {'chrom': chrom, 'start': start, 'genome_build': self.genome_build}, None
+
+        user_id = rng.choice(sorted(self.users))
+        if request_type == 'private':
+            chrom, start, end = rng.choice(self.queries['range'])
+            data = {'chrom': chrom, 'start': start, 'end': end, 'genome_build': self.genome_build, 'user_id': user_id}
+        else:
+            regions = [rng.choice(self.queries['point' if rng.random() < 0.5 else 'range'])
+                       for _ in range(self.batch_size)]
+            data = {
+                'regions': [{'chrom': chrom, 'start': start, 'end': end} for chrom, start, end in regions],
+                'genome_build': self.genome_build,
+                'user_id': user_id,
+            }
+        return node, url, LoadDriver.sign(data, self.users[user_id]), user_id.split('@')[-1]
+
+    def send(self, session, rng, timeout):
+        """
+        This function sends one request and records its result.
+        :param session: (requests.Session) session of the worker
+        :param rng: (random.Random) random generator of the worker
+        :param timeout: (float) read timeout in seconds
+        """
+        request_type = rng.choices(list(self.mix), list(self.mix.values()))[0]
+        node, url, data, user_node = self.prepare_request(rng, request_type)
+        label = ENDPOINTS[request_type]
+        if user_node is not None and user_node != node:
+            label = '{} (remote user)'.format(label)
+
+        start = time.perf_counter()
+        try:
+            response = session.post(url, json=data, timeout=timeout)
+            size = len(response.content)
+            status = response.status_code
+        except requests.RequestException as e:
+            size, status = 0, type(e).__name__
+        latency = time.perf_counter() - start
+
+        with self._lock:
+            self._results.append((label, status, latency, size))
+
+    def worker(self, number, stop, deadline, requests_left, timeout):
+        rng = random.Random('{}-{}'.format(self.seed, number))
+        with requests.Session() as session:
+            while not stop.is_set() and (deadline is None or time.monotonic() < deadline):
+                if requests_left is not None:
+                    with self._lock:
+                        if requests_left[0] <= 0:
+                            return
+                        requests_left[0] -= 1
+                self.send(session, rng, timeout)
+
+    @staticmethod
+    def summarize(latencies, statuses, sizes, wall_time):
+        """
+        This function computes statistics of requests sent to one endpoint.
+        :param latencies: (list) latency of every request (in seconds)
+        :param statuses: (list) HTTP status codes (or names of connection errors)
+        :param sizes: (list) response sizes in bytes
+        :param wall_time: (float) duration of the whole run (in seconds)
+        :return: (dict) statistics
+        """
+        status_counts = {}
+        for status in statuses:
+            status_counts[str(status)] = status_counts.get(str(status), 0) + 1
+
+        milliseconds = np.array(latencies) * 1000
+        return {
+            'requests': len(latencies),
+            'errors': sum(1 for status in statuses if status != 200),
+            'statuses': status_counts,
+            'requests_per_second': len(latencies) / wall_time if wall_time else None,
+            'mean_ms': float(milliseconds.mean()),
+            'p50_ms': float(np.percentile(milliseconds, 50)),
+            'p90_ms': float(np.percentile(milliseconds, 90)),
+            'p99_ms': float(np.percentile(milliseconds, 99)),
+            'max_ms': float(milliseconds.max()),
+            'bytes': sum(sizes),
+        }
+
+    def run(self, concurrency=4, duration=None, requests_count=None, timeout=60):
+        """
+        This function sends requests until the time is up or given number of requests is sent.
+        :param concurrency: (int) number of worker threads
+        :param duration: (float) duration of the run in seconds
+        :param requests_count: (int) total number of requests
+        :param timeout: (float) read timeout of a single request in seconds
+        :return: (dict) wall time, number of requests and statistics per endpoint
+        """
+        if duration is None and requests_count is None:
+            raise ValueError('Either duration or number of requests has to be given.')
+
+        self._results = []
+        stop = threading.Event()
+        deadline = time.monotonic() + duration if duration is not None else None
+        requests_left = [requests_count] if requests_count is not None else None
+
+        start = time.perf_counter()
+        workers = [threading.Thread(target=self.worker, args=(number, stop, deadline, requests_left, timeout), daemon=True)
+                   for number in range(concurrency)]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for worker in workers:
+                worker.join()
+        wall_time = time.perf_counter() - start
+
+        grouped = {}
+        for label, status, latency, size in self._results:
+            grouped.setdefault(label, ([], [], []))
+            grouped[label][0].append(latency)
+            grouped[label][1].append(status)
+            grouped[label][2].append(size)
+
+        return {
+            'wall_time': wall_time,
+            'requests': len(self._results),
+            'requests_per_second': len(self._results) / wall_time if wall_time else None,
+            'endpoints': {label: LoadDriver.summarize(latencies, statuses, sizes, wall_time)
+                          for label, (latencies, statuses, sizes) in sorted(grouped.items())},
+        }
@@ -0,0 +1,268 @@
+import os
+import hmac
+import json
+import time
+import hashlib
+import binascii
+
+from urllib.parse import urljoin
+from configparser import ConfigParser
+
+from data_share.DataShare import DataShare
+from data_share.KeyStore import KeyStore
+from utils.node_client.NodeClient import NodeClient
+from utils.request_id_generator.RequestIdGenerator import RequestIdGenerator
+from utils.shared_state.SharedState import SharedState
+
+config = ConfigParser()
+config.read(os.path.join(os.getcwd(), 'config.ini'), encoding='utf-8')
+
+INCOMING = 'incoming'
+OUTGOING = 'outgoing'
+
+
+class Heartbeat(object):
+    """
+    This class checks liveness of other nodes with HMAC authenticated heartbeats.
+
+    Nodes agree on a MAC key once (and again after `HEARTBEAT_KEY_TTL` seconds or after key rotation) with a handshake
+    signed with node RSA keys: the checked node generates the key and sends it encrypted with public key
+    of the checking node in an answer signed with its own key. Every handshake request is accepted only once.
+    Every heartbeat (and its answer) is then authenticated with HMAC-SHA256 only.
+
+    Keys are kept in shared state database (`incoming` keys are used for answering heartbeats of other nodes,
+    `outgoing` keys for sending heartbeats).
+    """
+
+    @staticmethod
+    def get_key_ttl():
+        return config.getint('NODE', 'HEARTBEAT_KEY_TTL', fallback=86400)
+
+    @staticmethod
+    def get_max_age():
+        return config.getint('NODE', 'HEARTBEAT_MAX_AGE', fallback=60)
+
+    @staticmethod
+    def get_key(node, direction):
+        """
+        This function returns MAC key shared with the node.
+        :param node: (str) laboratory name
+        :param direction: (str) incoming or outgoing
+        :return: (str) MAC key (hex) or None if there is no valid key
+        """
+        row = SharedState.connect().execute(
+            'SELECT key FROM heartbeat_keys WHERE node = ? AND direction = ? AND expires > ?', (node, direction, time.time())
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    @staticmethod
+    def set_key(node, direction, key):
+        SharedState.connect().execute(
+            'INSERT OR REPLACE INTO heartbeat_keys (node, direction, key, expires) VALUES (?, ?, ?, ?)',
+            (node, direction, key, time.time() + Heartbeat.get_key_ttl())
+        )
+
+    @staticmethod
+    def invalidate(node=None, direction=None):
+        """
+        This function drops MAC keys, so they are agreed again with the next heartbeat.
+        :param node: (str) laboratory name (None drops keys of all nodes, e.g. after this node keys rotation)
+        :param direction: (str) incoming or outgoing (None drops both)
+        """
+        conditions, params = [], []
+        if node is not None:
+            conditions.append('node = ?')
+            params.append(node)
+        if direction is not None:
+            conditions.append('direction = ?')
+            params.append(direction)
+
+        query = 'DELETE FROM heartbeat_keys'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        SharedState.connect().execute(query, params)
+
+    @staticmethod
+    def get_mac(key, message):
+        """
+        This function returns MAC of the message.
+        :param key: (str) MAC key (hex)
+        :param message: (dict) message
+        :return: (str) HMAC-SHA256 (hex)
+        """
+        message = json.dumps(dict(sorted(message.items())))
+        return hmac.new(bytes.fromhex(key), message.encode(), hashlib.sha256).hexdigest()
+
+    @staticmethod
+    def is_fresh(timestamp):
+        return isinstance(timestamp, (int, float)) and abs(time.time() - timestamp) <= Heartbeat.get_max_age()
+
+    @staticmethod
+    def is_new_request(request_id):
+        """
+        This function remembers handshake request for `HEARTBEAT_MAX_AGE` seconds, so it can not be replayed.
+        :param request_id: (str) request_id of the handshake
+        :return: (bool) True if the request has not been seen before
+        """
+        now = time.time()
+        with SharedState.transaction() as connection:
+            connection.execute('DELETE FROM heartbeat_requests WHERE expires < ?', (now,))
+            cursor = connection.execute('INSERT OR IGNORE INTO heartbeat_requests (request_id, expires) VALUES (?, ?)',
+                                        (request_id, now + 2 * Heartbeat.get_max_age()))
+        return cursor.rowcount == 1
+
+    @staticmethod
+    def accept_handshake(data):
+        """
+        This function creates MAC key for the node asking for it. The request has to be signed with the node key.
+        :param data: (dict) request_node, timestamp, request_id and signature
+        :return: (dict) MAC key encrypted with public key of the node, request_id and timestamp signed with this node
+            key or None if the request is not valid
+        """
+        node = data.get('request_node')
+        if not isinstance(node, str):
+            return None
+        try:
+            public_key = KeyStore.read(os.path.join('nodes', 'public.{}.key'.format(node)))
+        except FileNotFoundError:
+            return None
+
+        try:
+            if not DataShare.validate_signature_from_message(data, public_key=public_key):
+                return None
+        except (KeyError, ValueError, TypeError):
+            # e.g. signature is missing or it is not a string
+            return None
+        if not Heartbeat.is_fresh(data.get('timestamp')) or not isinstance(data.get('request_id'), str):
+            return None
+        if not Heartbeat.is_new_request(data['request_id']):
+            return None
+
+        key = binascii.hexlify(os.urandom(32)).decode()
+        Heartbeat.set_key(node, INCOMING, key)
+        answer = {
+            'encryption_key': DataShare.encrypt_using_public_key(key, node, public_key),
+            'request_id': data['request_id'],
+            'timestamp': time.time(),
+        }
+        answer.update({'signature': DataShare.get_signature_for_message(answer).decode()})
+        return answer
+
+    @staticmethod
+    def answer(data):
+        """
+        This function checks heartbeat of other node and prepares authenticated answer.
+        :param data: (dict) request_node, timestamp, nonce and mac
+        :return: (dict) answer or None if heartbeat is not valid (or there is no key for the node)
+        """
+        node = data.get('request_node')
+        if not isinstance(node, str):
+            return None
+        key = Heartbeat.get_key(node, INCOMING)
+        if key is None or not isinstance(data.get('mac'), str):
+            return None
+
+        message = {key_name: data.get(key_name) for key_name in ('request_node', 'timestamp', 'nonce')}
+        if not hmac.compare_digest(Heartbeat.get_mac(key, message), data['mac']):
+            return None
+        if not Heartbeat.is_fresh(data['timestamp']):
+            return None
+
+        answer = {'node': config.get('NODE', 'LABORATORY_NAME'), 'nonce': data['nonce']}
+        answer.update({'mac': Heartbeat.get_mac(key, answer)})
+        return answer
+
+    @staticmethod
+    def handshake(address, node, timeout=None):
+        """
+        This function agrees MAC key with the node.
+        :param address: (str) node address
+        :param node: (str) laboratory name
+        :param timeout: (tuple) connect and read timeout
+        :return: (str) MAC key, False if the node has not accepted the request (or its answer is not signed with its key)
+            or None if it does not support heartbeats
+        """
+        data = {
+            'request_id': RequestIdGenerator.generate_random_id(),
+            'request_node': config.get('NODE', 'LABORATORY_NAME'),
+            'timestamp': time.time(),
+        }
+        data = dict(sorted(data.items()))
+        data.update({'signature': DataShare.get_signature_for_message(data).decode()})
+
+        response = NodeClient.post(urljoin(address, 'heartbeat-key'), json=data, timeout=timeout, retries=0)
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            return False
+
+        if not Heartbeat.validate_handshake_answer(response.json(), node, data['request_id']):
+            return False
+
+        encrypted_key = bytes.fromhex(response.json()['encryption_key'])
+        key = bytes.fromhex(DataShare.decrypt_using_private_key(encrypted_key)).decode()
+        Heartbeat.set_key(node, OUTGOING, key)
+        return key
+
+    @staticmethod
+    def validate_handshake_answer(answer, node, request_id):
+        """
+        This function checks that handshake answer comes from the node (it is signed with the node key).
+        :param answer: (dict) encryption_key, request_id, timestamp and signature
+        :param node: (str) laboratory name
+        :param request_id: (str) request_id of the handshake request
+        :return: (bool) True if the answer is valid
+        """
+        if not isinstance(answer, dict) or answer.get('request_id') != request_id:
+            return False
+        if not Heartbeat.is_fresh(answer.get('timestamp')) or not isinstance(answer.get('encryption_key'), str):
+            return False
+        try:
+            public_key = KeyStore.read(os.path.join('nodes', 'public.{}.key'.format(node)))
+        except FileNotFoundError:
+            return False
+
+        message = {key_name: answer[key_name] for key_name in ('encryption_key', 'request_id', 'timestamp')}
+        try:
+            return DataShare.validate_signature_from_message(message, signature=answer.get('signature'),
+                                                             public_key=public_key)
+        except (KeyError, ValueError, TypeError):
+            return False
+
+    @staticmethod
+    def send(address, node, timeout=None):
+        """
+        This function sends heartbeat to the node. MAC key is agreed first if there is no valid one.
+        :param address: (str) node address
+        :param node: (str) laboratory name
+        :param timeout: (tuple) connect and read timeout
+        :return: (bool) True if the node has answered correctly, None if it does not support heartbeats
+        """
+        for attempt in range(2):
+            key = Heartbeat.get_key(node, OUTGOING)
+            if key is None:
+                key = Heartbeat.handshake(address, node, timeout)
+                if not key:
+                    return key
+
+            message = {
+                'nonce': RequestIdGenerator.generate_random_id(),
+                'request_node': config.get('NODE', 'LABORATORY_NAME'),
+                'timestamp': time.time(),
+            }
+            data = dict(message, mac=Heartbeat.get_mac(key, message))
+
+            response = NodeClient.post(urljoin(address, 'heartbeat'), json=data, timeout=timeout, retries=0)
+            if response.status_code == 404:
+                return None
+            if response.status_code == 401 and attempt == 0:
+                # the node does not know the key anymore (e.g. its keys were rotated)
+                Heartbeat.invalidate(node, OUTGOING)
+                continue
+            if response.status_code != 200:
+                return False
+
+            answer = response.json()
+            expected = {'node': node, 'nonce': message['nonce']}
+            return hmac.compare_digest(Heartbeat.get_mac(key, expected), str(answer.get('mac')))
+        return False
@@ -0,0 +1,297 @@
+import os
+import re
+import ast
+import gzip
+import json
+import time
+import argparse
+import datetime
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import numpy as np
+import requests
+
+from Crypto.PublicKey import RSA
+
+from utils.federation_harness.LoadDriver import LoadDriver
+
+# functions of data_share_website logging replayed queries
+FUNCTION_ENDPOINTS = {
+    'variants_public': 'variants',
+    'variants_private': 'variants-private',
+    'variants_private_batch': 'variants-private-batch',
+}
+PRIVATE_ENDPOINTS = ['variants-private', 'variants-private-batch']
+
+TEXT_LINE = re.compile(r'^(?P<time>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}):(?P<logger>[^:]*):(?P<function>\w+):(?P<message>.*)$')
+QUERY_MESSAGE = re.compile(r'^(?P<request_id>\S+) - (?P<params>\{.*\})$')
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S,%f'
+
+
+class LogReplay(object):
+    """
+    This class replays public and private queries recorded in data sharing logs (`logs/data_sharing/`).
+
+    Logs (text or JSON lines, current and rotated files) are converted into a workload file: JSON lines with time
+    offset, endpoint and parameters of every query, sorted by time. The workload is replayed against a node with
+    original pacing (or `speed` times faster, 0 sends queries as fast as possible) with at most `concurrency` queries
+    at a time. If all workers are busy, queries are sent late and the delay is reported as schedule lag.
+
+    Signatures are not logged (they are removed from parameters during validation), so private queries are signed
+    again and sent as the given user. Sessions are not replayed.
+    """
+
+    @staticmethod
+    def get_log_files(paths):
+        """
+        This function lists log files (folders are searched for current and rotated data sharing logs).
+        :param paths: (list) files or folders
+        :return: (list) paths to log files
+        """
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if '.log' in name)
+            else:
+                files.append(path)
+        return files
+
+    @staticmethod
+    def parse_line(line):
+        """
+        This function parses a log line recording a query.
+        :param line: (str) text or JSON log line
+        :return: (dict) time, endpoint, request_id and params or None if the line does not record a query
+        """
+        line = line.strip()
+        if line.startswith('{'):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return None
+            if not isinstance(record, dict):
+                return None
+        else:
+            match = TEXT_LINE.match(line)
+            if match is None:
+                return None
+            record = match.groupdict()
+
+        endpoint = FUNCTION_ENDPOINTS.get(record.get('function'))
+        message = QUERY_MESSAGE.match(record.get('message', ''))
+        if endpoint is None or message is None:
+            return None
+
+        try:
+            params = ast.literal_eval(message.group('params'))
+            query_time = datetime.datetime.strptime(record['time'], TIME_FORMAT)
+        except (ValueError, SyntaxError, KeyError):
+            return None
+        if not isinstance(params, dict):
+            return None
+
+        return {'time': query_time, 'endpoint': endpoint, 'request_id': message.group('request_id'), 'params': params}
+
+    @staticmethod
+    def parse_logs(paths):
+        """
+        This function reads queries from log files.
+        :param paths: (list) log files or folders (plain or gzipped files)
+        :return: (list) queries sorted by time, with `offset` in seconds from the first query
+        """
+        queries = []
+        for path in LogReplay.get_log_files(paths):
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'rt', encoding='utf-8', errors='replace') as file:
+                for line in file:
+                    query = LogReplay.parse_line(line)
+                    if query is not None:
+                        queries.append(query)
+
+        queries.sort(key=lambda query: query['time'])
+        first_time = queries[0]['time'] if queries else None
+        for query in queries:
+            query['offset'] = (query['time'] - first_time).total_seconds()
+            query['time'] = query['time'].isoformat()
+        return queries
+
+    @staticmethod
+    def save_workload(queries, path):
+        with open(path, 'w') as file:
+            for query in queries:
+                file.write(json.dumps(query) + '\n')
+
+    @staticmethod
+    def load_workload(path, limit=None):
+        """
+        This function reads workload file.
+        :param path: (str) path to workload file
+        :param limit: (int) maximal number of read queries
+        :return: (generator) queries
+        """
+        with open(path, 'r') as file:
+            for number, line in enumerate(file):
+                if limit is not None and number >= limit:
+                    return
+                yield json.loads(line)
+
+    @staticmethod
+    def prepare_request(query, user_id=None, private_key=None):
+        """
+        This function prepares request data of the query. Private queries are signed with the key of the user.
+        :param query: (dict) query from workload
+        :param user_id: (str) user_id (with node part) used for private queries
+        :param private_key: (RSA key) private key of the user
+        :return: (dict) request data or None if private query can not be signed
+        """
+        params = dict(query['params'])
+        if query['endpoint'] not in PRIVATE_ENDPOINTS:
+            return params
+        if private_key is None:
+            return None
+
+        params.pop('signature', None)
+        params.pop('session_id', None)
+        params['user_id'] = user_id
+        return LoadDriver.sign(params, private_key)
+
+    @staticmethod
+    def replay(workload, address, speed=1.0, concurrency=8, user_id=None, private_key=None, timeout=60):
+        """
+        This function sends queries to the node at the times given by their offsets.
+        :param workload: (iterable) queries
+        :param address: (str) node address
+        :param speed: (float) acceleration of the original pacing (0 sends as fast as possible)
+        :param concurrency: (int) maximal number of queries sent at the same time
+        :param user_id: (str) user_id (with node part) used for private queries
+        :param private_key: (RSA key) private key of the user (private queries are skipped without it)
+        :param timeout: (float) read timeout of a single query in seconds
+        :return: (dict) wall time, number of sent and skipped queries and statistics per endpoint
+        """
+        results = []
+        lock = threading.Lock()
+        local = threading.local()
+        slots = threading.BoundedSemaphore(concurrency)
+
+        def send(query, scheduled):
+            try:
+                lag = time.perf_counter() - scheduled
+                data = LogReplay.prepare_request(query, user_id, private_key)
+                if not hasattr(local, 'session'):
+                    local.session = requests.Session()
+
+                start = time.perf_counter()
+                try:
+                    response = local.session.post(urljoin(address, query['endpoint']), json=data, timeout=timeout)
+                    size, status = len(response.content), response.status_code
+                except requests.RequestException as e:
+                    size, status = 0, type(e).__name__
+                latency = time.perf_counter() - start
+
+                with lock:
+                    results.append((query['endpoint'], status, latency, size, lag))
+            finally:
+                slots.release()
+
+        skipped = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for query in workload:
+                if private_key is None and query['endpoint'] in PRIVATE_ENDPOINTS:
+                    skipped += 1
+                    continue
+
+                scheduled = start + query['offset'] / speed if speed else time.perf_counter()
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                slots.acquire()
+                executor.submit(send, query, scheduled)
+        wall_time = time.perf_counter() - start
+
+        grouped = {}
+        for endpoint, status, latency, size, lag in results:
+            grouped.setdefault(endpoint, ([], [], [], []))
+            for values, value in zip(grouped[endpoint], (latency, status, size, lag)):
+                values.append(value)
+
+        endpoints = {}
+        for endpoint, (latencies, statuses, sizes, lags) in sorted(grouped.items()):
+            statistics = LoadDriver.summarize(latencies, statuses, sizes, wall_time)
+            statistics['lag_p50_ms'] = float(np.percentile(lags, 50)) * 1000
+            statistics['lag_p99_ms'] = float(np.percentile(lags, 99)) * 1000
+            endpoints[endpoint] = statistics
+
+        return {
+            'wall_time': wall_time,
+            'requests': len(results),
+            'skipped': skipped,
+            'requests_per_second': len(results) / wall_time if wall_time else None,
+            'endpoints': endpoints,
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replays queries recorded in data sharing logs.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    parse_parser = subparsers.add_parser('parse', help='Converts data sharing logs into workload file.')
+    parse_parser.add_argument('logs', nargs='+', help='Log files or folders (e.g. logs/data_sharing).')
+    parse_parser.add_argument('-o', '--output', type=str, default='workload.jsonl', help='Path to workload file.')
+
+    replay_parser = subparsers.add_parser('replay', help='Sends queries from workload file to a node.')
+    replay_parser.add_argument('workload', help='Path to workload file.')
+    replay_parser.add_argument('-e', '--endpoint', type=str, required=True, help='Node address.')
+    replay_parser.add_argument('-s', '--speed', type=float, default=1.0,
+                               help='Acceleration of the original pacing (0 sends queries as fast as possible).')
+    replay_parser.add_argument('-c', '--concurrency', type=int, default=8, help='Maximal number of concurrent queries.')
+    replay_parser.add_argument('-n', '--limit', type=int, help='Maximal number of replayed queries.')
+    replay_parser.add_argument('--user-id', type=str, help='User (with node part) sending private queries.')
+    replay_parser.add_argument('--private-key', type=str,
+                               help='Private key of the user (private queries are skipped without it).')
+    replay_parser.add_argument('-o', '--output', type=str, default='replay.json', help='Path to JSON results.')
+    args = parser.parse_args()
+
+    if args.command == 'parse':
+        queries = LogReplay.parse_logs(args.logs)
+        LogReplay.save_workload(queries, args.output)
+        counts = {}
+        for query in queries:
+            counts[query['endpoint']] = counts.get(query['endpoint'], 0) + 1
+        print('{} queries ({}) saved to {}.'.format(
+            len(queries), ', '.join('{} {}'.format(count, endpoint) for endpoint, count in sorted(counts.items())),
+            args.output))
+
+    elif args.command == 'replay':
+        private_key = None
+        if args.private_key:
+            if not args.user_id:
+                parser.error('--user-id is required with --private-key')
+            with open(args.private_key, 'rb') as file:
+                private_key = RSA.importKey(file.read())
+
+        replay = LogReplay.replay(LogReplay.load_workload(args.workload, args.limit), args.endpoint, args.speed,
+                                  args.concurrency, args.user_id, private_key)
+        results = {
+            'created': datetime.datetime.now().isoformat(),
+            'parameters': {'workload': os.path.abspath(args.workload), 'endpoint': args.endpoint, 'speed': args.speed,
+                           'concurrency': args.concurrency, 'limit': args.limit},
+            'results': replay,
+        }
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+        print('{} queries in {:.1f} s ({:.1f} queries/s), {} private queries skipped'.format(
+            replay['requests'], replay['wall_time'], replay['requests_per_second'] or 0, replay['skipped']))
+        for endpoint, statistics in replay['endpoints'].items():
+            print('{:24} {:7} queries {:6} errors  p50 {:9.3f} ms  p90 {:9.3f} ms  p99 {:9.3f} ms  max {:9.3f} ms  '
+                  'lag p99 {:9.3f} ms'.format(endpoint, statistics['requests'], statistics['errors'], statistics['p50_ms'],
+                                              statistics['p90_ms'], statistics['p99_ms'], statistics['max_ms'],
+                                              statistics['lag_p99_ms']))
+        print('Results saved to {}.'.format(args.output))
+
+    else:
+        parser.print_help()
@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import queue
+import atexit
+import signal
+import logging
+import threading
+import multiprocessing
+
+from logging.handlers import TimedRotatingFileHandler
+from configparser import ConfigParser
+
+config = ConfigParser()
+config.read(os.path.join(os.getcwd(), 'config.ini'), encoding='utf-8')
+
+TEXT_FORMAT = '%(asctime)s:%(name)s:%(funcName)s:%(message)s'
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    This formatter writes every record as a single JSON object.
+    """
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'function': record.funcName,
+            'message': record.getMessage(),
+        }
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data)
+
+
+class QueueLogHandler(logging.Handler):
+    """
+    This handler puts records into the logging pipeline queue. It never blocks; if the queue is full the record
+    is dropped and counted.
+
+    Attributes:
+        target (logging.Handler): handler that writes records in the writer thread (its file is opened only there)
+    """
+
+    def __init__(self, target):
+        super().__init__()
+        self.target = target
+
+    def emit(self, record):
+        try:
+            # message is formatted now, so the record does not hold references to arguments and traceback
+            record.msg = record.getMessage()
+            record.args = None
+            if record.exc_info:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+            LoggingPipeline.put(self.target, record)
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        LoggingPipeline.flush()
+
+    def close(self):
+        LoggingPipeline.close()
+        super().close()
+
+
+class LoggingPipeline(object):
+    """
+    This class writes log records in a background thread.
+
+    Records from all loggers go to one bounded queue (`QUEUE_SIZE`). Writer thread takes up to `BATCH_SIZE` records
+    at once, writes them to files and flushes every file once per batch. Records are written as text or as JSON lines
+    (`FORMAT = json`). Writer thread is started lazily in the process logging records.
+
+    Processes forked from the same parent must not write the same files (each of them would rotate the file at
+    midnight and remove logs written by others). After `share` is called in the parent, records of all its children
+    are formatted in the child and sent through one queue to a single writer process running `run_writer`.
+    """
+
+    _queue = None
+    _shared_queue = None
+    _thread = None
+    _pid = None
+    _dropped = 0
+    _written = 0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_formatter():
+        if config.get('LOGGING', 'FORMAT', fallback='text') == 'json':
+            return JsonLinesFormatter()
+        return logging.Formatter(TEXT_FORMAT)
+
+    @staticmethod
+    def add_file_handler(logger, path, level=logging.INFO):
+        """
+        This function makes the logger write to a daily rotated file through the pipeline.
+        :param logger: (logging.Logger) logger
+        :param path: (str) log file path
+        :param level: (int) minimal level of written records
+        :return: (QueueLogHandler) handler added to the logger
+        """
+        handler = QueueLogHandler(LoggingPipeline._create_file_handler(path, level, LoggingPipeline.get_formatter()))
+        handler.setLevel(level)
+        logger.addHandler(handler)
+        return handler
+
+    @staticmethod
+    def _create_file_handler(path, level, formatter):
+        # file is opened on the first write, so it is not opened by processes sending records to the writer process
+        file_handler = TimedRotatingFileHandler(path, when="midnight", interval=1, delay=True)
+        file_handler.setLevel(level)
+        file_handler.setFormatter(formatter)
+        file_handler.suffix = "%Y-%m-%d"
+        return file_handler
+
+    @staticmethod
+    def share():
+        """
+        This function makes child processes forked later send records to one writer process (`run_writer`).
+        It has to be called in the parent process before any child is forked and before anything is logged.
+        """
+        LoggingPipeline._shared_queue = multiprocessing.get_context('fork').Queue(
+            config.getint('LOGGING', 'QUEUE_SIZE', fallback=10000))
+
+    @staticmethod
+    def _start():
+        with LoggingPipeline._lock:
+            if LoggingPipeline._pid == os.getpid():
+                return
+            LoggingPipeline._dropped = 0
+            LoggingPipeline._written = 0
+            if LoggingPipeline._shared_queue is not None:
+                # records are written by the writer process
+                LoggingPipeline._queue = LoggingPipeline._shared_queue
+            else:
+                LoggingPipeline._queue = queue.Queue(config.getint('LOGGING', 'QUEUE_SIZE', fallback=10000))
+                LoggingPipeline._thread = threading.Thread(target=LoggingPipeline._write, name='logging-pipeline',
+                                                           daemon=True)
+                LoggingPipeline._thread.start()
+            LoggingPipeline._pid = os.getpid()
+
+    @staticmethod
+    def put(target, record):
+        """
+        This function puts record into the queue without waiting.
+        :param target: (logging.Handler) handler writing the record
+        :param record: (logging.LogRecord) prepared record
+        """
+        if LoggingPipeline._pid != os.getpid():
+            LoggingPipeline._start()
+        log_queue = LoggingPipeline._queue
+        try:
+            if log_queue is None:
+                # pipeline of this process is already closed
+                raise queue.Full
+            if log_queue is LoggingPipeline._shared_queue:
+                if record.levelno < target.level:
+                    return
+                log_queue.put_nowait((target.baseFilename, record.levelno, target.format(record)))
+                with LoggingPipeline._lock:
+                    LoggingPipeline._written += 1
+            else:
+                log_queue.put_nowait((target, record))
+        except queue.Full:
+            with LoggingPipeline._lock:
+                LoggingPipeline._dropped += 1
+
+    @staticmethod
+    def _write_batch(batch):
+        """
+        This function writes records grouped by target handler (every file is flushed once).
+        :param batch: (list) (target handler, record) tuples
+        """
+        targets = {}
+        for target, record in batch:
+            targets.setdefault(target, []).append(record)
+
+        for target, records in targets.items():
+            target.acquire()
+            try:
+                for record in records:
+                    if record.levelno < target.level:
+                        continue
+                    if target.shouldRollover(record):
+                        target.doRollover()
+                    if target.stream is None:
+                        target.stream = target._open()
+                    target.stream.write(target.format(record) + target.terminator)
+                target.flush()
+            except Exception:
+                for record in records:
+                    target.handleError(record)
+            finally:
+                target.release()
+
+    @staticmethod
+    def _write():
+        batch_size = config.getint('LOGGING', 'BATCH_SIZE', fallback=500)
+        log_queue = LoggingPipeline._queue
+
+        while True:
+            batch = [log_queue.get()]
+            while len(batch) < batch_size:
+                try:
+                    batch.append(log_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            LoggingPipeline._write_batch(batch)
+            with LoggingPipeline._lock:
+                LoggingPipeline._written += len(batch)
+            for _ in batch:
+                log_queue.task_done()
+
+    @staticmethod
+    def run_writer():
+        """
+        This function writes records sent by all processes to files until SIGTERM (it is run in the writer process).
+        Records sent before SIGTERM are written before it returns.
+        """
+        stopped = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signal_number, frame: stopped.set())
+
+        batch_size = config.getint('LOGGING', 'BATCH_SIZE', fallback=500)
+        log_queue = LoggingPipeline._shared_queue
+        # records are formatted by processes sending them
+        formatter = logging.Formatter('%(message)s')
+        targets = {}
+
+        while True:
+            try:
+                messages = [log_queue.get(timeout=0.5)]
+            except queue.Empty:
+                if stopped.is_set():
+                    break
+                continue
+            while len(messages) < batch_size:
+                try:
+                    messages.append(log_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            batch = []
+            for path, levelno, text in messages:
+                if path not in targets:
+                    targets[path] = LoggingPipeline._create_file_handler(path, logging.NOTSET, formatter)
+                batch.append((targets[path], logging.makeLogRecord({'msg': text, 'levelno': levelno})))
+            LoggingPipeline._write_batch(batch)
+
+        for target in targets.values():
+            target.close()
+
+    @staticmethod
+    def flush(timeout=5):
+        """
+        This function waits until all queued records are written (at most timeout seconds).
+        Records sent to the writer process are sent by `close`.
+        :param timeout: (float) maximum waiting time in seconds
+        """
+        if LoggingPipeline._pid != os.getpid() or LoggingPipeline._queue in (None, LoggingPipeline._shared_queue):
+            return
+        deadline = time.monotonic() + timeout
+        while LoggingPipeline._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    @staticmethod
+    def close():
+        """
+        This function waits until records of this process are sent to the writer process (called before exit).
+        Records logged later are dropped.
+        """
+        with LoggingPipeline._lock:
+            if LoggingPipeline._pid != os.getpid() or LoggingPipeline._queue is not LoggingPipeline._shared_queue:
+                return
+            LoggingPipeline._queue = None
+        LoggingPipeline._shared_queue.close()
+        LoggingPipeline._shared_queue.join_thread()
+
+    @staticmethod
+    def get_stats():
+        """
+        This function returns pipeline statistics of the current process.
+        Records sent to the writer process are counted as written.
+        :return: (dict) queued, written and dropped records
+        """
+        with LoggingPipeline._lock:
+            running = LoggingPipeline._pid == os.getpid() and LoggingPipeline._queue is not None
+            return {
+                'queued': LoggingPipeline._queue.qsize() if running else 0,
+                'written': LoggingPipeline._written,
+                'dropped': LoggingPipeline._dropped,
+            }
+
+
+atexit.register(LoggingPipeline.flush)
@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import bisect
+import functools
+import threading
+
+from utils.shared_state.SharedState import SharedState
+
+
+class Metrics(object):
+    """
+    This class collects counters and latency histograms and exports them in Prometheus text format.
+
+    Every process keeps its metrics in memory and publishes a snapshot to shared state database every
+    `PUBLISH_INTERVAL` seconds, so `render` (served by any worker) reports values summed over all live processes.
+    When a process exits, its last counters (`_total`) and histograms are added to the snapshot of retired processes
+    (stored with pid 0), so reported counters never decrease. Other values of the process are dropped.
+    """
+
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+    PUBLISH_INTERVAL = 10
+    RETIRED_PID = 0
+
+    _counters = {}
+    _histograms = {}
+    _descriptions = {}
+    _collectors = []
+    _publisher_pid = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    @staticmethod
+    def describe(name, metric_type, description):
+        """
+        This function sets metric type (counter, gauge or histogram) and help text.
+        :param name: (str) metric name
+        :param metric_type: (str) Prometheus metric type
+        :param description: (str) help text
+        """
+        Metrics._descriptions[name] = (metric_type, description)
+
+    @staticmethod
+    def inc(name, value=1, **labels):
+        """
+        This function increases a counter.
+        :param name: (str) metric name (should end with _total)
+        :param value: (float) increase
+        :param labels: metric labels
+        """
+        Metrics._start_publisher()
+        key = Metrics._key(name, labels)
+        with Metrics._lock:
+            Metrics._counters[key] = Metrics._counters.get(key, 0) + value
+
+    @staticmethod
+    def observe(name, value, **labels):
+        """
+        This function records a value (e.g. duration in seconds) in a histogram.
+        :param name: (str) metric name
+        :param value: (float) observed value
+        :param labels: metric labels
+        """
+        Metrics._start_publisher()
+        key = Metrics._key(name, labels)
+        index = bisect.bisect_left(Metrics.BUCKETS, value)
+        with Metrics._lock:
+            histogram = Metrics._histograms.get(key)
+            if histogram is None:
+                # bucket counts (the last one is +Inf), sum of values
+                histogram = Metrics._histograms[key] = [0] * (len(Metrics.BUCKETS) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += value
+
+    @staticmethod
+    def timed(name, **labels):
+        """
+        This function returns decorator recording duration of every call in a histogram.
+        :param name: (str) metric name (should end with _seconds)
+        :param labels: metric labels
+        :return: (function) decorator
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    Metrics.observe(name, time.perf_counter() - start, **labels)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def timed_rows(name, **labels):
+        """
+        This function returns decorator for generator functions. It records time until the generator is exhausted
+        or closed (`<name>_seconds` histogram) and number of generated rows (`<name>_rows_total` counter).
+        :param name: (str) metric name prefix
+        :param labels: metric labels
+        :return: (function) decorator
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                rows = 0
+                try:
+                    for row in function(*args, **kwargs):
+                        rows += 1
+                        yield row
+                finally:
+                    Metrics.observe('{}_seconds'.format(name), time.perf_counter() - start, **labels)
+                    Metrics.inc('{}_rows_total'.format(name), rows, **labels)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def add_collector(collector):
+        """
+        This function registers function called on every snapshot. It returns values kept by other objects
+        (e.g. cache statistics) as a list of (name, labels, value) tuples.
+        :param collector: (function) collector
+        """
+        Metrics._collectors.append(collector)
+
+    @staticmethod
+    def snapshot():
+        """
+        This function returns metrics of the current process.
+        :return: (dict) counters, histograms and collected values as lists of [name, labels, value]
+        """
+        with Metrics._lock:
+            counters = [[name, labels, value] for (name, labels), value in Metrics._counters.items()]
+            histograms = [[name, labels, list(value)] for (name, labels), value in Metrics._histograms.items()]
+
+        collected = []
+        for collector in Metrics._collectors:
+            try:
+                for name, labels, value in collector():
+                    collected.append(list(Metrics._key(name, labels)) + [value])
+            except Exception:
+                continue
+        return {'counters': counters + collected, 'histograms': histograms}
+
+    @staticmethod
+    def publish():
+        """
+        This function saves snapshot of the current process to shared state database.
+        """
+        SharedState.connect().execute(
+            'INSERT OR REPLACE INTO metrics (pid, snapshot, updated) VALUES (?, ?, ?)',
+            (os.getpid(), json.dumps(Metrics.snapshot()), time.time())
+        )
+
+    @staticmethod
+    def _publish_periodically():
+        while True:
+            time.sleep(Metrics.PUBLISH_INTERVAL)
+            try:
+                Metrics.publish()
+            except Exception:
+                continue
+
+    @staticmethod
+    def _start_publisher():
+        if Metrics._publisher_pid == os.getpid():
+            return
+        with Metrics._lock:
+            if Metrics._publisher_pid == os.getpid():
+                return
+            if Metrics._publisher_pid is not None:
+                # metrics inherited from the parent process are not counted twice
+                Metrics._counters.clear()
+                Metrics._histograms.clear()
+            Metrics._publisher_pid = os.getpid()
+            threading.Thread(target=Metrics._publish_periodically, name='metrics-publisher', daemon=True).start()
+
+    @staticmethod
+    def _process_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    @staticmethod
+    def _retire(pid):
+        """
+        This function moves counters and histograms of the exited process to the snapshot of retired processes.
+        :param pid: (int) pid of the exited process
+        """
+        with SharedState.transaction() as connection:
+            row = connection.execute('SELECT snapshot FROM metrics WHERE pid = ?', (pid,)).fetchone()
+            if row is None:
+                # already retired by other process
+                return
+            snapshot = json.loads(row[0])
+            snapshot['counters'] = [counter for counter in snapshot['counters'] if counter[0].endswith('_total')]
+
+            snapshots = [snapshot]
+            retired = connection.execute(
+                'SELECT snapshot FROM metrics WHERE pid = ?', (Metrics.RETIRED_PID,)
+            ).fetchone()
+            if retired is not None:
+                snapshots.append(json.loads(retired[0]))
+            counters, histograms = Metrics._sum(snapshots)
+
+            retired = {
+                'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+                'histograms': [[name, labels, value] for (name, labels), value in histograms.items()],
+            }
+            connection.execute('DELETE FROM metrics WHERE pid = ?', (pid,))
+            connection.execute('INSERT OR REPLACE INTO metrics (pid, snapshot, updated) VALUES (?, ?, ?)',
+                               (Metrics.RETIRED_PID, json.dumps(retired), time.time()))
+
+    @staticmethod
+    def collect():
+        """
+        This function sums metrics of the current process and snapshots of other live and retired processes.
+        :return: (tuple) counters and histograms dictionaries
+        """
+        connection = SharedState.connect()
+        for (pid,) in connection.execute('SELECT pid FROM metrics').fetchall():
+            if pid not in (os.getpid(), Metrics.RETIRED_PID) and not Metrics._process_alive(pid):
+                Metrics._retire(pid)
+
+        snapshots = [Metrics.snapshot()]
+        for (snapshot,) in connection.execute('SELECT snapshot FROM metrics WHERE pid != ?', (os.getpid(),)).fetchall():
+            snapshots.append(json.loads(snapshot))
+        return Metrics._sum(snapshots)
+
+    @staticmethod
+    def _sum(snapshots):
+        """
+        This function sums metrics of snapshots.
+        :param snapshots: (list) snapshots
+        :return: (tuple) counters and histograms dictionaries
+        """
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(tuple(label) for label in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, value in snapshot['histograms']:
+                key = (name, tuple(tuple(label) for label in labels))
+                histogram = histograms.setdefault(key, [0] * len(value))
+                for index, bucket in enumerate(value):
+                    histogram[index] += bucket
+        return counters, histograms
+
+    @staticmethod
+    def _format_labels(labels, extra=()):
+        labels = list(labels) + list(extra)
+        if not labels:
+            return ''
+        return '{{{}}}'.format(','.join(
+            '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for key, value in labels
+        ))
+
+    @staticmethod
+    def render():
+        """
+        This function returns all metrics in Prometheus text exposition format.
+        :return: (str) metrics
+        """
+        counters, histograms = Metrics.collect()
+        lines = []
+        described = set()
+
+        def describe(name, default_type):
+            if name in described:
+                return
+            described.add(name)
+            metric_type, description = Metrics._descriptions.get(name, (default_type, None))
+            if description:
+                lines.append('# HELP {} {}'.format(name, description))
+            lines.append('# TYPE {} {}'.format(name, metric_type))
+
+        for (name, labels), value in sorted(counters.items()):
+            describe(name, 'counter' if name.endswith('_total') else 'gauge')
+            lines.append('{}{} {}'.format(name, Metrics._format_labels(labels), value))
+
+        for (name, labels), value in sorted(histograms.items()):
+            describe(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(list(Metrics.BUCKETS) + ['+Inf'], value[:-1]):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(name, Metrics._format_labels(labels, [('le', bound)]), cumulative))
+            lines.append('{}_sum{} {}'.format(name, Metrics._format_labels(labels), value[-1]))
+            lines.append('{}_count{} {}'.format(name, Metrics._format_labels(labels), cumulative))
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,220 @@
+import os
+import json
+import hashlib
+import threading
+
+from configparser import ConfigParser
+
+config = ConfigParser()
+config.read(os.path.join(os.getcwd(), 'config.ini'), encoding='utf-8')
+
+
+class NodeRegistry(object):
+    """
+    This class keeps information about nodes of the federation (`nodes` folder) and their availability
+    (`nodes_available.json`) in memory.
+
+    Files are read once. Before every access `nodes` folder and files read before are checked with `os.stat`,
+    so changes made by other processes are picked up. Changes made by this process are written through to the files.
+    Information returned by /nodes is serialized once per change and identified by ETag.
+    """
+
+    NODES_FOLDER = 'nodes'
+    AVAILABILITY_FILE = os.path.join('nodes_available', 'nodes_available.json')
+    PUBLIC_KEY_FILE = os.path.join('keys', 'public.key')
+
+    EXPORTED_KEYS = ['address', 'public-key', 'laboratory-name']
+
+    _nodes = {}
+    _versions = {}
+    _folder_version = None
+    _availability = {}
+    _availability_version = None
+    _export = None
+    _export_version = None
+    _lock = threading.RLock()
+
+    @staticmethod
+    def _get_version(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _get_node_files(name):
+        return (os.path.join(NodeRegistry.NODES_FOLDER, '{}.json'.format(name)),
+                os.path.join(NodeRegistry.NODES_FOLDER, 'public.{}.key'.format(name)))
+
+    @staticmethod
+    def _read_node(name):
+        """
+        This function reads node information. Public key is taken from the key file if it exists
+        (it is replaced when the node updates its keys).
+        :param name: (str) laboratory name
+        :return: (dict) node information or None if the file is not valid
+        """
+        information_path, public_key_path = NodeRegistry._get_node_files(name)
+        try:
+            with open(information_path, 'r') as file:
+                information = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            with open(public_key_path, 'r') as file:
+                information['public-key'] = file.read()
+        except OSError:
+            pass
+        return information
+
+    @staticmethod
+    def _load():
+        """
+        This function reloads nodes whose files have changed since last read.
+        """
+        folder_version = NodeRegistry._get_version(NodeRegistry.NODES_FOLDER)
+        if folder_version != NodeRegistry._folder_version:
+            try:
+                names = [node[:-5] for node in os.listdir(NodeRegistry.NODES_FOLDER) if node.endswith('.json')]
+            except FileNotFoundError:
+                names = []
+            NodeRegistry._folder_version = folder_version
+        else:
+            names = list(NodeRegistry._versions)
+
+        versions = {name: tuple(NodeRegistry._get_version(path) for path in NodeRegistry._get_node_files(name))
+                    for name in names}
+        if versions == NodeRegistry._versions:
+            return
+
+        nodes = {}
+        for name, version in versions.items():
+            if NodeRegistry._versions.get(name) == version and name in NodeRegistry._nodes:
+                nodes[name] = NodeRegistry._nodes[name]
+                continue
+            information = NodeRegistry._read_node(name)
+            if information is not None:
+                nodes[name] = information
+
+        NodeRegistry._nodes = nodes
+        NodeRegistry._versions = versions
+
+    @staticmethod
+    def get_nodes():
+        """
+        This function returns information about all nodes saved in `nodes` folder.
+        :return: (dict) laboratory name: node information
+        """
+        with NodeRegistry._lock:
+            NodeRegistry._load()
+            return dict(NodeRegistry._nodes)
+
+    @staticmethod
+    def get_node(name):
+        """
+        This function returns information about the node.
+        :param name: (str) laboratory name
+        :return: (dict) node information or None if there is no such node
+        """
+        return NodeRegistry.get_nodes().get(name)
+
+    @staticmethod
+    def _write(path, content):
+        temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temporary_path, 'w') as file:
+            file.write(content)
+        os.replace(temporary_path, path)
+
+    @staticmethod
+    def add_node(information):
+        """
+        This function saves information about a new (or changed) node together with its public key.
+        :param information: (dict) node information with laboratory-name, address and public-key
+        """
+        information_path, public_key_path = NodeRegistry._get_node_files(information['laboratory-name'])
+        with NodeRegistry._lock:
+            NodeRegistry._write(information_path, json.dumps(information))
+            NodeRegistry._write(public_key_path, information['public-key'])
+            NodeRegistry._load()
+
+    @staticmethod
+    def update_public_key(name, public_key):
+        """
+        This function replaces public key of the node.
+        :param name: (str) laboratory name
+        :param public_key: (str) new public key in PEM format
+        """
+        with NodeRegistry._lock:
+            NodeRegistry._write(NodeRegistry._get_node_files(name)[1], public_key)
+            NodeRegistry._load()
+
+    @staticmethod
+    def get_availability():
+        """
+        This function returns results of the last nodes availability check.
+        :return: (dict) laboratory name: availability information
+        """
+        with NodeRegistry._lock:
+            version = NodeRegistry._get_version(NodeRegistry.AVAILABILITY_FILE)
+            if version != NodeRegistry._availability_version:
+                try:
+                    with open(NodeRegistry.AVAILABILITY_FILE, 'r') as file:
+                        NodeRegistry._availability = json.load(file)
+                except (OSError, ValueError):
+                    NodeRegistry._availability = {}
+                NodeRegistry._availability_version = version
+            return NodeRegistry._availability
+
+    @staticmethod
+    def get_node_address(name):
+        """
+        This function returns address of the node from the last availability check.
+        :param name: (str) laboratory name
+        :return: (str) node address or None if the node has not been checked
+        """
+        return NodeRegistry.get_availability().get(name, {}).get('address')
+
+    @staticmethod
+    def export():
+        """
+        This function returns serialized information about all nodes of the federation (including this node).
+        :return: (tuple) JSON body (bytes) and its ETag (str)
+        """
+        with NodeRegistry._lock:
+            NodeRegistry._load()
+            version = (NodeRegistry._versions, NodeRegistry._get_version(NodeRegistry.PUBLIC_KEY_FILE))
+            if NodeRegistry._export is not None and version == NodeRegistry._export_version:
+                return NodeRegistry._export
+
+            nodes_information = []
+            for name in sorted(NodeRegistry._nodes):
+                try:
+                    nodes_information.append({key: NodeRegistry._nodes[name][key] for key in NodeRegistry.EXPORTED_KEYS})
+                except KeyError:
+                    continue
+
+            with open(NodeRegistry.PUBLIC_KEY_FILE, 'r') as file:
+                my_public_key = file.read()
+            nodes_information.append({
+                'address': config.get('NODE', 'NODE_ADDRESS'),
+                'public-key': my_public_key,
+                'laboratory-name': config.get('NODE', 'LABORATORY_NAME'),
+            })
+
+            body = json.dumps(nodes_information).encode()
+            NodeRegistry._export = (body, hashlib.sha1(body).hexdigest())
+            NodeRegistry._export_version = version
+            return NodeRegistry._export
+
+    @staticmethod
+    def clear():
+        with NodeRegistry._lock:
+            NodeRegistry._nodes = {}
+            NodeRegistry._versions = {}
+            NodeRegistry._folder_version = None
+            NodeRegistry._availability = {}
+            NodeRegistry._availability_version = None
+            NodeRegistry._export = None
+            NodeRegistry._export_version = None
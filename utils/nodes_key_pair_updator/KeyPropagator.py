@@ -0,0 +1,194 @@
+import os
+import json
+import math
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urljoin
+from configparser import ConfigParser
+
+from data_share import DataShare
+from data_share.KeyStore import KeyStore
+from nodes_available.NodesChecker import NodesChecker
+from utils.node_client.NodeClient import NodeClient
+from utils.request_id_generator.RequestIdGenerator import RequestIdGenerator
+
+config = ConfigParser()
+config.read(os.path.join(os.getcwd(), 'config.ini'), encoding='utf-8')
+
+logger = logging.getLogger('utils.nodes_key_pair_updator.NodesKeyPairUpdator')
+
+
+class KeyPropagator(object):
+    """
+    This class sends new public key of this node to all other nodes.
+
+    Every update message is signed once (with the old key) and kept in the queue file (`keys/propagation_queue.json`)
+    until the node accepts it, so nodes that were unavailable get all missed updates (in order) on retry.
+    Old key is retired when `KEY_PROPAGATION_QUORUM` part of the nodes has accepted the new one.
+    """
+
+    QUEUE_PATH = os.path.join('keys', 'propagation_queue.json')
+    OLD_KEYS = [os.path.join('keys', 'public.old.key'), os.path.join('keys', 'private.old.key')]
+
+    _lock = threading.Lock()
+
+    @staticmethod
+    def load_queue():
+        """
+        This function reads propagation queue.
+        :return: (dict) pending updates for every node and number of nodes in the last rotation
+        """
+        if not os.path.isfile(KeyPropagator.QUEUE_PATH):
+            return {'pending': {}, 'nodes': 0}
+        with open(KeyPropagator.QUEUE_PATH, 'r') as file:
+            return json.load(file)
+
+    @staticmethod
+    def save_queue(queue):
+        temporary_path = '{}.{}.tmp'.format(KeyPropagator.QUEUE_PATH, os.getpid())
+        with open(temporary_path, 'w') as file:
+            json.dump(queue, file)
+        os.replace(temporary_path, KeyPropagator.QUEUE_PATH)
+
+    @staticmethod
+    def get_nodes():
+        """
+        This function returns addresses of all other nodes.
+        :return: (dict) node name: node address
+        """
+        nodes = {}
+        for node in NodesChecker.get_all_nodes():
+            try:
+                information = NodesChecker.get_node_information(node)
+                nodes[information['laboratory-name']] = information['address']
+            except (OSError, ValueError, KeyError):
+                continue
+        return nodes
+
+    @staticmethod
+    def prepare_message(public_key):
+        """
+        This function prepares key update message signed with the old key.
+        :param public_key: (str) new public key in PEM format
+        :return: (dict) signed message
+        """
+        data = {
+            'node': config.get('NODE', 'LABORATORY_NAME'),
+            'public_key': public_key,
+            'request_id': RequestIdGenerator.generate_request_id(),
+        }
+        data.update({'signature': DataShare.get_signature_for_message(data, filename='private.old.key').decode()})
+        return data
+
+    @staticmethod
+    def send(node, address, messages):
+        """
+        This function sends pending updates to a node (in order) and stops at the first failure.
+        :param node: (str) node name
+        :param address: (str) node address
+        :param messages: (list) signed update messages
+        :return: (int) number of accepted messages
+        """
+        timeout = (config.getfloat('NODE', 'NODE_CLIENT_CONNECT_TIMEOUT', fallback=3),
+                   config.getfloat('NODE', 'KEY_PROPAGATION_TIMEOUT', fallback=10))
+        for accepted, message in enumerate(messages):
+            try:
+                r = NodeClient.post(urljoin(address, 'update-keys'), json=message, timeout=timeout)
+            except Exception as e:
+                logger.info('{} {} {}'.format(node, address, e))
+                return accepted
+            logger.info('{} {} {}'.format(node, address, r.status_code))
+            if r.status_code != 200:
+                return accepted
+        return len(messages)
+
+    @staticmethod
+    def push(queue):
+        """
+        This function sends pending updates to all nodes at the same time and removes accepted ones from the queue.
+        Nodes not answering before `KEY_PROPAGATION_DEADLINE` seconds stay in the queue.
+        :param queue: (dict) propagation queue (changed in place)
+        """
+        pending = queue['pending']
+        if not pending:
+            return
+
+        workers = min(config.getint('NODE', 'KEY_PROPAGATION_WORKERS', fallback=16), len(pending))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = {
+            executor.submit(KeyPropagator.send, node, value['address'], list(value['messages'])): node
+            for node, value in pending.items()
+        }
+        done, _ = wait(futures, timeout=config.getfloat('NODE', 'KEY_PROPAGATION_DEADLINE', fallback=60))
+        executor.shutdown(wait=False)
+
+        for future, node in futures.items():
+            if future not in done:
+                future.cancel()
+                continue
+            messages = pending[node]['messages'][future.result():]
+            if messages:
+                pending[node]['messages'] = messages
+            else:
+                del pending[node]
+
+    @staticmethod
+    def quorum_reached(queue):
+        """
+        This function checks if enough nodes have the current key.
+        :param queue: (dict) propagation queue
+        :return: (bool)
+        """
+        quorum = math.ceil(config.getfloat('NODE', 'KEY_PROPAGATION_QUORUM', fallback=0.5) * queue['nodes'])
+        return queue['nodes'] - len(queue['pending']) >= quorum
+
+    @staticmethod
+    def retire_old_keys():
+        for path in KeyPropagator.OLD_KEYS:
+            if os.path.isfile(path):
+                os.remove(path)
+        KeyStore.invalidate()
+        logger.info('Old keys retired')
+
+    @staticmethod
+    def _finish(queue):
+        KeyPropagator.save_queue(queue)
+        logger.info('Key propagation: {} of {} nodes pending'.format(len(queue['pending']), queue['nodes']))
+        if os.path.isfile(KeyPropagator.OLD_KEYS[1]) and KeyPropagator.quorum_reached(queue):
+            KeyPropagator.retire_old_keys()
+
+    @staticmethod
+    def propagate(public_key):
+        """
+        This function sends new public key to all nodes. It has to be called after the old keys were renamed
+        to `public.old.key` and `private.old.key`.
+        :param public_key: (str) new public key in PEM format
+        """
+        with KeyPropagator._lock:
+            queue = KeyPropagator.load_queue()
+            nodes = KeyPropagator.get_nodes()
+            message = KeyPropagator.prepare_message(public_key)
+
+            pending = {}
+            for node, address in nodes.items():
+                messages = queue['pending'].get(node, {}).get('messages', [])
+                pending[node] = {'address': address, 'messages': messages + [message]}
+            queue = {'pending': pending, 'nodes': len(nodes)}
+
+            # queue is saved before sending, so no update is lost if the process stops
+            KeyPropagator.save_queue(queue)
+            KeyPropagator.push(queue)
+            KeyPropagator._finish(queue)
+
+    @staticmethod
+    def retry():
+        """
+        This function sends updates to nodes that have not accepted them yet.
+        """
+        with KeyPropagator._lock:
+            queue = KeyPropagator.load_queue()
+            if queue['pending']:
+                KeyPropagator.push(queue)
+            KeyPropagator._finish(queue)
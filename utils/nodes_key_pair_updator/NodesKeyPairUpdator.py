@@ -1,15 +1,13 @@
 import os
-import requests
 import logging
 
-from logging.handlers import TimedRotatingFileHandler
-from urllib.parse import urljoin
 from configparser import ConfigParser
 
-from data_share import DataShare
 from data_share.KeyGeneration import KeyGeneration
-from nodes_available.NodesChecker import NodesChecker
-from utils.request_id_generator.RequestIdGenerator import RequestIdGenerator
+from data_share.KeyStore import KeyStore
+from utils.heartbeat.Heartbeat import Heartbeat
+from utils.nodes_key_pair_updator.KeyPropagator import KeyPropagator
+from utils.logging_pipeline.LoggingPipeline import LoggingPipeline
 
 key_path = lambda name: os.path.join('keys', name)
 
@@ -20,15 +18,7 @@ os.makedirs('logs', exist_ok=True)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
-
-formatter = logging.Formatter('%(asctime)s:%(name)s:%(funcName)s:%(message)s')
-
-website_file_rotating_handler = TimedRotatingFileHandler('logs/node_updates.log', when="midnight", interval=1)
-website_file_rotating_handler.setLevel(logging.INFO)
-website_file_rotating_handler.setFormatter(formatter)
-website_file_rotating_handler.suffix = "%Y-%m-%d"
-
-logger.addHandler(website_file_rotating_handler)
+LoggingPipeline.add_file_handler(logger, 'logs/node_updates.log')
 
 
 class NodeKeyPairUpdator(object):
@@ -36,38 +26,28 @@ class NodeKeyPairUpdator(object):
     def rename_old_keys():
         os.rename(key_path('public.key'), key_path('public.old.key'))
         os.rename(key_path('private.key'), key_path('private.old.key'))
+        KeyStore.invalidate()
 
     @staticmethod
     def update_keys():
-        NodeKeyPairUpdator().rename_old_keys()
-        kg = KeyGeneration()
-        kg.generate_keys()
-        kg.save_keys()
+        """
+        This function replaces node keys with a new pair and sends the new public key to other nodes.
 
-        NodeKeyPairUpdator.update_key_on_available_nodes()
-
-        os.remove(key_path('public.old.key'))
-        os.remove(key_path('private.old.key'))
-        logger.info('New_keys_generated')
+        If the previous old key was not retired yet (not enough nodes have accepted the current key),
+        keys are not rotated and only pending updates are sent again.
+        """
+        if os.path.isfile(key_path('private.old.key')):
+            logger.info('Previous keys not retired yet')
+            KeyPropagator.retry()
+            return
 
-    @staticmethod
-    def update_key_on_available_nodes():
-        available_nodes = NodesChecker.get_all_nodes_availability()
-        logger.info(available_nodes)
-
-        for key, value in available_nodes.items():
-            url = urljoin(value['address'], 'update-keys')
-            logger.info('Sending for {}'.format(key))
-
-            keys = KeyGeneration()
-            keys.load_keys()
+        kg = KeyGeneration()
+        kg.load_from_pool()
 
-            data = {
-                'node': config.get('NODE', 'LABORATORY_NAME'),
-                'public_key': keys.public_key.exportKey().decode(),
-                'request_id': RequestIdGenerator.generate_request_id(),
-            }
-            data.update({'signature': DataShare.get_signature_for_message(data, filename='private.old.key').decode()})
+        NodeKeyPairUpdator().rename_old_keys()
+        kg.save_keys()
+        # heartbeat keys were agreed with the old key
+        Heartbeat.invalidate()
 
-            r = requests.post(url, json=data)
-            logger.info('{} {} {} {}'.format(key, url, r.status_code, data))
+        KeyPropagator.propagate(kg.public_key.exportKey().decode())
+        logger.info('New_keys_generated')
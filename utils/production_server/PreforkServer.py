@@ -0,0 +1,255 @@
+import os
+import sys
+import time
+import errno
+import signal
+import socket
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PreforkServer(object):
+    """
+    This class serves WSGI application with a pool of pre-forked worker processes.
+
+    The supervisor (process calling `run`) binds the socket, starts workers, a single scheduler process and a single
+    log writer process and restarts them when they die. It does not import the application and runs no threads,
+    so forking is safe. Workers and the scheduler import the application after fork, so a reload picks up changed
+    application code and configuration. Modules imported by the supervisor itself (e.g. the script calling `run`)
+    are not reloaded.
+
+    Signals sent to the supervisor:
+        SIGHUP: graceful reload (new workers are started, old ones finish requests in progress and exit)
+        SIGTERM, SIGINT: graceful shutdown
+
+    Attributes:
+        load_app (callable): function returning WSGI application (called in every worker)
+        run_scheduler (callable): function running scheduled jobs until SIGTERM (called in scheduler process)
+        run_log_writer (callable): function writing logs of all processes until SIGTERM (called in log writer process,
+            which is not replaced on reload and is stopped after all other processes)
+        host (str): address to listen on
+        port (int): port to listen on
+        workers (int): number of worker processes
+    """
+
+    CHECK_INTERVAL = 0.5
+    GRACEFUL_TIMEOUT = 30
+
+    def __init__(self, load_app, run_scheduler=None, host='0.0.0.0', port=80, workers=None, run_log_writer=None):
+        self.load_app = load_app
+        self.run_scheduler = run_scheduler
+        self.run_log_writer = run_log_writer
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+
+        self.socket = None
+        self.worker_pids = set()
+        self.retiring_pids = {}
+        self.scheduler_pid = None
+        self.log_writer_pid = None
+        self.reload_requested = False
+        self.stop_requested = False
+
+    def _fork(self, target):
+        """
+        This function starts a child process running target function.
+        :param target: (callable) function run in the child process
+        :return: (int) child pid
+        """
+        pid = os.fork()
+        if pid:
+            return pid
+
+        exit_code = 0
+        try:
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            target()
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            logger.exception('Child process failed')
+            exit_code = 1
+        finally:
+            logging.shutdown()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+
+    def _serve(self):
+        """
+        This function is run in a worker. It serves requests until SIGTERM and then waits for requests in progress.
+        """
+        from werkzeug.serving import make_server
+
+        server = make_server(self.host, self.port, self.load_app(), threaded=True, fd=self.socket.fileno())
+        # requests in progress are finished before the worker exits
+        server.daemon_threads = False
+
+        def shutdown(signal_number, frame):
+            threading.Thread(target=server.shutdown).start()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        server.serve_forever()
+        server.server_close()
+
+    def spawn_worker(self):
+        pid = self._fork(self._serve)
+        self.worker_pids.add(pid)
+        logger.info('Worker {} started'.format(pid))
+
+    def _schedule(self):
+        """
+        This function is run in the scheduler process (it does not accept connections).
+        """
+        self.socket.close()
+        self.run_scheduler()
+
+    def spawn_scheduler(self):
+        if self.run_scheduler is not None:
+            self.scheduler_pid = self._fork(self._schedule)
+            logger.info('Scheduler {} started'.format(self.scheduler_pid))
+
+    def _write_logs(self):
+        """
+        This function is run in the log writer process (it does not accept connections).
+        """
+        self.socket.close()
+        self.run_log_writer()
+
+    def spawn_log_writer(self):
+        if self.run_log_writer is not None:
+            self.log_writer_pid = self._fork(self._write_logs)
+            logger.info('Log writer {} started'.format(self.log_writer_pid))
+
+    def _kill(self, pid, signal_number=signal.SIGTERM):
+        try:
+            os.kill(pid, signal_number)
+        except OSError as e:
+            if e.errno != errno.ESRCH:
+                raise
+
+    def reload(self):
+        """
+        This function replaces all workers and the scheduler with new processes.
+        Old workers stop accepting connections and exit after finishing requests in progress.
+        """
+        logger.info('Reloading')
+        old_pids = set(self.worker_pids)
+        self.worker_pids.clear()
+        for _ in range(self.workers):
+            self.spawn_worker()
+
+        deadline = time.monotonic() + self.GRACEFUL_TIMEOUT
+        for pid in old_pids:
+            self._kill(pid)
+            self.retiring_pids[pid] = deadline
+
+        if self.scheduler_pid is not None:
+            self._kill(self.scheduler_pid)
+            self.retiring_pids[self.scheduler_pid] = deadline
+            self.spawn_scheduler()
+
+    def reap(self):
+        """
+        This function collects exited children and starts new processes in place of the ones that died.
+        """
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+
+            if pid in self.retiring_pids:
+                del self.retiring_pids[pid]
+            elif pid in self.worker_pids:
+                self.worker_pids.discard(pid)
+                logger.warning('Worker {} exited with status {}'.format(pid, status))
+                if not self.stop_requested:
+                    self.spawn_worker()
+            elif pid == self.scheduler_pid:
+                self.scheduler_pid = None
+                logger.warning('Scheduler {} exited with status {}'.format(pid, status))
+                if not self.stop_requested:
+                    self.spawn_scheduler()
+            elif pid == self.log_writer_pid:
+                self.log_writer_pid = None
+                logger.warning('Log writer {} exited with status {}'.format(pid, status))
+                if not self.stop_requested:
+                    self.spawn_log_writer()
+
+        # processes not finished in time are killed
+        now = time.monotonic()
+        for pid, deadline in self.retiring_pids.items():
+            if deadline < now:
+                self._kill(pid, signal.SIGKILL)
+
+    def stop(self):
+        """
+        This function stops all children gracefully (they are killed after `GRACEFUL_TIMEOUT` seconds).
+        The log writer is stopped last, so records of other processes are written.
+        """
+        logger.info('Stopping')
+        self.stop_requested = True
+        deadline = time.monotonic() + self.GRACEFUL_TIMEOUT
+        for pid in list(self.worker_pids) + [self.scheduler_pid]:
+            if pid is not None:
+                self._kill(pid)
+                self.retiring_pids[pid] = deadline
+        self.worker_pids.clear()
+        self.scheduler_pid = None
+
+        while self.retiring_pids:
+            self.reap()
+            time.sleep(self.CHECK_INTERVAL / 5)
+
+        if self.log_writer_pid is not None:
+            self._kill(self.log_writer_pid)
+            self.retiring_pids[self.log_writer_pid] = time.monotonic() + self.GRACEFUL_TIMEOUT
+            self.log_writer_pid = None
+            while self.retiring_pids:
+                self.reap()
+                time.sleep(self.CHECK_INTERVAL / 5)
+
+    def run(self):
+        """
+        This function starts serving and supervises child processes until SIGTERM or SIGINT.
+        """
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((self.host, self.port))
+        self.socket.listen(socket.SOMAXCONN)
+        self.socket.set_inheritable(True)
+        logger.info('Listening on {}:{} with {} workers'.format(self.host, self.port, self.workers))
+
+        def request_reload(signal_number, frame):
+            self.reload_requested = True
+
+        def request_stop(signal_number, frame):
+            self.stop_requested = True
+
+        signal.signal(signal.SIGHUP, request_reload)
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        self.spawn_log_writer()
+        self.spawn_scheduler()
+        for _ in range(self.workers):
+            self.spawn_worker()
+
+        try:
+            while not self.stop_requested:
+                if self.reload_requested:
+                    self.reload_requested = False
+                    self.reload()
+                self.reap()
+                time.sleep(self.CHECK_INTERVAL)
+        finally:
+            self.stop()
+            self.socket.close()
@@ -1,50 +1,72 @@
 import os
-import json
 
 
 from configparser import ConfigParser
 
+from utils.public_variants_handler.TokenBucketLimiter import TokenBucketLimiter
+
 config = ConfigParser()
 config.read(os.path.join(os.getcwd(), 'config.ini'), encoding='utf-8')
 
 
 class PublicVariantsHandler(object):
+    """
+    This class limits public variants requests.
+
+    There is a global bucket (`MAX_PUBLIC_VARIANT_REQUEST_LIMIT` requests, refilled daily by `reset_limit`)
+    and a bucket per client (`PUBLIC_CLIENT_BURST` requests, refilled with `PUBLIC_CLIENT_RATE` requests per second).
+    """
+
+    GLOBAL_BUCKET = 'public_variants'
+    CLIENT_BUCKET = 'public_variants_client:{}'
 
     @staticmethod
     def get_limit_from_config():
         return config.getint('NODE', 'MAX_PUBLIC_VARIANT_REQUEST_LIMIT')
 
     @staticmethod
-    def create_temp_file():
-        data = {'public_variants_requests_left': PublicVariantsHandler.get_limit_from_config()}
-        with open('temp.json', 'w') as file:
-            json.dump(data, file)
+    def get_global_bucket():
+        return PublicVariantsHandler.GLOBAL_BUCKET, PublicVariantsHandler.get_limit_from_config(), 0
 
     @staticmethod
-    def reset_limit():
-        with open('temp.json', 'r') as file:
-            data = json.load(file)
-
-        data['public_variants_requests_left'] = PublicVariantsHandler.get_limit_from_config()
+    def get_client_bucket(client_id):
+        return (
+            PublicVariantsHandler.CLIENT_BUCKET.format(client_id),
+            config.getint('NODE', 'PUBLIC_CLIENT_BURST', fallback=10),
+            config.getfloat('NODE', 'PUBLIC_CLIENT_RATE', fallback=0.2),
+        )
 
-        with open('temp.json', 'w') as file:
-            json.dump(data, file)
+    @staticmethod
+    def create_limits():
+        """
+        This function fills the global bucket. It should be called on server start.
+        """
+        PublicVariantsHandler.reset_limit()
 
     @staticmethod
-    def get_temp():
-        with open('temp.json', 'r') as file:
-            data = json.load(file)
-        return data
+    def reset_limit():
+        """
+        This function fills the global bucket (it is run daily) and removes buckets of clients that are full again.
+        """
+        TokenBucketLimiter.reset(*PublicVariantsHandler.get_global_bucket())
+        TokenBucketLimiter.remove_full(PublicVariantsHandler.CLIENT_BUCKET.format(''))
 
     @staticmethod
     def get_limit_left():
-        data = PublicVariantsHandler.get_temp()
-        return data['public_variants_requests_left']
+        return int(TokenBucketLimiter.get_tokens(*PublicVariantsHandler.get_global_bucket()))
 
     @staticmethod
-    def decrease_number_of_requests_left(value=1):
-        current = PublicVariantsHandler.get_limit_left()
+    def try_acquire(client_id, value=1):
+        """
+        This function takes requests from both the global and the client's bucket.
+        :param client_id: (str) client identifier (e.g. IP address)
+        :param value: (int) number of requests
+        :return: (bool) False if any of the limits is reached
+        """
+        return TokenBucketLimiter.acquire(
+            [PublicVariantsHandler.get_global_bucket(), PublicVariantsHandler.get_client_bucket(client_id)], value
+        )
 
-        data = {'public_variants_requests_left': current - value}
-        with open('temp.json', 'w') as file:
-            json.dump(data, file)
+    @staticmethod
+    def decrease_number_of_requests_left(value=1):
+        TokenBucketLimiter.acquire([PublicVariantsHandler.get_global_bucket()], value)
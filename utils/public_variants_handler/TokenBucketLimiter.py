@@ -0,0 +1,80 @@
+import time
+
+from utils.shared_state.SharedState import SharedState
+
+
+class TokenBucketLimiter(object):
+    """
+    This class implements token buckets kept in shared state database, so limits are common for all server processes.
+
+    Every bucket has capacity and refill rate (tokens per second). Bucket with rate 0 is refilled only by `reset`.
+    Checking and taking tokens from many buckets is a single transaction, so concurrent requests never lose updates.
+    """
+
+    @staticmethod
+    def _get_tokens(connection, name, capacity, rate, now):
+        row = connection.execute('SELECT tokens, updated FROM token_buckets WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            return capacity
+        tokens, updated = row
+        return min(capacity, tokens + max(now - updated, 0) * rate)
+
+    @staticmethod
+    def acquire(buckets, cost=1):
+        """
+        This function takes tokens from all given buckets if every bucket has enough of them.
+        :param buckets: (list) (name, capacity, rate) tuples
+        :param cost: (int) number of tokens taken from every bucket
+        :return: (bool) True if tokens were taken, False if any bucket has not enough tokens
+        """
+        now = time.time()
+
+        with SharedState.transaction() as connection:
+            tokens = [TokenBucketLimiter._get_tokens(connection, name, capacity, rate, now)
+                      for name, capacity, rate in buckets]
+            if any(bucket_tokens < cost for bucket_tokens in tokens):
+                return False
+
+            for (name, capacity, rate), bucket_tokens in zip(buckets, tokens):
+                connection.execute(
+                    'INSERT OR REPLACE INTO token_buckets (name, tokens, capacity, rate, updated) VALUES (?, ?, ?, ?, ?)',
+                    (name, bucket_tokens - cost, capacity, rate, now)
+                )
+            return True
+
+    @staticmethod
+    def get_tokens(name, capacity, rate=0):
+        """
+        This function returns number of tokens left in a bucket.
+        :param name: (str) bucket name
+        :param capacity: (float) bucket capacity
+        :param rate: (float) refill rate (tokens per second)
+        :return: (float) tokens left
+        """
+        return TokenBucketLimiter._get_tokens(SharedState.connect(), name, capacity, rate, time.time())
+
+    @staticmethod
+    def reset(name, capacity, rate=0):
+        """
+        This function fills the bucket up to its capacity.
+        :param name: (str) bucket name
+        :param capacity: (float) bucket capacity
+        :param rate: (float) refill rate (tokens per second)
+        """
+        SharedState.connect().execute(
+            'INSERT OR REPLACE INTO token_buckets (name, tokens, capacity, rate, updated) VALUES (?, ?, ?, ?, ?)',
+            (name, capacity, capacity, rate, time.time())
+        )
+
+    @staticmethod
+    def remove_full(prefix):
+        """
+        This function removes buckets which have been refilled up to their capacity (a missing bucket is full),
+        so buckets created for every client do not accumulate. Buckets with rate 0 are kept.
+        :param prefix: (str) prefix of names of removed buckets
+        :return: (int) number of removed buckets
+        """
+        return SharedState.connect().execute(
+            'DELETE FROM token_buckets WHERE substr(name, 1, ?) = ? AND rate > 0 AND tokens + (? - updated) * rate >= capacity',
+            (len(prefix), prefix, time.time())
+        ).rowcount
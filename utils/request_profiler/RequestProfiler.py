@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import random
+import cProfile
+import datetime
+import threading
+import tracemalloc
+
+from configparser import ConfigParser
+
+from utils.shared_state.SharedState import SharedState
+
+config = ConfigParser()
+config.read(os.path.join(os.getcwd(), 'config.ini'), encoding='utf-8')
+
+# CPU time of the current thread (time.thread_time is not available before Python 3.7)
+cpu_time = getattr(time, 'thread_time', time.process_time)
+
+
+class RequestProfiler(object):
+    """
+    This class profiles sampled requests with cProfile and tracemalloc.
+
+    Profiling settings are kept in shared state database, so they can be changed at runtime for all server processes.
+    Every process reads them at most once per `SETTINGS_REFRESH` seconds, when profiling is disabled a request costs
+    only this check. Only one request at a time is profiled in a process (tracemalloc traces the whole process),
+    other sampled requests are served normally.
+    """
+
+    PROFILES_FOLDER = os.path.join('logs', 'profiles')
+    SETTINGS_REFRESH = 1
+
+    _settings = None
+    _checked = None
+    _busy = threading.Lock()
+
+    @staticmethod
+    def get_max_duration():
+        return config.getint('PROFILING', 'MAX_DURATION', fallback=3600)
+
+    @staticmethod
+    def configure(enabled, sample_rate=1.0, endpoints=None, duration=None):
+        """
+        This function changes profiling settings of all server processes. Profiling is disabled automatically after
+        given time.
+        :param enabled: (bool) True enables profiling
+        :param sample_rate: (float) part of requests which are profiled (from 0 to 1)
+        :param endpoints: (list) names of profiled endpoints (None profiles all endpoints)
+        :param duration: (int) number of seconds after which profiling is disabled (at most `MAX_DURATION`)
+        :return: (dict) new settings
+        """
+        max_duration = RequestProfiler.get_max_duration()
+        duration = max_duration if duration is None else min(float(duration), max_duration)
+
+        settings = {
+            'enabled': bool(enabled),
+            'sample_rate': min(max(float(sample_rate), 0.0), 1.0),
+            'endpoints': list(endpoints) if endpoints else None,
+            'expires': time.time() + duration if enabled else None,
+        }
+        SharedState.connect().execute(
+            'INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)', ('profiling', json.dumps(settings))
+        )
+        RequestProfiler._checked = None
+        return settings
+
+    @staticmethod
+    def get_settings():
+        """
+        This function returns current profiling settings (read again after `SETTINGS_REFRESH` seconds).
+        :return: (dict) settings or None if profiling has never been configured
+        """
+        now = time.monotonic()
+        if RequestProfiler._checked is not None and now - RequestProfiler._checked < RequestProfiler.SETTINGS_REFRESH:
+            return RequestProfiler._settings
+
+        row = SharedState.connect().execute('SELECT value FROM settings WHERE name = ?', ('profiling',)).fetchone()
+        RequestProfiler._settings = json.loads(row[0]) if row is not None else None
+        RequestProfiler._checked = now
+        return RequestProfiler._settings
+
+    @staticmethod
+    def should_profile(endpoint):
+        """
+        This function checks if request should be profiled.
+        :param endpoint: (str) name of the endpoint
+        :return: (bool) True if profiling is enabled for the endpoint and the request is sampled
+        """
+        settings = RequestProfiler.get_settings()
+        if not settings or not settings['enabled'] or time.time() > settings['expires']:
+            return False
+        if settings['endpoints'] and endpoint not in settings['endpoints']:
+            return False
+        return random.random() < settings['sample_rate']
+
+    @staticmethod
+    def start():
+        """
+        This function starts profiling of the current thread.
+        :return: (dict) profiling state passed to `stop` or None if other request is profiled
+        """
+        if not RequestProfiler._busy.acquire(blocking=False):
+            return None
+
+        try:
+            tracemalloc.start()
+            profile = cProfile.Profile()
+            state = {'profile': profile, 'wall': time.perf_counter(), 'cpu': cpu_time()}
+            profile.enable()
+        except Exception:
+            # e.g. other profiler is already active
+            tracemalloc.stop()
+            RequestProfiler._busy.release()
+            return None
+        return state
+
+    @staticmethod
+    def stop(state, name):
+        """
+        This function stops profiling and saves collected statistics to `PROFILES_FOLDER`.
+        :param state: (dict) profiling state returned by `start`
+        :param name: (str) name of the profiled request used in file name (e.g. endpoint)
+        :return: (dict) wall and CPU time (in seconds), peak memory allocated during the request (in bytes)
+        and path to .pstats file
+        """
+        try:
+            state['profile'].disable()
+            result = {
+                'wall_time': time.perf_counter() - state['wall'],
+                'cpu_time': cpu_time() - state['cpu'],
+                'peak_memory': tracemalloc.get_traced_memory()[1],
+            }
+            tracemalloc.stop()
+
+            os.makedirs(RequestProfiler.PROFILES_FOLDER, exist_ok=True)
+            path = os.path.join(RequestProfiler.PROFILES_FOLDER, '{}-{}-{}.pstats'.format(
+                datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f'), name, os.getpid()
+            ))
+            state['profile'].dump_stats(path)
+            result['path'] = path
+            return result
+        finally:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            RequestProfiler._busy.release()
@@ -0,0 +1,90 @@
+import os
+import hmac
+import time
+import hashlib
+
+from configparser import ConfigParser
+
+from utils.encryption_key_generator.EncryptionKeyGenerator import EncryptionKeyGenerator
+from utils.request_id_generator.RandomIdGenerator import RandomIdGenerator
+from utils.shared_state.SharedState import SharedState
+
+config = ConfigParser()
+config.read(os.path.join(os.getcwd(), 'config.ini'), encoding='utf-8')
+
+
+class SessionStore(object):
+    """
+    This class holds symmetric session keys negotiated by users.
+
+    Session key is sent to the user once (wrapped with user's public key). Later responses are encrypted with keys
+    derived from session key and request id, so no RSA operation is needed per response. Session expires after
+    `SESSION_TTL` seconds or after `SESSION_MAX_REQUESTS` responses, then the user has to negotiate a new one.
+    Sessions are kept in shared state database, so every server process can use them.
+    """
+
+    @staticmethod
+    def get_ttl():
+        return config.getint('NODE', 'SESSION_TTL', fallback=3600)
+
+    @staticmethod
+    def get_max_requests():
+        return config.getint('NODE', 'SESSION_MAX_REQUESTS', fallback=10000)
+
+    @staticmethod
+    def create_session(user_id, previous_session_id=None):
+        """
+        This function creates new session for a user. Previous session of the user (if given) is closed.
+        :param user_id: (str) user identification string with node part
+        :param previous_session_id: (str) session which is rotated
+        :return: (tuple) session id (str), session key (str) and expiration timestamp (float)
+        """
+        session_id = RandomIdGenerator.generate_random_id()
+        session_key = EncryptionKeyGenerator.generate_encryption_key()
+        expires = time.time() + SessionStore.get_ttl()
+
+        with SharedState.transaction() as connection:
+            connection.execute('DELETE FROM sessions WHERE expires < ?', (time.time(),))
+            connection.execute('DELETE FROM sessions WHERE session_id = ? AND user_id = ?', (previous_session_id, user_id))
+            connection.execute(
+                'INSERT INTO sessions (session_id, user_id, key, expires, requests_left) VALUES (?, ?, ?, ?, ?)',
+                (session_id, user_id, session_key, expires, SessionStore.get_max_requests())
+            )
+        return session_id, session_key, expires
+
+    @staticmethod
+    def get_session_key(session_id, user_id):
+        """
+        This function returns session key if the session is valid for a user. Every call counts as one response.
+        :param session_id: (str) session identification string
+        :param user_id: (str) user identification string with node part
+        :return: (str) session key or None if session does not exist, has expired or belongs to other user
+        """
+        with SharedState.transaction() as connection:
+            updated = connection.execute(
+                'UPDATE sessions SET requests_left = requests_left - 1 '
+                'WHERE session_id = ? AND user_id = ? AND expires >= ? AND requests_left > 0',
+                (session_id, user_id, time.time())
+            ).rowcount
+            if not updated:
+                connection.execute('DELETE FROM sessions WHERE session_id = ? AND user_id = ?', (session_id, user_id))
+                return None
+            return connection.execute('SELECT key FROM sessions WHERE session_id = ?', (session_id,)).fetchone()[0]
+
+    @staticmethod
+    def close_user_sessions(user_id):
+        """
+        This function closes all sessions of a user (e.g. after key update).
+        :param user_id: (str) user identification string with node part
+        """
+        SharedState.connect().execute('DELETE FROM sessions WHERE user_id = ?', (user_id,))
+
+    @staticmethod
+    def derive_key(session_key, request_id):
+        """
+        This function derives encryption key for a single response.
+        :param session_key: (str) session key
+        :param request_id: (str) response request id
+        :return: (bytes) 32 bytes encryption key
+        """
+        return hmac.new(session_key.encode(), request_id.encode(), hashlib.sha256).digest()
@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import threading
+
+from contextlib import contextmanager
+
+from configparser import ConfigParser
+
+config = ConfigParser()
+config.read(os.path.join(os.getcwd(), 'config.ini'), encoding='utf-8')
+
+
+class SharedState(object):
+    """
+    This class gives access to local SQLite database holding state shared by all server processes (e.g. rate limits).
+
+    Every thread of every process gets its own connection. Database works in WAL mode, so readers do not block writers.
+    Tables are created when a connection is opened.
+    """
+
+    SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS token_buckets ('
+        'name TEXT PRIMARY KEY, tokens REAL NOT NULL, capacity REAL NOT NULL, rate REAL NOT NULL, updated REAL NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS sessions ('
+        'session_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, key TEXT NOT NULL, expires REAL NOT NULL, '
+        'requests_left INTEGER NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS sessions_user_id ON sessions (user_id)',
+        'CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)',
+        'CREATE TABLE IF NOT EXISTS remote_users ('
+        'user_id TEXT PRIMARY KEY, node TEXT NOT NULL, result TEXT NOT NULL, expires REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS remote_users_node ON remote_users (node)',
+        'CREATE TABLE IF NOT EXISTS metrics (pid INTEGER PRIMARY KEY, snapshot TEXT NOT NULL, updated REAL NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS heartbeat_keys ('
+        'node TEXT NOT NULL, direction TEXT NOT NULL, key TEXT NOT NULL, expires REAL NOT NULL, '
+        'PRIMARY KEY (node, direction))',
+        'CREATE TABLE IF NOT EXISTS heartbeat_requests (request_id TEXT PRIMARY KEY, expires REAL NOT NULL)',
+    ]
+
+    _local = threading.local()
+
+    @staticmethod
+    def get_database_path():
+        return config.get('NODE', 'SHARED_STATE_DATABASE', fallback='shared_state.db')
+
+    @staticmethod
+    def connect():
+        """
+        This function returns connection of the current thread (new connection is opened after fork).
+        :return: (sqlite3.Connection) connection in autocommit mode
+        """
+        connection = getattr(SharedState._local, 'connection', None)
+        if connection is not None and SharedState._local.pid == os.getpid():
+            return connection
+
+        connection = sqlite3.connect(SharedState.get_database_path(), timeout=10, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        for statement in SharedState.SCHEMA:
+            connection.execute(statement)
+
+        SharedState._local.connection = connection
+        SharedState._local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    @contextmanager
+    def transaction():
+        """
+        This function opens write transaction (other processes wait until it is finished).
+        :return: (sqlite3.Connection) connection of the current thread
+        """
+        connection = SharedState.connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
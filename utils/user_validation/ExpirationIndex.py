@@ -0,0 +1,140 @@
+import os
+import json
+import fcntl
+import datetime
+import threading
+
+from contextlib import contextmanager
+
+
+class ExpirationIndex(object):
+    """
+    This class keeps expiration dates of users keys (`expiration_dates.json`) in memory.
+
+    The file is parsed again only when it is replaced or changed (e.g. it was written by other process).
+    Updates are written through to the file. Updating processes hold a lock on a separate lock file
+    (`expiration_dates.json.lock`) from reading to replacing the file, so updates of other processes are not lost.
+    New keys are searched for only when `public_keys` folder changes.
+    """
+
+    EXPIRATION_DATES_FILE = os.path.join('utils', 'user_validation', 'expiration_dates.json')
+    PUBLIC_KEYS_FOLDER = 'public_keys'
+
+    _dates = {}
+    _version = None
+    _folder_version = None
+    _lock = threading.RLock()
+
+    @staticmethod
+    def _get_version(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    @contextmanager
+    def _file_lock():
+        """
+        This function locks expiration dates file for updates of other processes.
+        """
+        with open(ExpirationIndex.EXPIRATION_DATES_FILE + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _load():
+        """
+        This function reloads expiration dates if the file has changed since last read.
+        """
+        version = ExpirationIndex._get_version(ExpirationIndex.EXPIRATION_DATES_FILE)
+        if version == ExpirationIndex._version:
+            return
+
+        if version is None:
+            expiration_dates = {}
+        else:
+            with open(ExpirationIndex.EXPIRATION_DATES_FILE, 'r') as file:
+                expiration_dates = json.load(file)
+
+        ExpirationIndex._dates = {
+            user_id: datetime.datetime.strptime(date, '%Y-%m-%d').date() for user_id, date in expiration_dates.items()
+        }
+        ExpirationIndex._version = version
+
+    @staticmethod
+    def _save():
+        """
+        This function writes expiration dates to the file (atomically, so other processes never read partial file).
+        It has to be called with the file lock held.
+        """
+        expiration_dates = {user_id: date.isoformat() for user_id, date in ExpirationIndex._dates.items()}
+
+        temp_file = '{}.{}.tmp'.format(ExpirationIndex.EXPIRATION_DATES_FILE, os.getpid())
+        with open(temp_file, 'w') as file:
+            json.dump(expiration_dates, file)
+        # version of written file (it keeps inode and modification time when it is renamed)
+        version = ExpirationIndex._get_version(temp_file)
+        os.replace(temp_file, ExpirationIndex.EXPIRATION_DATES_FILE)
+
+        ExpirationIndex._version = version
+
+    @staticmethod
+    def get_expiration_date(user_id):
+        """
+        This function returns expiration date of the user key.
+        :param user_id: (str) user_id together with node information
+        :return: (datetime.date) expiration date or None if it is not set
+        """
+        with ExpirationIndex._lock:
+            ExpirationIndex._load()
+            return ExpirationIndex._dates.get(user_id)
+
+    @staticmethod
+    def set_expiration_date(user_id, date):
+        """
+        This function sets expiration date of the user key.
+        :param user_id: (str) user_id together with node information
+        :param date: (datetime.date) new expiration date
+        """
+        with ExpirationIndex._lock, ExpirationIndex._file_lock():
+            ExpirationIndex._load()
+            ExpirationIndex._dates[user_id] = date
+            ExpirationIndex._save()
+
+    @staticmethod
+    def add_new_keys(date):
+        """
+        This function sets expiration date for keys that do not have one yet.
+        Public keys folder is listed only if it has changed since the last check.
+        :param date: (datetime.date) expiration date for new keys
+        :return: (list) users that got expiration date
+        """
+        with ExpirationIndex._lock, ExpirationIndex._file_lock():
+            ExpirationIndex._load()
+
+            folder_version = ExpirationIndex._get_version(ExpirationIndex.PUBLIC_KEYS_FOLDER)
+            if folder_version == ExpirationIndex._folder_version and ExpirationIndex._version is not None:
+                return []
+
+            existing_files = [x[7:-4] for x in os.listdir(ExpirationIndex.PUBLIC_KEYS_FOLDER)]
+            new_keys = [user_id for user_id in existing_files if user_id not in ExpirationIndex._dates]
+
+            for user_id in new_keys:
+                ExpirationIndex._dates[user_id] = date
+
+            if new_keys or ExpirationIndex._version is None:
+                ExpirationIndex._save()
+            ExpirationIndex._folder_version = folder_version
+            return new_keys
+
+    @staticmethod
+    def clear():
+        with ExpirationIndex._lock:
+            ExpirationIndex._dates = {}
+            ExpirationIndex._version = None
+            ExpirationIndex._folder_version = None
@@ -1,19 +1,31 @@
 import os
 import json
-import requests
+import time
 import datetime
 
 from urllib.parse import urljoin
 from configparser import ConfigParser
 
 import data_share
+from data_share.KeyStore import KeyStore
+from utils.user_validation.ExpirationIndex import ExpirationIndex
+from utils.metrics.Metrics import Metrics
+from utils.node_client.NodeClient import NodeClient
+from utils.node_registry.NodeRegistry import NodeRegistry
 from utils.request_id_generator.RequestIdGenerator import RequestIdGenerator
+from utils.shared_state.SharedState import SharedState
 
 config = ConfigParser()
 config.read(os.path.join(os.getcwd(), 'config.ini'), encoding='utf-8')
 
 
 class UserValidation(object):
+    """
+    This class validates users asking for private data.
+
+    Results of remote users validation (both positive and negative) are cached per `user_id@node`
+    for `REMOTE_USER_CACHE_TTL` (or `REMOTE_USER_NEGATIVE_CACHE_TTL`) seconds in shared state database.
+    """
 
     @staticmethod
     def check_local_users(user_id, node):
@@ -24,8 +36,7 @@ class UserValidation(object):
         :return: public_key (str) if user exists, None there is no such user
         """
         try:
-            with open(os.path.join('public_keys', 'public.{}@{}.key'.format(user_id, node)), 'r') as file:
-                public_key = file.read()
+            public_key = KeyStore.read(os.path.join('public_keys', 'public.{}@{}.key'.format(user_id, node)))
         except FileNotFoundError:
             public_key = False
 
@@ -41,12 +52,7 @@ class UserValidation(object):
         :param node: (str) node (laboratory) name
         :return: (str) node address or (bool) False if there is no such node
         """
-        nodes_available_path = os.path.join('nodes_available', 'nodes_available.json')
-
-        with open(nodes_available_path, 'r') as file:
-            nodes = json.load(file)
-
-        return nodes[node]['address'] if node in nodes.keys() else False
+        return NodeRegistry.get_node_address(node) or False
 
     @staticmethod
     def check_remote_node(user_id, node):
@@ -70,15 +76,15 @@ class UserValidation(object):
         post_json = dict(sorted(post_json.items()))
         post_json.update({'signature': data_share.DataShare.get_signature_for_message(post_json).decode()})
 
-        check_user_request = requests.post(urljoin(node_address, 'check-user'), json=post_json)
+        # checking user does not change anything, so it is retried like GET requests
+        check_user_request = NodeClient.post(urljoin(node_address, 'check-user'), json=post_json, idempotent=True)
 
         if check_user_request.status_code is not 200:
             return False
 
         check_user_response = check_user_request.json()
 
-        with open(os.path.join('nodes', 'public.{}.key'.format(node)), 'r') as file:
-            public_key = file.read()
+        public_key = KeyStore.read(os.path.join('nodes', 'public.{}.key'.format(node)))
 
         if not data_share.DataShare.validate_signature_from_message(check_user_response, public_key=public_key):
             return False
@@ -86,6 +92,58 @@ class UserValidation(object):
         return check_user_response['result']
 
     @staticmethod
+    def check_remote_node_cached(user_id, node):
+        """
+        This function returns cached result of `check_remote_node` or asks the remote node if there is none.
+        :param user_id: (str) user identification string
+        :param node: (str) the name of the node
+        :return: (str) public key if user is authorized and False if not
+        """
+        key = '{}@{}'.format(user_id, node)
+        cached = SharedState.connect().execute(
+            'SELECT result FROM remote_users WHERE user_id = ? AND expires > ?', (key, time.time())
+        ).fetchone()
+        if cached is not None:
+            Metrics.inc('remote_user_cache_total', result='hit')
+            return json.loads(cached[0])
+        Metrics.inc('remote_user_cache_total', result='miss')
+
+        result = UserValidation.check_remote_node(user_id, node)
+
+        if result:
+            ttl = config.getint('NODE', 'REMOTE_USER_CACHE_TTL', fallback=300)
+        else:
+            ttl = config.getint('NODE', 'REMOTE_USER_NEGATIVE_CACHE_TTL', fallback=30)
+        SharedState.connect().execute(
+            'INSERT OR REPLACE INTO remote_users (user_id, node, result, expires) VALUES (?, ?, ?, ?)',
+            (key, node, json.dumps(result), time.time() + ttl)
+        )
+        return result
+
+    @staticmethod
+    def invalidate_remote_user(user_id=None, node=None):
+        """
+        This function drops cached remote validation results.
+        :param user_id: (str) user_id with node part (drops this user only)
+        :param node: (str) node name (drops all users of this node)
+        """
+        connection = SharedState.connect()
+        if user_id is None and node is None:
+            connection.execute('DELETE FROM remote_users')
+        else:
+            connection.execute('DELETE FROM remote_users WHERE user_id = ? OR node = ?', (user_id, node))
+
+    @staticmethod
+    def is_remote_user(user_id):
+        """
+        This function checks if user belongs to other node.
+        :param user_id: (str) user_id with node part
+        :return: (bool) True if user is not a local user
+        """
+        return user_id.split('@')[-1] != config.get('NODE', 'LABORATORY_NAME')
+
+    @staticmethod
+    @Metrics.timed('user_validation_seconds')
     def validate_user(user_id):
         """
         This function checks if user_id is authorized to access the data.
@@ -96,7 +154,7 @@ class UserValidation(object):
         if node == config.get('NODE', 'LABORATORY_NAME'):
             return UserValidation.check_local_users(user_id, node)
         else:
-            return UserValidation.check_remote_node(user_id, node)
+            return UserValidation.check_remote_node_cached(user_id, node)
 
     @staticmethod
     def check_key_expiration_date():
@@ -105,25 +163,7 @@ class UserValidation(object):
 
         It produces file that contains dictionary with user_id as key and expiration date as value.
         """
-        expiration_dates_file = os.path.join('utils', 'user_validation', 'expiration_dates.json')
-
-        if not os.path.isfile(expiration_dates_file):
-            with open(expiration_dates_file, 'w') as file:
-                json.dump({}, file)
-
-        with open(expiration_dates_file, 'r') as file:
-            expiration_dates = json.load(file)
-
-        existing_expiration_dates = set(expiration_dates.keys())
-        existing_files = set([x[7:-4] for x in os.listdir('public_keys')])
-
-        new_keys = existing_files - existing_expiration_dates
-
-        for user_id in list(new_keys):
-            expiration_dates[user_id] = (datetime.date.today() + datetime.timedelta(days=30)).isoformat()
-
-        with open(expiration_dates_file, 'w') as file:
-            json.dump(expiration_dates, file)
+        ExpirationIndex.add_new_keys(datetime.date.today() + datetime.timedelta(days=30))
 
     @staticmethod
     def key_expired(user_id):
@@ -132,17 +172,12 @@ class UserValidation(object):
         :param user_id: (str) user_id together with node information
         :return: (bool) True is key has expired False otherwise
         """
-        expiration_dates_file = os.path.join('utils', 'user_validation', 'expiration_dates.json')
+        user_expiration_date = ExpirationIndex.get_expiration_date(user_id)
 
-        with open(expiration_dates_file, 'r') as file:
-            expiration_dates = json.load(file)
-
-        try:
-            user_expiration_date = expiration_dates[user_id]
-        except KeyError:
+        if user_expiration_date is None:
             return False
 
-        return datetime.datetime.strptime(user_expiration_date, '%Y-%m-%d').date() < datetime.date.today()
+        return user_expiration_date < datetime.date.today()
 
     @staticmethod
     def update_expiration_key_date(user_id):
@@ -150,14 +185,5 @@ class UserValidation(object):
         This function updates expiration date for a user given by user_id
         :param user_id: (str) user_id with node part
         """
-        expiration_dates_file = os.path.join('utils', 'user_validation', 'expiration_dates.json')
-
-        with open(expiration_dates_file, 'r') as file:
-            expiration_dates = json.load(file)
-
-        # user_expiration_date = datetime.datetime.strptime(expiration_dates[user_id], '%Y-%m-%d').date()
         time_for_update = datetime.timedelta(days=config.getint('NODE', 'USER_KEY_EXPIRATION_TIME'))
-        expiration_dates[user_id] = (datetime.datetime.today().date() + time_for_update).strftime('%Y-%m-%d')
-
-        with open(expiration_dates_file, 'w') as file:
-            json.dump(expiration_dates, file)
+        ExpirationIndex.set_expiration_date(user_id, datetime.datetime.today().date() + time_for_update)
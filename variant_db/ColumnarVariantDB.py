@@ -0,0 +1,197 @@
+import os
+import gzip
+import json
+import mmap
+import shutil
+import argparse
+import threading
+
+from array import array
+
+import numpy as np
+
+from variant_db.VariantDB import VariantDB
+from variant_db.TabixedTableVarinatDB import TabixedTableVarinatDB
+from utils.metrics.Metrics import Metrics
+
+
+MANIFEST_FILENAME = 'chromosomes.json'
+
+
+class ColumnarChromosome(object):
+    """
+    This class holds memory mapped columns of a single chromosome.
+
+    Attributes:
+        positions (np.ndarray): sorted 1-based positions of the rows
+        offsets (np.ndarray): offsets of the rows in rows file (one more than number of rows)
+        rows (mmap): rows text (tab separated, as in the source file)
+    """
+
+    def __init__(self, path):
+        self.positions = np.load(os.path.join(path, 'positions.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+
+        with open(os.path.join(path, 'rows.bin'), 'rb') as file:
+            self.rows = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b''
+
+    def get_rows(self, start=None, end=None):
+        """
+        This function yields rows with position between start and end (inclusive).
+        :param start: (int) starting position (None for the whole chromosome)
+        :param end: (int) end position
+        :return: (generator) lists of row columns
+        """
+        if start is None:
+            first, last = 0, len(self.positions)
+        else:
+            first = int(np.searchsorted(self.positions, int(start), side='left'))
+            last = int(np.searchsorted(self.positions, int(end), side='right'))
+
+        offsets = self.offsets[first:last + 1].tolist()
+        for row_start, row_end in zip(offsets, offsets[1:]):
+            yield self.rows[row_start:row_end].decode().split()
+
+
+class ColumnarVariantDB(VariantDB):
+    """
+    This class reads variants from memory mapped columnar store built from tabixed data file.
+
+    The store has to be built offline (see `build`) and is kept next to the data file in `<data file>.columnar` folder.
+    Memory maps are opened once per chromosome, so the operating system page cache is shared between processes.
+    """
+
+    _chromosomes = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_genome_filename(genome_type):
+        return TabixedTableVarinatDB.get_genome_filename(genome_type)
+
+    @staticmethod
+    def get_store_path(genome_type):
+        return '{}.columnar'.format(ColumnarVariantDB.get_genome_filename(genome_type))
+
+    @staticmethod
+    def get_chromosome(store_path, chrom):
+        """
+        This function returns memory mapped chromosome. It is reopened when the store is rebuilt.
+        :param store_path: (str) path to columnar store
+        :param chrom: (str) chromosome name
+        :return: (ColumnarChromosome) chromosome or None if there is no such chromosome in the store
+        """
+        manifest_path = os.path.join(store_path, MANIFEST_FILENAME)
+        mtime = os.path.getmtime(manifest_path)
+
+        with ColumnarVariantDB._lock:
+            cached = ColumnarVariantDB._chromosomes.get((store_path, chrom))
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+        with open(manifest_path, 'r') as file:
+            manifest = json.load(file)
+
+        chromosome = None
+        if chrom in manifest:
+            chromosome = ColumnarChromosome(os.path.join(store_path, manifest[chrom]['folder']))
+
+        with ColumnarVariantDB._lock:
+            ColumnarVariantDB._chromosomes[(store_path, chrom)] = (mtime, chromosome)
+        return chromosome
+
+    @staticmethod
+    @Metrics.timed_rows('variant_db_query', backend='columnar')
+    def get_variants(chrom=None, start=None, end=None, genome_type='hg19'):
+        """
+        This function generates an array of strings for each row in a given region (the same as `tabix` does).
+        :param chrom: (str) chromosome name
+        :param start: (int) 1-based starting position
+        :param end: (int) 1-based inclusive end position
+        :param genome_type: (str) hg19 or hg38
+        :return: (generator) lists of row columns
+        """
+        if chrom is None or (start is not None and end is None):
+            return
+
+        chromosome = ColumnarVariantDB.get_chromosome(ColumnarVariantDB.get_store_path(genome_type), str(chrom))
+        if chromosome is None:
+            return
+
+        yield from chromosome.get_rows(start, end)
+
+    @staticmethod
+    def build(source_filename, store_path, chrom_column=0, position_column=1):
+        """
+        This function converts (b)gzipped, position sorted tsv file into columnar store.
+
+        For every chromosome it writes positions, rows offsets and rows text. The store is written to temporary folder
+        and replaces the old one when it is complete.
+        :param source_filename: (str) path to (b)gzipped tsv file
+        :param store_path: (str) path to columnar store
+        :param chrom_column: (int) 0-based column number of chromosome name
+        :param position_column: (int) 0-based column number of position
+        :return: (dict) number of rows for every chromosome
+        """
+        temporary_path = '{}.tmp'.format(store_path)
+        shutil.rmtree(temporary_path, ignore_errors=True)
+        os.makedirs(temporary_path)
+
+        manifest = {}
+        chrom, rows_file, positions, offsets = None, None, None, None
+
+        def save_chromosome():
+            folder = os.path.join(temporary_path, manifest[chrom]['folder'])
+            rows_file.close()
+            np.save(os.path.join(folder, 'positions.npy'), np.frombuffer(positions, dtype=np.int64))
+            np.save(os.path.join(folder, 'offsets.npy'), np.frombuffer(offsets, dtype=np.int64))
+            manifest[chrom]['rows'] = len(positions)
+
+        with gzip.open(source_filename, 'rb') as source:
+            for line in source:
+                if line.startswith(b'#') or not line.strip():
+                    continue
+
+                fields = line.split(b'\t')
+                line_chrom = fields[chrom_column].decode()
+                position = int(fields[position_column])
+
+                if line_chrom != chrom:
+                    if chrom is not None:
+                        save_chromosome()
+                    if line_chrom in manifest:
+                        raise ValueError('Source file is not sorted. Chromosome {} is split.'.format(line_chrom))
+
+                    chrom = line_chrom
+                    manifest[chrom] = {'folder': 'chr_{}'.format(len(manifest))}
+                    os.makedirs(os.path.join(temporary_path, manifest[chrom]['folder']))
+                    rows_file = open(os.path.join(temporary_path, manifest[chrom]['folder'], 'rows.bin'), 'wb')
+                    positions, offsets = array('q'), array('q', [0])
+                elif position < positions[-1]:
+                    raise ValueError('Source file is not sorted. Position {}:{} is out of order.'.format(chrom, position))
+
+                row = line.rstrip(b'\r\n')
+                rows_file.write(row)
+                positions.append(position)
+                offsets.append(offsets[-1] + len(row))
+
+        if chrom is not None:
+            save_chromosome()
+
+        with open(os.path.join(temporary_path, MANIFEST_FILENAME), 'w') as file:
+            json.dump(manifest, file)
+
+        shutil.rmtree(store_path, ignore_errors=True)
+        os.rename(temporary_path, store_path)
+        return {name: information['rows'] for name, information in manifest.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Builds columnar variant store from data file set in config file.')
+    parser.add_argument('-gb', '--genome-build', type=str, default='hg19', help='Genome build (hg19 or hg38).')
+    args = parser.parse_args()
+
+    genome_filename = ColumnarVariantDB.get_genome_filename(args.genome_build)
+    store = ColumnarVariantDB.get_store_path(args.genome_build)
+    print('Building {} from {}.'.format(store, genome_filename))
+    rows_count = ColumnarVariantDB.build(genome_filename, store)
+    print('{} rows in {} chromosomes saved.'.format(sum(rows_count.values()), len(rows_count)))
@@ -0,0 +1,56 @@
+from variant_db.VariantDB import VariantDB
+from variant_db.TabixIndex import TabixIndex, BgzfReader, MAX_POSITION
+from variant_db.TabixedTableVarinatDB import TabixedTableVarinatDB
+from utils.metrics.Metrics import Metrics
+
+
+class NativeTabixVariantDB(VariantDB):
+    """
+    This class reads variants from bgzipped and tabix indexed files without running `tabix` process.
+
+    The index is parsed once (and reloaded when .tbi file changes), only BGZF blocks overlapping the query are inflated.
+    """
+
+    @staticmethod
+    def get_genome_filename(genome_type):
+        return TabixedTableVarinatDB.get_genome_filename(genome_type)
+
+    @staticmethod
+    @Metrics.timed_rows('variant_db_query', backend='native')
+    def get_variants(chrom=None, start=None, end=None, genome_type='hg19'):
+        """
+        This function generates an array of strings for each line in a given region (the same as `tabix` does).
+        :param chrom: (str) chromosome name
+        :param start: (int) 1-based starting position
+        :param end: (int) 1-based inclusive end position
+        :param genome_type: (str) hg19 or hg38
+        :return: (generator) lists of record columns
+        """
+        if chrom is None or (start is not None and end is None):
+            return
+
+        genome_filename = NativeTabixVariantDB.get_genome_filename(genome_type)
+        index = TabixIndex.load('{}.tbi'.format(genome_filename))
+
+        chrom = str(chrom)
+        if start is None:
+            beg, end = 0, MAX_POSITION
+        else:
+            beg, end = max(int(start) - 1, 0), int(end)
+
+        with BgzfReader(genome_filename) as reader:
+            for chunk_beg, chunk_end in index.chunks(chrom, beg, end):
+                for line in reader.read_lines(chunk_beg, chunk_end):
+                    line = line.decode()
+                    if not line or line.startswith(index.meta):
+                        continue
+
+                    fields = line.split('\t')
+                    if fields[index.col_seq - 1] != chrom:
+                        continue
+
+                    record_beg, record_end = index.record_interval(fields)
+                    if record_beg >= end:
+                        break
+                    if record_end > beg:
+                        yield line.strip().split()
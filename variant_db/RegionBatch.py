@@ -0,0 +1,66 @@
+from bisect import bisect_left, bisect_right
+
+
+class RegionBatch(object):
+    """
+    This class answers many region queries at once.
+
+    Regions are sorted and overlapping ones are coalesced, so every part of the data file is read only once
+    and in order. Results are then grouped back by requested region.
+    """
+
+    @staticmethod
+    def parse_regions(regions):
+        """
+        This function validates regions given in request.
+        :param regions: (list) dictionaries with chrom, start and optional end keys
+        :return: (list) (chrom, start, end) tuples with 1-based inclusive positions
+        """
+        if not isinstance(regions, list):
+            raise TypeError('Regions must be a list.')
+
+        parsed = []
+        for region in regions:
+            chrom, start = str(region['chrom']), int(region['start'])
+            end = int(region['end']) if region.get('end') is not None else start
+            if start < 1 or end < start:
+                raise ValueError('Invalid region {}:{}-{}.'.format(chrom, start, end))
+            parsed.append((chrom, start, end))
+        return parsed
+
+    @staticmethod
+    def coalesce(regions):
+        """
+        This function sorts regions and merges the overlapping or adjacent ones.
+        :param regions: (list) (chrom, start, end) tuples
+        :return: (list) sorted and merged (chrom, start, end) tuples
+        """
+        merged = []
+        for chrom, start, end in sorted(regions):
+            if merged and merged[-1][0] == chrom and start <= merged[-1][2] + 1:
+                merged[-1][2] = max(merged[-1][2], end)
+            else:
+                merged.append([chrom, start, end])
+        return [tuple(region) for region in merged]
+
+    @staticmethod
+    def get_variants(variant_db, regions, genome_type='hg19'):
+        """
+        This function queries variant database once per coalesced region and groups rows by requested region.
+        :param variant_db: (VariantDB) variant database (or cache) with get_variants function
+        :param regions: (list) (chrom, start, end) tuples
+        :param genome_type: (str) hg19 or hg38
+        :return: (list) dictionaries with chrom, start, end and result for every requested region (in request order)
+        """
+        merged_starts, merged_results = {}, {}
+        for chrom, start, end in RegionBatch.coalesce(regions):
+            rows = list(variant_db.get_variants(chrom, start, end, genome_type))
+            merged_starts.setdefault(chrom, []).append(start)
+            merged_results.setdefault(chrom, []).append(([int(row[1]) for row in rows], rows))
+
+        grouped = []
+        for chrom, start, end in regions:
+            positions, rows = merged_results[chrom][bisect_right(merged_starts[chrom], start) - 1]
+            result = rows[bisect_left(positions, start):bisect_right(positions, end)]
+            grouped.append({'chrom': chrom, 'start': start, 'end': end, 'result': result})
+        return grouped
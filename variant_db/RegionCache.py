@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class RegionCache(object):
+    """
+    This class caches results of variant database queries for recently asked regions.
+
+    Entries are evicted in least recently used order when cache exceeds its byte size, they expire after ttl seconds
+    and all entries of a genome build are dropped when its data file changes (checked by modification time).
+
+    Attributes:
+        variant_db (VariantDB): variant database backend queried on cache miss
+        max_bytes (int): maximum size of cached results (0 disables caching)
+        ttl (float): number of seconds after which entry expires
+        hits (int): number of queries answered from cache
+        misses (int): number of queries passed to variant database
+        evictions (int): number of entries removed because of size limit
+        invalidations (int): number of entries removed because of expiration or data file change
+    """
+
+    # estimated memory used by a single entry apart from result rows (key, entry tuple and dictionary item),
+    # so empty results are also limited by max_bytes
+    ENTRY_OVERHEAD = 200
+
+    def __init__(self, variant_db, max_bytes=64 * 1024 * 1024, ttl=3600):
+        self.variant_db = variant_db
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self.entries = OrderedDict()
+        self.size = 0
+        self.data_file_mtimes = {}
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def result_size(result):
+        """
+        This function estimates size of the cache entry holding the result (rows as they are sent in json).
+        :param result: (list) rows returned by variant database
+        :return: (int) size in bytes
+        """
+        return RegionCache.ENTRY_OVERHEAD + sum(len(element) + 4 for row in result for element in row)
+
+    def get_variants(self, chrom=None, start=None, end=None, genome_type='hg19'):
+        """
+        This function returns variants for a given region from cache or variant database.
+        :param chrom: (str) chromosome name
+        :param start: (int) starting position
+        :param end: (int) end position
+        :param genome_type: (str) hg19 or hg38
+        :return: (list) rows for a given region
+        """
+        if self.max_bytes <= 0:
+            return list(self.variant_db.get_variants(chrom, start, end, genome_type))
+
+        key = (genome_type, None if chrom is None else str(chrom), start, end)
+        self._check_data_file(genome_type)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self._remove(key)
+                self.invalidations += 1
+            self.misses += 1
+
+        result = list(self.variant_db.get_variants(chrom, start, end, genome_type))
+
+        size = RegionCache.result_size(result)
+        if size > self.max_bytes:
+            return result
+
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, result, size)
+            self.size += size
+
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+        return result
+
+    def _check_data_file(self, genome_type):
+        """
+        This function drops cached entries of a genome build if its data file has changed.
+        :param genome_type: (str) hg19 or hg38
+        """
+        try:
+            mtime = os.path.getmtime(self.variant_db.get_genome_filename(genome_type))
+        except OSError:
+            mtime = None
+
+        with self.lock:
+            if self.data_file_mtimes.get(genome_type, mtime) != mtime:
+                for key in [key for key in self.entries if key[0] == genome_type]:
+                    self._remove(key)
+                    self.invalidations += 1
+            self.data_file_mtimes[genome_type] = mtime
+
+    def _remove(self, key):
+        _, _, size = self.entries.pop(key)
+        self.size -= size
+
+    def clear(self):
+        """
+        This function removes all cached entries.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        This function returns cache statistics.
+        :return: (dict) counters together with current number of entries and their size
+        """
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self.entries),
+                'bytes': self.size,
+            }
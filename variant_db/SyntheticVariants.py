@@ -0,0 +1,115 @@
+import os
+import random
+import argparse
+
+from variant_db.TabixIndex import BgzfWriter, TabixIndexBuilder
+
+
+HEADER = ['#CHROM', 'POS', 'REF', 'ALT', 'AC', 'AF', 'AN']
+CHROMOSOMES = [str(number) for number in range(1, 23)] + ['X', 'Y']
+BASES = 'ACGT'
+
+
+class SyntheticVariants(object):
+    """
+    This class generates gnomAD-like variants file (bgzipped, tabix indexed TSV with CHROM, POS, REF, ALT, AC, AF
+    and AN columns) for testing and benchmarking without the real data.
+
+    Distances between variants are drawn from exponential distribution, so the mean number of variants per 1000 bases
+    is equal to `density`. Some positions hold more than one variant (multiallelic sites), most variants are rare.
+    """
+
+    START_POSITION = 10000
+    MULTIALLELIC_RATE = 0.05
+    INDEL_RATE = 0.08
+
+    @staticmethod
+    def generate_row(rng, chrom, position):
+        """
+        This function generates single variant.
+        :param rng: (random.Random) random generator
+        :param chrom: (str) chromosome name
+        :param position: (int) 1-based position
+        :return: (list) row columns
+        """
+        ref = rng.choice(BASES)
+        alt = rng.choice(BASES.replace(ref, ''))
+        if rng.random() < SyntheticVariants.INDEL_RATE:
+            indel = ''.join(rng.choice(BASES) for _ in range(rng.randint(1, 6)))
+            ref, alt = (ref + indel, ref) if rng.random() < 0.5 else (ref, ref + indel)
+
+        allele_number = rng.randint(100000, 250000) // 2 * 2
+        allele_count = min(int(rng.paretovariate(0.7)), allele_number)
+        return [chrom, str(position), ref, alt, str(allele_count), '{:.4g}'.format(allele_count / allele_number),
+                str(allele_number)]
+
+    @staticmethod
+    def generate_rows(variants, density, chromosomes=None, seed=0):
+        """
+        This function generates position sorted variants split equally between chromosomes.
+        :param variants: (int) number of variants
+        :param density: (float) mean number of variants per 1000 bases
+        :param chromosomes: (list) chromosome names (all human chromosomes by default)
+        :param seed: (int) random seed
+        :return: (generator) row columns
+        """
+        rng = random.Random(seed)
+        chromosomes = chromosomes or CHROMOSOMES
+        mean_distance = 1000.0 / density
+
+        for number, chrom in enumerate(chromosomes):
+            count = variants // len(chromosomes) + (1 if number < variants % len(chromosomes) else 0)
+            position = SyntheticVariants.START_POSITION
+            while count > 0:
+                sites = 2 if rng.random() < SyntheticVariants.MULTIALLELIC_RATE and count > 1 else 1
+                for _ in range(sites):
+                    yield SyntheticVariants.generate_row(rng, chrom, position)
+                count -= sites
+                position += 1 + int(rng.expovariate(1.0 / mean_distance))
+
+    @staticmethod
+    def generate(filename, variants, density=1.0, chromosomes=None, seed=0):
+        """
+        This function writes bgzipped variants file together with tabix index (`<filename>.tbi`).
+        The result is the same as running `bgzip` and `tabix -s1 -b2 -e2` on plain TSV file.
+        :param filename: (str) path to the data file
+        :param variants: (int) number of variants
+        :param density: (float) mean number of variants per 1000 bases
+        :param chromosomes: (list) chromosome names (all human chromosomes by default)
+        :param seed: (int) random seed
+        :return: (dict) chromosome name: number of variants
+        """
+        index = TabixIndexBuilder(col_seq=1, col_beg=2, col_end=2, meta='#')
+        counts = {}
+
+        with BgzfWriter(filename) as writer:
+            writer.write(('\t'.join(HEADER) + '\n').encode())
+            for row in SyntheticVariants.generate_rows(variants, density, chromosomes, seed):
+                start_offset = writer.tell()
+                writer.write(('\t'.join(row) + '\n').encode())
+
+                position = int(row[1])
+                index.add(row[0], position - 1, position, start_offset, writer.tell())
+                counts[row[0]] = counts.get(row[0], 0) + 1
+
+        index.save('{}.tbi'.format(filename))
+        return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generates gnomAD-like bgzipped and tabix indexed variants file.')
+    parser.add_argument('-o', '--output', type=str, required=True, help='Path to the data file (e.g. data/hg19/synthetic.tsv.gz).')
+    parser.add_argument('-n', '--variants', type=int, default=1000000, help='Number of variants.')
+    parser.add_argument('-d', '--density', type=float, default=1.0, help='Mean number of variants per 1000 bases.')
+    parser.add_argument('-c', '--chromosomes', type=str, help='Chromosome names separated by commas (default 1-22, X, Y).')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Random seed.')
+    args = parser.parse_args()
+
+    folder = os.path.dirname(args.output)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    chromosomes = args.chromosomes.split(',') if args.chromosomes else None
+    counts = SyntheticVariants.generate(args.output, args.variants, args.density, chromosomes, args.seed)
+    print('{} variants in {} chromosomes saved to {} ({} bytes).'.format(
+        sum(counts.values()), len(counts), args.output, os.path.getsize(args.output)))
@@ -0,0 +1,411 @@
+import gzip
+import os
+import struct
+import threading
+import zlib
+
+
+TABIX_MAGIC = b'TBI\x01'
+BGZF_HEADER_SIZE = 12
+BGZF_BLOCK_DATA_SIZE = 0xff00
+BGZF_MAX_BLOCK_SIZE = 0x10000
+
+FORMAT_GENERIC = 0
+FORMAT_SAM = 1
+FORMAT_VCF = 2
+FORMAT_ZERO_BASED = 0x10000
+
+LINEAR_INDEX_SHIFT = 14
+MAX_POSITION = 1 << 29
+
+
+class BgzfReader(object):
+    """
+    This class reads BGZF (blocked gzip) files using virtual file offsets.
+
+    Virtual offset holds compressed block offset in upper 48 bits and offset inside the uncompressed block
+    in lower 16 bits.
+
+    Attributes:
+        file (obj): binary file object opened for reading
+    """
+
+    def __init__(self, filename):
+        self.file = open(filename, 'rb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def read_block(self, block_offset):
+        """
+        This function reads and inflates single BGZF block.
+        :param block_offset: (int) offset of the block in the compressed file
+        :return: (tuple) inflated data (bytes) and offset of the next block (int)
+        """
+        self.file.seek(block_offset)
+        header = self.file.read(BGZF_HEADER_SIZE)
+        if len(header) < BGZF_HEADER_SIZE:
+            return b'', None
+
+        if header[:2] != b'\x1f\x8b' or not header[3] & 4:
+            raise ValueError('Not a BGZF block at offset {}.'.format(block_offset))
+
+        extra_length, = struct.unpack('<H', header[10:12])
+        extra = self.file.read(extra_length)
+
+        block_size = None
+        position = 0
+        while position + 4 <= extra_length:
+            subfield_id = extra[position:position + 2]
+            subfield_length, = struct.unpack('<H', extra[position + 2:position + 4])
+            if subfield_id == b'BC':
+                block_size, = struct.unpack('<H', extra[position + 4:position + 6])
+                block_size += 1
+            position += 4 + subfield_length
+
+        if block_size is None:
+            raise ValueError('Missing BGZF block size at offset {}.'.format(block_offset))
+
+        compressed = self.file.read(block_size - BGZF_HEADER_SIZE - extra_length)
+        data = zlib.decompress(compressed[:-8], -15)
+        return data, block_offset + block_size
+
+    def read_lines(self, start, end):
+        """
+        This function yields lines which start between two virtual offsets.
+        :param start: (int) virtual offset of the first line
+        :param end: (int) virtual offset after which reading is stopped
+        :return: (generator) lines (bytes) without newline characters
+        """
+        block_offset, in_block_offset = start >> 16, start & 0xFFFF
+        data, next_block_offset = self.read_block(block_offset)
+        pending = b''
+
+        while next_block_offset is not None:
+            while True:
+                if not pending and (block_offset << 16 | in_block_offset) >= end:
+                    return
+
+                newline = data.find(b'\n', in_block_offset)
+                if newline == -1:
+                    pending += data[in_block_offset:]
+                    break
+
+                yield pending + data[in_block_offset:newline]
+                pending = b''
+                in_block_offset = newline + 1
+
+            block_offset, in_block_offset = next_block_offset, 0
+            data, next_block_offset = self.read_block(block_offset)
+
+        if pending:
+            yield pending
+
+
+class BgzfWriter(object):
+    """
+    This class writes BGZF (blocked gzip) files readable by `tabix` and `BgzfReader`.
+
+    Attributes:
+        file (obj): binary file object opened for writing
+        buffer (bytearray): data of the current (not yet compressed) block
+        block_offset (int): offset of the current block in the compressed file
+    """
+
+    def __init__(self, filename, compression_level=6):
+        self.file = open(filename, 'wb')
+        self.buffer = bytearray()
+        self.block_offset = 0
+        self.compression_level = compression_level
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def compress_block(data, compression_level=6):
+        """
+        This function compresses data into BGZF blocks (data which does not fit into single block is split).
+        :param data: (bytes) data of at most `BGZF_BLOCK_DATA_SIZE` bytes
+        :param compression_level: (int) zlib compression level
+        :return: (list) compressed blocks (bytes)
+        """
+        compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        block_size = BGZF_HEADER_SIZE + 6 + len(compressed) + 8
+        if block_size > BGZF_MAX_BLOCK_SIZE:
+            middle = len(data) // 2
+            return (BgzfWriter.compress_block(data[:middle], compression_level) +
+                    BgzfWriter.compress_block(data[middle:], compression_level))
+
+        header = b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff' + struct.pack('<H', 6)
+        header += b'BC' + struct.pack('<HH', 2, block_size - 1)
+        return [header + compressed + struct.pack('<II', zlib.crc32(data) & 0xFFFFFFFF, len(data))]
+
+    def flush_block(self):
+        for block in BgzfWriter.compress_block(bytes(self.buffer), self.compression_level):
+            self.file.write(block)
+            self.block_offset += len(block)
+        self.buffer = bytearray()
+
+    def tell(self):
+        """
+        This function returns virtual offset of the next written byte.
+        :return: (int) virtual offset
+        """
+        return self.block_offset << 16 | len(self.buffer)
+
+    def write(self, data):
+        """
+        This function writes data. Full blocks are compressed immediately.
+        :param data: (bytes) data
+        """
+        position = 0
+        while position < len(data):
+            size = min(BGZF_BLOCK_DATA_SIZE - len(self.buffer), len(data) - position)
+            self.buffer += data[position:position + size]
+            position += size
+            if len(self.buffer) >= BGZF_BLOCK_DATA_SIZE:
+                self.flush_block()
+
+    def close(self):
+        """
+        This function writes remaining data and empty end-of-file block.
+        """
+        if self.buffer:
+            self.flush_block()
+        self.flush_block()
+        self.file.close()
+
+
+class TabixIndex(object):
+    """
+    This class holds parsed tabix (.tbi) index.
+
+    Attributes:
+        format (int): tabix preset format with optional zero based flag
+        col_seq (int): 1-based column number of sequence name
+        col_beg (int): 1-based column number of region start
+        col_end (int): 1-based column number of region end (0 if there is no such column)
+        meta (str): character which starts header lines
+        skip (int): number of header lines at the beginning of the file
+        names (list): sequence names in order of appearance
+        bins (list): for every sequence dictionary of bin number and list of (begin, end) chunks
+        linear (list): for every sequence list of minimal virtual offsets for 16kb windows
+    """
+
+    _cache = {}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, index_data):
+        if index_data[:4] != TABIX_MAGIC:
+            raise ValueError('Invalid tabix index.')
+
+        (n_ref, self.format, self.col_seq, self.col_beg, self.col_end,
+         meta, self.skip, names_length) = struct.unpack_from('<8i', index_data, 4)
+        self.meta = chr(meta)
+
+        offset = 36
+        names = index_data[offset:offset + names_length]
+        self.names = [name.decode() for name in names.split(b'\x00') if name]
+        offset += names_length
+
+        self.bins, self.linear = [], []
+        for _ in range(n_ref):
+            bins = {}
+            n_bin, = struct.unpack_from('<i', index_data, offset)
+            offset += 4
+            for _ in range(n_bin):
+                bin_number, n_chunk = struct.unpack_from('<Ii', index_data, offset)
+                offset += 8
+                chunks = struct.unpack_from('<{}Q'.format(2 * n_chunk), index_data, offset)
+                offset += 16 * n_chunk
+                bins[bin_number] = list(zip(chunks[::2], chunks[1::2]))
+
+            n_intv, = struct.unpack_from('<i', index_data, offset)
+            offset += 4
+            linear = struct.unpack_from('<{}Q'.format(n_intv), index_data, offset)
+            offset += 8 * n_intv
+
+            self.bins.append(bins)
+            self.linear.append(linear)
+
+        self.name_to_id = {name: number for number, name in enumerate(self.names)}
+
+    @staticmethod
+    def load(index_filename):
+        """
+        This function returns parsed index. Parsed indices are kept in memory until the index file changes.
+        :param index_filename: (str) path to .tbi file
+        :return: (TabixIndex) parsed index
+        """
+        mtime = os.path.getmtime(index_filename)
+        with TabixIndex._cache_lock:
+            cached = TabixIndex._cache.get(index_filename)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+        with gzip.open(index_filename, 'rb') as file:
+            index = TabixIndex(file.read())
+
+        with TabixIndex._cache_lock:
+            TabixIndex._cache[index_filename] = (mtime, index)
+        return index
+
+    @staticmethod
+    def region_to_bins(beg, end):
+        """
+        This function lists all bins that may overlap with a region.
+        :param beg: (int) 0-based region start
+        :param end: (int) 0-based exclusive region end
+        :return: (list) bin numbers
+        """
+        end -= 1
+        bins = [0]
+        for first_bin, shift in ((1, 26), (9, 23), (73, 20), (585, 17), (4681, 14)):
+            bins.extend(range(first_bin + (beg >> shift), first_bin + (end >> shift) + 1))
+        return bins
+
+    @staticmethod
+    def region_to_bin(beg, end):
+        """
+        This function returns the smallest bin that contains a region.
+        :param beg: (int) 0-based region start
+        :param end: (int) 0-based exclusive region end
+        :return: (int) bin number
+        """
+        end -= 1
+        for first_bin, shift in ((4681, 14), (585, 17), (73, 20), (9, 23), (1, 26)):
+            if beg >> shift == end >> shift:
+                return first_bin + (beg >> shift)
+        return 0
+
+    def chunks(self, chrom, beg, end):
+        """
+        This function returns merged file chunks that may contain records from a region.
+        :param chrom: (str) sequence name
+        :param beg: (int) 0-based region start
+        :param end: (int) 0-based exclusive region end
+        :return: (list) sorted (begin, end) virtual offsets
+        """
+        ref_id = self.name_to_id.get(chrom)
+        if ref_id is None:
+            return []
+
+        linear = self.linear[ref_id]
+        min_offset = linear[min(beg >> LINEAR_INDEX_SHIFT, len(linear) - 1)] if linear else 0
+
+        bins = self.bins[ref_id]
+        candidates = sorted(chunk for bin_number in TabixIndex.region_to_bins(beg, end)
+                            for chunk in bins.get(bin_number, []) if chunk[1] > min_offset)
+
+        merged = []
+        for chunk_beg, chunk_end in candidates:
+            chunk_beg = max(chunk_beg, min_offset)
+            if merged and chunk_beg <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], chunk_end)
+            else:
+                merged.append([chunk_beg, chunk_end])
+        return merged
+
+    def record_interval(self, fields):
+        """
+        This function returns 0-based half open interval covered by a record.
+        :param fields: (list) record columns (str)
+        :return: (tuple) begin and end of a record
+        """
+        beg = int(fields[self.col_beg - 1])
+        if not self.format & FORMAT_ZERO_BASED:
+            beg -= 1
+
+        preset = self.format & 0xFFFF
+        if preset == FORMAT_VCF:
+            end = beg + len(fields[3])
+        elif self.col_end and self.col_end != self.col_beg:
+            end = int(fields[self.col_end - 1])
+        else:
+            end = beg + 1
+        return beg, end
+
+
+class TabixIndexBuilder(object):
+    """
+    This class builds tabix index of a position sorted file written with `BgzfWriter`.
+
+    Attributes:
+        names (list): sequence names in order of appearance
+        bins (list): for every sequence dictionary of bin number and list of [begin, end] chunks
+        linear (list): for every sequence list of minimal virtual offsets for 16kb windows
+    """
+
+    def __init__(self, col_seq=1, col_beg=2, col_end=2, meta='#', skip=0, index_format=FORMAT_GENERIC):
+        self.header = (index_format, col_seq, col_beg, col_end, ord(meta), skip)
+        self.names, self.bins, self.linear = [], [], []
+
+    def add(self, chrom, beg, end, start_offset, end_offset):
+        """
+        This function adds a record to the index.
+        :param chrom: (str) sequence name
+        :param beg: (int) 0-based record start
+        :param end: (int) 0-based exclusive record end
+        :param start_offset: (int) virtual offset of the record
+        :param end_offset: (int) virtual offset after the record
+        """
+        if not self.names or self.names[-1] != chrom:
+            if chrom in self.names:
+                raise ValueError('File is not sorted. Sequence {} is split.'.format(chrom))
+            self.names.append(chrom)
+            self.bins.append({})
+            self.linear.append([])
+
+        chunks = self.bins[-1].setdefault(TabixIndex.region_to_bin(beg, end), [])
+        if chunks and chunks[-1][1] == start_offset:
+            chunks[-1][1] = end_offset
+        else:
+            chunks.append([start_offset, end_offset])
+
+        linear = self.linear[-1]
+        last_window = (end - 1) >> LINEAR_INDEX_SHIFT
+        if len(linear) <= last_window:
+            linear.extend([None] * (last_window + 1 - len(linear)))
+        for window in range(beg >> LINEAR_INDEX_SHIFT, last_window + 1):
+            if linear[window] is None:
+                linear[window] = start_offset
+
+    def to_bytes(self):
+        """
+        This function serializes the index (not compressed).
+        :return: (bytes) index data
+        """
+        names = b''.join(name.encode() + b'\x00' for name in self.names)
+        data = [TABIX_MAGIC, struct.pack('<8i', len(self.names), *self.header, len(names)), names]
+
+        for bins, linear in zip(self.bins, self.linear):
+            data.append(struct.pack('<i', len(bins)))
+            for bin_number, chunks in sorted(bins.items()):
+                data.append(struct.pack('<Ii', bin_number, len(chunks)))
+                data.extend(struct.pack('<QQ', *chunk) for chunk in chunks)
+
+            # windows without records point to the previous record
+            filled, previous = [], 0
+            for offset in linear:
+                previous = previous if offset is None else offset
+                filled.append(previous)
+            data.append(struct.pack('<i{}Q'.format(len(filled)), len(filled), *filled))
+        return b''.join(data)
+
+    def save(self, index_filename):
+        """
+        This function writes BGZF compressed index (.tbi file).
+        :param index_filename: (str) path to index file
+        """
+        with BgzfWriter(index_filename) as writer:
+            writer.write(self.to_bytes())
@@ -1,4 +1,5 @@
 from variant_db.VariantDB import VariantDB
+from utils.metrics.Metrics import Metrics
 
 from subprocess import Popen, PIPE
 import os
@@ -7,6 +8,9 @@ from configparser import ConfigParser
 config = ConfigParser()
 config.read(os.path.join(os.getcwd(), 'config.ini'), encoding='utf-8')
 
+Metrics.describe('variant_db_query_seconds', 'histogram', 'Time until variant query results are read.')
+Metrics.describe('variant_db_query_rows_total', 'counter', 'Number of rows returned by variant queries.')
+
 
 class TabixedTableVarinatDB(VariantDB):
 
@@ -18,6 +22,7 @@ class TabixedTableVarinatDB(VariantDB):
         return os.path.join(variants_path, 'hg19', config.get('DATA', 'HG_19_FILENAME'))
 
     @staticmethod
+    @Metrics.timed_rows('variant_db_query', backend='tabix')
     def get_variants(chrom=None, start=None, end=None, genome_type='hg19'):
         """Call tabix and generate an array of strings for each line it returns."""
         genome_filename = TabixedTableVarinatDB.get_genome_filename(genome_type)
@@ -32,5 +37,9 @@ class TabixedTableVarinatDB(VariantDB):
             query = ''
 
         process = Popen(['tabix', '-f', genome_filename, query], stdout=PIPE)
-        for line in process.stdout:
-            yield [element.decode() for element in line.strip().split()]
+        try:
+            for line in process.stdout:
+                yield [element.decode() for element in line.strip().split()]
+        finally:
+            process.stdout.close()
+            process.wait()
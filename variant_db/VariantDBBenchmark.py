@@ -0,0 +1,263 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import platform
+import tempfile
+import contextlib
+
+import numpy as np
+
+from variant_db.TabixIndex import TabixIndex, BgzfReader, LINEAR_INDEX_SHIFT
+from variant_db.ColumnarVariantDB import ColumnarVariantDB
+from variant_db.SyntheticVariants import SyntheticVariants
+from variant_db.TabixedTableVarinatDB import TabixedTableVarinatDB
+from variant_db.VariantDBFactory import VariantDBFactory
+
+
+QUERY_TYPES = ['point', 'range', 'chromosome']
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+class VariantDBBenchmark(object):
+    """
+    This class measures latency and throughput of point, range and whole chromosome queries for every
+    `VariantDB` backend.
+
+    Queries are drawn once (from the tabix index of the data file) and the same queries are sent to every backend.
+    Point queries ask about positions of existing variants. Results are saved as JSON and can be compared
+    with results of the previous run.
+    """
+
+    @staticmethod
+    def get_spans(index):
+        """
+        This function returns approximate span of every chromosome (from linear index).
+        :param index: (TabixIndex) index of the data file
+        :return: (dict) chromosome name: number of bases
+        """
+        return {name: max(len(linear), 1) << LINEAR_INDEX_SHIFT for name, linear in zip(index.names, index.linear)}
+
+    @staticmethod
+    def find_variant(index, reader, chrom, position):
+        """
+        This function returns position of the first variant at or after given position (in the same 16kb window).
+        :return: (int) position or given position if there is no such variant
+        """
+        window_end = position + (1 << LINEAR_INDEX_SHIFT)
+        for chunk_beg, chunk_end in index.chunks(chrom, position - 1, window_end):
+            for line in reader.read_lines(chunk_beg, chunk_end):
+                if line.startswith(index.meta.encode()):
+                    continue
+                fields = line.decode().split('\t')
+                if fields[index.col_seq - 1] != chrom:
+                    continue
+                record_position = int(fields[index.col_beg - 1])
+                if record_position >= window_end:
+                    return position
+                if record_position >= position:
+                    return record_position
+        return position
+
+    @staticmethod
+    def prepare_queries(filename, queries=200, range_size=100000, chromosome_queries=3, seed=0):
+        """
+        This function draws queries. Chromosomes are chosen with probability proportional to their span.
+        :param filename: (str) path to bgzipped and tabix indexed data file
+        :param queries: (int) number of point and range queries
+        :param range_size: (int) number of bases in range queries
+        :param chromosome_queries: (int) number of whole chromosome queries
+        :param seed: (int) random seed
+        :return: (dict) query type: list of (chrom, start, end) tuples
+        """
+        rng = random.Random(seed)
+        index = TabixIndex.load('{}.tbi'.format(filename))
+        spans = VariantDBBenchmark.get_spans(index)
+        names, weights = list(spans), list(spans.values())
+
+        with BgzfReader(filename) as reader:
+            points = []
+            for chrom in rng.choices(names, weights, k=queries):
+                position = VariantDBBenchmark.find_variant(index, reader, chrom, rng.randint(1, spans[chrom]))
+                points.append((chrom, position, position))
+
+        ranges = []
+        for chrom in rng.choices(names, weights, k=queries):
+            start = rng.randint(1, max(spans[chrom] - range_size, 1))
+            ranges.append((chrom, start, start + range_size - 1))
+
+        chromosomes = [(chrom, None, None) for chrom in rng.choices(names, weights, k=chromosome_queries)]
+        return {'point': points, 'range': ranges, 'chromosome': chromosomes}
+
+    @staticmethod
+    def summarize(latencies, rows):
+        """
+        This function computes statistics of a series of queries.
+        :param latencies: (list) latency of every query (in seconds)
+        :param rows: (int) number of returned rows
+        :return: (dict) statistics
+        """
+        total = sum(latencies)
+        return {
+            'queries': len(latencies),
+            'rows': rows,
+            'p50_ms': float(np.percentile(latencies, 50)) * 1000,
+            'p99_ms': float(np.percentile(latencies, 99)) * 1000,
+            'mean_ms': total / len(latencies) * 1000,
+            'queries_per_second': len(latencies) / total if total else None,
+            'rows_per_second': rows / total if total else None,
+        }
+
+    @staticmethod
+    def run_backend(variant_db, queries, genome_type='hg19', warmup=5):
+        """
+        This function sends all queries to a backend. A few point queries are sent first and not measured
+        (e.g. index is parsed and memory maps are opened by the first query).
+        :param variant_db: (VariantDB) backend class
+        :param queries: (dict) query type: list of (chrom, start, end) tuples
+        :param genome_type: (str) hg19 or hg38
+        :param warmup: (int) number of not measured queries
+        :return: (dict) query type: statistics
+        """
+        for chrom, start, end in queries['point'][:warmup]:
+            for _ in variant_db.get_variants(chrom, start, end, genome_type):
+                pass
+
+        results = {}
+        for query_type in QUERY_TYPES:
+            latencies, rows = [], 0
+            for chrom, start, end in queries[query_type]:
+                query_start = time.perf_counter()
+                for _ in variant_db.get_variants(chrom, start, end, genome_type):
+                    rows += 1
+                latencies.append(time.perf_counter() - query_start)
+            if latencies:
+                results[query_type] = VariantDBBenchmark.summarize(latencies, rows)
+        return results
+
+    @staticmethod
+    def run(queries, backends=None, genome_type='hg19'):
+        """
+        This function benchmarks backends. Backends which can not be used (e.g. `tabix` is not installed
+        or columnar store is not built) are reported with error.
+        :param queries: (dict) query type: list of (chrom, start, end) tuples
+        :param backends: (list) backend names (all backends by default)
+        :param genome_type: (str) hg19 or hg38
+        :return: (dict) backend name: statistics or error
+        """
+        results = {}
+        for name in backends or sorted(VariantDBFactory.BACKENDS):
+            try:
+                results[name] = VariantDBBenchmark.run_backend(VariantDBFactory.get_variant_db(name), queries, genome_type)
+            except Exception as e:
+                results[name] = {'error': '{}: {}'.format(type(e).__name__, e)}
+        return results
+
+    @staticmethod
+    def compare(results, baseline, threshold=0.2):
+        """
+        This function compares latencies with results of the previous run.
+        :param results: (dict) benchmark results
+        :param baseline: (dict) previous benchmark results
+        :param threshold: (float) relative p50 or p99 increase reported as regression
+        :return: (list) (backend, query type, statistic, previous, current, ratio, regression) tuples
+        """
+        comparison = []
+        for backend, query_results in results['results'].items():
+            for query_type, statistics in query_results.items():
+                previous = baseline.get('results', {}).get(backend, {}).get(query_type)
+                if not isinstance(statistics, dict) or not isinstance(previous, dict):
+                    continue
+                for statistic in ('p50_ms', 'p99_ms'):
+                    if not previous.get(statistic):
+                        continue
+                    ratio = statistics[statistic] / previous[statistic]
+                    comparison.append((backend, query_type, statistic, previous[statistic], statistics[statistic],
+                                       ratio, ratio > 1 + threshold))
+        return comparison
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks variant database backends on synthetic (or given) data.')
+    parser.add_argument('-n', '--variants', type=int, default=1000000, help='Number of generated variants.')
+    parser.add_argument('-d', '--density', type=float, default=1.0, help='Mean number of variants per 1000 bases.')
+    parser.add_argument('-c', '--chromosomes', type=str, default='1,2,3,X',
+                        help='Generated chromosomes separated by commas.')
+    parser.add_argument('--data', type=str, help='Use existing bgzipped and tabix indexed file instead of generating one.')
+    parser.add_argument('-q', '--queries', type=int, default=200, help='Number of point and range queries.')
+    parser.add_argument('-r', '--range-size', type=int, default=100000, help='Number of bases in range queries.')
+    parser.add_argument('--chromosome-queries', type=int, default=3, help='Number of whole chromosome queries.')
+    parser.add_argument('-b', '--backends', type=str, help='Backends separated by commas (default all).')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Random seed.')
+    parser.add_argument('-o', '--output', type=str, default='variant_db_benchmark.json', help='Path to JSON results.')
+    parser.add_argument('--compare', type=str, help='Path to JSON results of the previous run.')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    data_path = os.path.abspath(args.data) if args.data else None
+    genome_type = 'hg19'
+
+    with tempfile.TemporaryDirectory() as workdir, working_directory(workdir):
+        # backends read the data file set in config file from `data/<genome build>` folder of working directory
+        filename = TabixedTableVarinatDB.get_genome_filename(genome_type)
+        os.makedirs(os.path.dirname(filename))
+
+        if data_path:
+            os.symlink(data_path, filename)
+            os.symlink('{}.tbi'.format(data_path), '{}.tbi'.format(filename))
+            dataset = {'source': data_path}
+        else:
+            print('Generating {} variants.'.format(args.variants))
+            counts = SyntheticVariants.generate(filename, args.variants, args.density, args.chromosomes.split(','), args.seed)
+            dataset = {'variants': sum(counts.values()), 'density': args.density, 'chromosomes': counts, 'seed': args.seed}
+        dataset['bytes'] = os.path.getsize(filename)
+
+        backends = args.backends.split(',') if args.backends else None
+        if backends is None or 'columnar' in backends:
+            print('Building columnar store.')
+            ColumnarVariantDB.build(filename, ColumnarVariantDB.get_store_path(genome_type))
+
+        queries = VariantDBBenchmark.prepare_queries(filename, args.queries, args.range_size, args.chromosome_queries, args.seed)
+        results = {
+            'created': datetime.datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'dataset': dataset,
+            'parameters': {'queries': args.queries, 'range_size': args.range_size,
+                           'chromosome_queries': args.chromosome_queries},
+            'results': VariantDBBenchmark.run(queries, backends, genome_type),
+        }
+
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    for backend, query_results in sorted(results['results'].items()):
+        if 'error' in query_results:
+            print('{:10} {}'.format(backend, query_results['error']))
+            continue
+        for query_type, statistics in query_results.items():
+            print('{:10} {:10} p50 {:9.3f} ms  p99 {:9.3f} ms  {:10.1f} queries/s  {:12.1f} rows/s'.format(
+                backend, query_type, statistics['p50_ms'], statistics['p99_ms'],
+                statistics['queries_per_second'] or 0, statistics['rows_per_second'] or 0))
+    print('Results saved to {}.'.format(output))
+
+    if baseline_path:
+        with open(baseline_path, 'r') as file:
+            baseline = json.load(file)
+        for backend, query_type, statistic, previous, current, ratio, regression in \
+                VariantDBBenchmark.compare(results, baseline):
+            print('{:10} {:10} {:6} {:9.3f} -> {:9.3f} ms ({:+.0%}){}'.format(
+                backend, query_type, statistic, previous, current, ratio - 1, '  REGRESSION' if regression else ''))
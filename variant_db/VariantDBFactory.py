@@ -0,0 +1,28 @@
+from variant_db.TabixedTableVarinatDB import TabixedTableVarinatDB
+from variant_db.NativeTabixVariantDB import NativeTabixVariantDB
+from variant_db.ColumnarVariantDB import ColumnarVariantDB
+
+
+class VariantDBFactory(object):
+    """
+    This class selects variant database backend by its name (`VARIANT_DB` option in `DATA` section of config file).
+    """
+
+    BACKENDS = {
+        'tabix': TabixedTableVarinatDB,
+        'native': NativeTabixVariantDB,
+        'columnar': ColumnarVariantDB,
+    }
+
+    @staticmethod
+    def get_variant_db(name='tabix'):
+        """
+        This function returns variant database class for a given backend name.
+        :param name: (str) backend name
+        :return: (VariantDB) variant database class
+        """
+        try:
+            return VariantDBFactory.BACKENDS[name.strip().lower()]
+        except KeyError:
+            raise ValueError('Unknown variant database backend: {}. Available: {}.'.format(
+                name, ', '.join(sorted(VariantDBFactory.BACKENDS))))